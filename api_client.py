@@ -5,163 +5,522 @@ This module handles fetching real-time race data and calculating
 fantasy team scores based on rider performance.
 """
 
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from urllib.parse import urlparse
 from procyclingstats import Race, Stage
+from procyclingstats.scraper import Scraper
 import streamlit as st
-from typing import Dict, List, Tuple, Optional
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from typing import Dict, Iterable, List, Optional, Tuple
+import cache_policy
+import google_sheets_import
+import html_archive
+import http_policy
+import pcs_http
+import stage_store
+import standings_engine
+from gc_records import StageGC
+from gc_times import seconds_to_time_str, time_str_to_seconds
+from scoring import calculate_team_time, stage_matrix
+from singleflight import SingleFlight
+from swr_cache import SWRCache
+from races_config import RACES, get_race_config
 from team_config import TEAM_ROSTERS, RACE_CONFIG
 
+# Maximum number of stage pages fetched from procyclingstats at the same time.
+# Kept small so a cold backfill doesn't hammer the site.
+STAGE_FETCH_CONCURRENCY = 4
 
-def time_str_to_seconds(time_str: str) -> int:
+# Minimum number of seconds between two manual refreshes of the same race
+REFRESH_COOLDOWN_SECONDS = 60
+
+# procyclingstats host to scrape. Set PCS_BASE_URL to run against a local
+# stand-in (see pcs_standin.py) instead of the live site.
+PCS_BASE_URL = os.environ.get("PCS_BASE_URL")
+
+
+def set_pcs_base_url(base_url: str) -> None:
     """
-    Convert time string (H:MM:SS or HH:MM:SS) to seconds
+    Scrape race and stage pages from another host
 
     Args:
-        time_str: Time in format "H:MM:SS" or "HH:MM:SS"
-
-    Returns:
-        Total seconds as integer
+        base_url: Site root, e.g. "http://127.0.0.1:8765/"
     """
-    try:
-        if not time_str or time_str == "0:00:00":
-            return 0
+    Scraper.BASE_URL = base_url.rstrip('/') + '/'
 
-        parts = time_str.split(':')
-        if len(parts) != 3:
-            return 0
 
-        hours = int(parts[0])
-        minutes = int(parts[1])
-        seconds = int(parts[2])
+if PCS_BASE_URL:
+    set_pcs_base_url(PCS_BASE_URL)
 
-        return hours * 3600 + minutes * 60 + seconds
-    except Exception:
-        return 0
+# Fetch page HTML with the shared pooled session (see pcs_http) and hand it to
+# the procyclingstats parsers. Set PCS_FETCH_RAW_HTML=0 to let procyclingstats
+# fetch pages itself (still through the shared session).
+FETCH_RAW_HTML = os.environ.get("PCS_FETCH_RAW_HTML", "1").lower() not in ("0", "false", "no")
+
+
+def _load_page(page_class, url: str):
+    """
+    Fetch and set up a procyclingstats page; returns (page, html)
+
+    procyclingstats rejects error pages with a ValueError, which isn't
+    retried. The site's "technical difficulties" page is raised as
+    pcs_http.TransientHTTPError instead (so http_policy retries it) and its
+    "Page not found" page as pcs_http.PageNotFoundError, like a 404.
+    """
+    if FETCH_RAW_HTML:
+        html = pcs_http.fetch_html(url)
+    else:
+        # Makes sure procyclingstats uses the shared session
+        pcs_http.get_session()
+        # Fetched without checking, so error pages are told apart below
+        page = page_class(url, update_html=False)
+        page.update_html()
+        html = page.html.html
+
+    try:
+        page = page_class(url, html=html, update_html=False)
+    except ValueError as e:
+        if "technical difficulties" in html:
+            raise pcs_http.TransientHTTPError(f"'{url}' is temporarily unavailable") from e
+        if "Page not found" in html:
+            raise pcs_http.PageNotFoundError(f"Page not found: '{url}'") from e
+        raise
+    return page, html
 
 
-def seconds_to_time_str(seconds: int) -> str:
+def _open_page(page_class, url: str):
     """
-    Convert seconds to time string format
+    Fetch a procyclingstats page under the host's outbound policy (rate
+    limit, retries and circuit breaker, see http_policy), and archive its HTML
 
     Args:
-        seconds: Total seconds
+        page_class: procyclingstats scraper class (Stage or Race)
+        url: Relative page URL
 
     Returns:
-        Time string in format "H:MM:SS"
+        Scraper instance ready for parsing
     """
-    if seconds == 0:
-        return "0:00:00"
+    host = urlparse(Scraper.BASE_URL).netloc
+    page, html = http_policy.call(host, _load_page, page_class, url)
+    # Outside the policy: a local disk problem isn't the host failing
+    html_archive.archive_page(url, html)
+    return page
+
+
+# Parse only the GC table of stage pages (see _parse_stage_gc). Set
+# PCS_GC_ONLY_PARSE=0 to always run procyclingstats' full Stage.parse().
+GC_ONLY_PARSE = os.environ.get("PCS_GC_ONLY_PARSE", "1").lower() not in ("0", "false", "no")
+
+# GC columns used by StageGC
+GC_FIELDS = ("rider_url", "rider_name", "team_name", "rank", "time")
+
 
-    hours = seconds // 3600
-    minutes = (seconds % 3600) // 60
-    secs = seconds % 60
+# Serve standings only from snapshots written by ingest_worker.py, so no page
+# load ever waits on procyclingstats
+SNAPSHOT_ONLY = os.environ.get("FANTASY_SNAPSHOT_ONLY", "").lower() in ("1", "true", "yes")
 
-    return f"{hours}:{minutes:02d}:{secs:02d}"
 
+class StageNotPublishedError(Exception):
+    """A stage page has no GC yet (raised so st.cache_data doesn't cache it)"""
 
-@st.cache_data(ttl=300)  # Cache for 5 minutes
-def fetch_stage_gc(stage_number: int, race_url: str = None) -> Optional[Dict]:
+
+class StageFetchError(Exception):
+    """Race data couldn't be fetched (raised so st.cache_data doesn't cache the failure)"""
+
+
+class PartialStageDataError(StageFetchError):
+    """Some stages couldn't be fetched; `stage_data` holds the ones that could"""
+
+    def __init__(self, message: str, stage_data: Dict):
+        super().__init__(message)
+        self.stage_data = stage_data
+
+
+# Negative cache: (race_url, stage) -> time (epoch) until which the stage is
+# taken to be unpublished. Errors never end up here.
+_not_published: Dict[Tuple[str, int], float] = {}
+_not_published_lock = threading.Lock()
+
+# Last stage known to have GC data, per race_url. Published stages only ever
+# grow, so discovery probes forward from here instead of starting over.
+_latest_stage_hints: Dict[str, int] = {}
+_latest_stage_hints_lock = threading.Lock()
+
+# Entries kept per cached function. Entries don't expire by age: cache keys
+# include a cache_policy.ttl_bucket, so outdated ones just stop being used.
+CACHE_MAX_ENTRIES = 512
+
+# Concurrent cache misses for the same (race_url, stage) share one scrape and
+# one scoring run, whichever session or cache key they come from
+_stage_fetches = SingleFlight()
+_standings_scoring = SingleFlight()
+
+
+def fetch_stage_gc(stage_number: int, race_url: str = None, _quiet: bool = False) -> Optional[StageGC]:
     """
     Fetch General Classification (GC) data for a specific stage
 
+    Stages found not to be published yet are remembered in a negative cache
+    (see cache_policy.not_published_ttl) and not fetched again until it
+    expires.
+
     Args:
         stage_number: Stage number (1-21)
         race_url: URL path for the race (e.g., "race/tour-de-france/2025")
+        _quiet: Don't show errors or unreadable GC times in the page (used
+            when probing for unpublished stages)
 
     Returns:
-        Dictionary mapping rider URLs to their GC data, or None if error
+        Compact GC for the stage (see gc_records.StageGC), empty if the stage
+        isn't published yet, or None if error
     """
     if race_url is None:
         race_url = RACE_CONFIG["race_url"]
 
-    try:
-        stage_url = f"{race_url}/stage-{stage_number}"
-        stage = Stage(stage_url)
-        stage_data = stage.parse()
+    key = (race_url, stage_number)
+    with _not_published_lock:
+        expires_at = _not_published.get(key)
+    if expires_at is not None and time.time() < expires_at:
+        return StageGC.from_entries([])
 
-        if not stage_data or 'gc' not in stage_data:
+    try:
+        gc_data = _fetch_stage_gc(stage_number, race_url, cache_policy.ttl_bucket(race_url, stage_number))
+    except StageNotPublishedError:
+        ttl = cache_policy.not_published_ttl(race_url, stage_number)
+        with _not_published_lock:
+            _not_published[key] = time.time() + ttl
+        return StageGC.from_entries([])
+    except StageFetchError as e:
+        # Fall back to the last stored copy of a not-yet-final stage
+        stored_entries = stage_store.load_stage_gc(race_url, stage_number, finalized_only=False)
+        if stored_entries is None:
+            if not _quiet:
+                st.error(f"Error fetching stage {stage_number} GC data: {str(e)}")
             return None
+        gc_data = StageGC.from_entries(stored_entries)
+
+    if gc_data.unparsed and not _quiet:
+        riders = ", ".join(f"{rider_url} ({value!r})" for rider_url, value in gc_data.unparsed)
+        st.warning(f"Stage {stage_number}: couldn't read the GC time of {riders}. These riders aren't counted.")
+
+    return gc_data
+
 
-        # Convert list of GC entries to dictionary keyed by rider_url
-        gc_dict = {}
-        for entry in stage_data['gc']:
-            rider_url = entry.get('rider_url')
-            if rider_url:
-                gc_dict[rider_url] = entry
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES)
+def _fetch_stage_gc(stage_number: int, race_url: str, ttl_bucket: str) -> StageGC:
+    """
+    Get a stage's GC from the stage store or procyclingstats (see fetch_stage_gc)
+
+    Cached until `ttl_bucket` (see cache_policy.ttl_bucket) changes.
 
-        return gc_dict
+    Raises:
+        StageNotPublishedError: If the stage has no GC yet
+        StageFetchError: If the stage couldn't be fetched or parsed
+    """
+    # Finalized stages never change, so serve them from the on-disk store
+    stored_entries = stage_store.load_stage_gc(race_url, stage_number)
+    if stored_entries is not None:
+        return StageGC.from_entries(stored_entries)
 
+    try:
+        # Sessions missing the same stage at the same moment share one scrape
+        gc_data = _stage_fetches.do((race_url, stage_number), _scrape_stage_gc, stage_number, race_url)
+    except StageNotPublishedError:
+        raise
     except Exception as e:
-        st.error(f"Error fetching stage {stage_number} GC data: {str(e)}")
+        raise StageFetchError(str(e)) from e
+
+    if gc_data is None:
+        raise StageFetchError("the stage page couldn't be parsed")
+
+    return gc_data
+
+
+def _scrape_stage_gc(stage_number: int, race_url: str) -> Optional[StageGC]:
+    """
+    Scrape a stage's GC from procyclingstats and store it
+
+    Args:
+        stage_number: Stage number
+        race_url: URL path for the race
+
+    Returns:
+        Compact GC for the stage, or None if the page couldn't be parsed
+
+    Raises:
+        StageNotPublishedError: If the page has no GC yet or doesn't exist
+    """
+    stage_url = f"{race_url}/stage-{stage_number}"
+    try:
+        stage = _open_page(Stage, stage_url)
+    except pcs_http.PageNotFoundError:
+        raise StageNotPublishedError(stage_url)
+    gc_entries = _parse_stage_gc(stage)
+
+    if gc_entries is None:
+        return None
+    if not gc_entries:
+        raise StageNotPublishedError(stage_url)
+
+    # Keep only what scoring needs; times are parsed once here
+    gc_data = StageGC.from_entries(gc_entries)
+
+    if gc_data:
+        stage_store.save_stage_gc(race_url, stage_number, gc_data.to_entries(),
+                                  finalized=_is_stage_final(stage_number, race_url))
+
+    return gc_data
+
+
+def _is_stage_final(stage_number: int, race_url: str) -> bool:
+    """
+    Check whether a stage's GC won't change any more: a later stage has been
+    published, or the race calendar says so (see cache_policy.cache_ttl;
+    dates guessed without the calendar never finalize a stage)
+    """
+    with _latest_stage_hints_lock:
+        if stage_number < _latest_stage_hints.get(race_url, 0):
+            return True
+    return cache_policy.cache_ttl(race_url, stage_number) is None
+
+
+def _parse_stage_gc(stage: Stage) -> Optional[List[Dict]]:
+    """
+    Read the GC table of a stage page
+
+    Only the GC table and the columns scoring reads are parsed; the full
+    Stage.parse() (every classification and all stage info) is the fallback
+    if that fails or GC_ONLY_PARSE is off.
+
+    Args:
+        stage: Stage page
+
+    Returns:
+        GC entries (empty if the stage has no GC yet), or None if the page
+        couldn't be parsed
+    """
+    if GC_ONLY_PARSE:
+        try:
+            return stage.gc(*GC_FIELDS)
+        except Exception:
+            pass
+
+    stage_data = stage.parse()
+    if not stage_data or 'gc' not in stage_data:
         return None
+    return stage_data['gc'] or []
+
+
+def _is_stage_published(stage_number: int, race_url: str) -> bool:
+    """
+    Check whether a stage has GC data, without reporting errors
+
+    Raises:
+        StageFetchError: If the stage couldn't be fetched (so a failed probe
+            isn't taken for an unpublished stage)
+    """
+    gc_data = fetch_stage_gc(stage_number, race_url, _quiet=True)
+    if gc_data is None:
+        raise StageFetchError(f"stage {stage_number} couldn't be fetched")
+    return bool(gc_data)
+
+
+def _get_stage_calendar(race_url: str) -> List[date]:
+    """
+    Get the date of every stage from the race overview page
+
+    Args:
+        race_url: URL path for the race
+
+    Returns:
+        List of stage dates in stage order (empty if unavailable)
+    """
+    try:
+        race = _open_page(Race, race_url)
+        stages = race.stages("date", "stage_url")
+    except Exception:
+        return []
+
+    # Stage dates come back as "MM-DD"; the year is the last part of race_url
+    try:
+        year = int(race_url.rstrip('/').split('/')[-1])
+    except ValueError:
+        year = date.today().year
+
+    calendar = []
+    for stage in stages:
+        try:
+            month, day = stage['date'].split('-')
+            calendar.append(date(year, int(month), int(day)))
+        except (KeyError, AttributeError, ValueError):
+            return []
+
+    cache_policy.set_stage_calendar(race_url, calendar)
+    return calendar
+
+
+def _find_latest_published_stage(race_url: str, upper_bound: int, known_stage: int = 0) -> int:
+    """
+    Find the latest published stage, relying on stages being published in order
+
+    With a known published stage this gallops forward from it (one fetch when
+    nothing new has been published). Without one, it first tries `upper_bound`
+    and then binary searches below it. Either way it costs O(log n) fetches.
+
+    Args:
+        race_url: URL path for the race
+        upper_bound: Highest stage that could be published by now
+        known_stage: Stage already known to be published (0 if none)
+
+    Returns:
+        Latest published stage number, or 0 if none is published
+    """
+    lo, hi = known_stage, upper_bound
+    if lo >= hi:
+        return lo
+
+    if lo == 0:
+        # Cold lookup: usually every stage up to today is out
+        if _is_stage_published(hi, race_url):
+            return hi
+        hi -= 1
+    else:
+        # Warm lookup: gallop forward from the last known stage
+        step = 1
+        while lo < hi:
+            probe = min(lo + step, hi)
+            if not _is_stage_published(probe, race_url):
+                hi = probe - 1
+                break
+            lo = probe
+            step *= 2
+
+    # Binary search for the last published stage in [lo, hi]
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if _is_stage_published(mid, race_url):
+            lo = mid
+        else:
+            hi = mid - 1
+
+    return lo
 
 
-@st.cache_data(ttl=300)
 def get_latest_completed_stage(race_url: str = None) -> int:
     """
     Determine the latest completed stage by checking which stages have GC data
 
+    Only stages whose date has been reached are candidates, and the search
+    starts from the last stage found for this race.
+
     Args:
         race_url: URL path for the race
 
     Returns:
-        Latest completed stage number (1-21)
+        Latest completed stage number (1-21); if it can't be determined, the
+        last stage found for this race (1 if none)
     """
     if race_url is None:
         race_url = RACE_CONFIG["race_url"]
+    try:
+        return _get_latest_completed_stage(race_url, cache_policy.ttl_bucket(race_url))
+    except StageFetchError as e:
+        st.error(f"Error determining latest stage: {str(e)}")
+        with _latest_stage_hints_lock:
+            return max(_latest_stage_hints.get(race_url, 0), 1)
 
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES)
+def _get_latest_completed_stage(race_url: str, ttl_bucket: str) -> int:
+    """
+    Cached body of get_latest_completed_stage, until `ttl_bucket` changes
+
+    Raises:
+        StageFetchError: If the latest stage couldn't be determined
+    """
     try:
-        race = Race(race_url)
-        race_data = race.parse()
+        calendar = _get_stage_calendar(race_url)
+        if calendar:
+            today = date.today()
+            upper_bound = sum(1 for stage_date in calendar if stage_date <= today)
+        else:
+            upper_bound = RACE_CONFIG.get("total_stages", 21)
 
-        if not race_data or 'stages' not in race_data:
-            return 1
+        # Anything already in the stage store is known to be published
+        with _latest_stage_hints_lock:
+            known_stage = _latest_stage_hints.get(race_url, 0)
+        known_stage = max(known_stage, stage_store.latest_stored_stage(race_url))
 
-        # Check stages in reverse order to find the latest with data
-        total_stages = RACE_CONFIG.get("total_stages", 21)
+        latest_stage = _find_latest_published_stage(race_url, upper_bound, known_stage)
 
-        for stage_num in range(total_stages, 0, -1):
-            gc_data = fetch_stage_gc(stage_num, race_url)
-            if gc_data and len(gc_data) > 0:
-                return stage_num
+        # Recorded even when no new stage was found (e.g. the first run after
+        # a restart starts from the stage store), as refresh_race_data reads it
+        with _latest_stage_hints_lock:
+            _latest_stage_hints[race_url] = max(latest_stage, _latest_stage_hints.get(race_url, 0))
 
-        return 1
+        # Once the race is over its last stage is final too
+        if cache_policy.race_is_complete(race_url):
+            stage_store.finalize_stages_before(race_url, latest_stage + 1)
+        else:
+            stage_store.finalize_stages_before(race_url, latest_stage)
+
+        return max(latest_stage, 1)
 
+    except StageFetchError:
+        raise
     except Exception as e:
-        st.error(f"Error determining latest stage: {str(e)}")
-        return 1
+        raise StageFetchError(str(e)) from e
 
 
-def calculate_team_time(team_riders: List[str], gc_data: Dict) -> Tuple[int, int]:
+def fetch_stages_gc(stage_numbers: Iterable[int], race_url: str = None,
+                    max_workers: int = None) -> Dict[int, Optional[StageGC]]:
     """
-    Calculate total team time by summing rider cumulative times
+    Fetch GC data for several stages using a bounded worker pool
+
+    Stages already in the cache return immediately; the rest are fetched
+    in parallel, at most `max_workers` at a time.
 
     Args:
-        team_riders: List of rider URLs for the team
-        gc_data: Dictionary of GC data keyed by rider_url
+        stage_numbers: Stage numbers to fetch
+        race_url: URL path for the race
+        max_workers: Concurrency limit (defaults to STAGE_FETCH_CONCURRENCY)
 
     Returns:
-        Tuple of (total_time_seconds, riders_counted)
+        Dictionary mapping stage number to its GC data (None if unavailable),
+        ordered by stage number
     """
-    total_seconds = 0
-    riders_counted = 0
+    if race_url is None:
+        race_url = RACE_CONFIG["race_url"]
+    if max_workers is None:
+        max_workers = STAGE_FETCH_CONCURRENCY
 
-    for rider_url in team_riders:
-        if rider_url in gc_data:
-            rider_gc = gc_data[rider_url]
-            time_str = rider_gc.get('time', '0:00:00')
-            rider_seconds = time_str_to_seconds(time_str)
+    stage_numbers = sorted(set(stage_numbers))
+    if not stage_numbers:
+        return {}
 
-            if rider_seconds > 0:
-                total_seconds += rider_seconds
-                riders_counted += 1
+    if max_workers <= 1 or len(stage_numbers) == 1:
+        return {stage_num: fetch_stage_gc(stage_num, race_url) for stage_num in stage_numbers}
 
-    return total_seconds, riders_counted
+    # Worker threads share the caller's script context so st.error messages
+    # from fetch_stage_gc still reach the page
+    ctx = get_script_run_ctx()
+    with ThreadPoolExecutor(
+        max_workers=min(max_workers, len(stage_numbers)),
+        thread_name_prefix="stage-fetch",
+        initializer=lambda: add_script_run_ctx(ctx=ctx) if ctx else None
+    ) as executor:
+        results = executor.map(lambda stage_num: fetch_stage_gc(stage_num, race_url), stage_numbers)
+        return dict(zip(stage_numbers, results))
 
 
-@st.cache_data(ttl=300)
 def fetch_fantasy_standings(stage_number: int = None, race_url: str = None) -> Optional[Dict]:
     """
-    Fetch and calculate fantasy standings for all teams
+    Fetch and calculate fantasy standings for all teams, with the
+    team_config rosters
 
     Args:
         stage_number: Specific stage number, or None for latest
@@ -172,81 +531,78 @@ def fetch_fantasy_standings(stage_number: int = None, race_url: str = None) -> O
     """
     if race_url is None:
         race_url = RACE_CONFIG["race_url"]
+    return _standings(race_url, TEAM_ROSTERS, stage_number)
 
-    # Determine stage to fetch
-    if stage_number is None:
-        stage_number = get_latest_completed_stage(race_url)
 
-    # Fetch GC data for this stage
-    gc_data = fetch_stage_gc(stage_number, race_url)
-    if not gc_data:
+def _standings(race_url: str, rosters: Dict[str, List[str]], stage_number: Optional[int]) -> Optional[Dict]:
+    """
+    Standings of a race for some rosters, cached per race, roster version
+    and stage (see fetch_fantasy_standings)
+    """
+    fingerprint = standings_engine.roster_fingerprint(rosters)
+    try:
+        return _fetch_fantasy_standings(
+            stage_number, race_url, fingerprint, cache_policy.ttl_bucket(race_url, stage_number), rosters
+        )
+    except (StageNotPublishedError, StageFetchError):
         return None
 
-    # Calculate team scores
-    team_scores = {}
-    team_rider_details = {}
-
-    for participant, riders in TEAM_ROSTERS.items():
-        total_time, riders_counted = calculate_team_time(riders, gc_data)
-
-        team_scores[participant] = {
-            'total_time_seconds': total_time,
-            'total_time': seconds_to_time_str(total_time),
-            'riders_counted': riders_counted,
-            'total_riders': len(riders)
-        }
-
-        # Store individual rider details
-        rider_details = []
-        for rider_url in riders:
-            if rider_url in gc_data:
-                rider_gc = gc_data[rider_url]
-                rider_details.append({
-                    'name': rider_gc.get('rider_name', 'Unknown'),
-                    'time': rider_gc.get('time', '0:00:00'),
-                    'rank': rider_gc.get('rank', '-'),
-                    'team': rider_gc.get('team_name', 'Unknown')
-                })
-            else:
-                # Rider not in GC (DNF, DNS, etc.)
-                rider_details.append({
-                    'name': rider_url.split('/')[-1].replace('-', ' ').title(),
-                    'time': 'DNF',
-                    'rank': '-',
-                    'team': 'Unknown'
-                })
-
-        team_rider_details[participant] = rider_details
-
-    # Sort teams by total time (ascending - lower is better)
-    sorted_teams = sorted(
-        team_scores.items(),
-        key=lambda x: x[1]['total_time_seconds']
-    )
-
-    # Calculate gaps and positions
-    leader_time = sorted_teams[0][1]['total_time_seconds'] if sorted_teams else 0
-
-    for i, (participant, data) in enumerate(sorted_teams):
-        data['position'] = i + 1
-        gap_seconds = data['total_time_seconds'] - leader_time
-        if gap_seconds == 0:
-            data['gap'] = "Leader"
-        else:
-            data['gap'] = f"+{seconds_to_time_str(gap_seconds)}"
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES)
+def _fetch_fantasy_standings(stage_number: Optional[int], race_url: str, roster_fingerprint: str,
+                             ttl_bucket: str, _rosters: Dict[str, List[str]]) -> Optional[Dict]:
+    """
+    Cached body of _standings, until `ttl_bucket` changes. The rosters
+    aren't hashed; their fingerprint stands in for them in the key.
+
+    Raises:
+        StageNotPublishedError: If the stage has no GC yet
+        StageFetchError: If the latest stage or its GC couldn't be fetched
+    """
+    # Determine stage to fetch
+    if stage_number is None:
+        try:
+            stage_number = _get_latest_completed_stage(race_url, cache_policy.ttl_bucket(race_url))
+        except StageFetchError as e:
+            st.error(f"Error determining latest stage: {str(e)}")
+            raise
+
+    # Finalized stages are already scored; only the latest needs the GC
+    scored = standings_engine.get_scored_stage(race_url, stage_number, _rosters)
+    if scored is None:
+        scored = _standings_scoring.do(
+            (race_url, roster_fingerprint, stage_number), _score_stage, stage_number, race_url, _rosters
+        )
 
     return {
-        'standings': sorted_teams,
+        'standings': scored['standings'],
         'latest_stage': stage_number,
-        'rider_details': team_rider_details,
-        'gc_data': gc_data
+        'rider_details': scored['rider_details']
     }
 
 
-@st.cache_data(ttl=300)
+def _score_stage(stage_number: int, race_url: str, rosters: Dict[str, List[str]]) -> Dict:
+    """
+    Fetch a stage's GC and score it (see standings_engine.add_stage)
+
+    Raises:
+        StageNotPublishedError: If the stage has no GC yet
+        StageFetchError: If the stage couldn't be fetched
+    """
+    gc_data = fetch_stage_gc(stage_number, race_url)
+    if gc_data is None:
+        raise StageFetchError(f"stage {stage_number} couldn't be fetched")
+    if not gc_data:
+        raise StageNotPublishedError(f"{race_url}/stage-{stage_number}")
+
+    finalized = _is_stage_final(stage_number, race_url)
+    return standings_engine.add_stage(race_url, stage_number, rosters, gc_data, finalized)
+
+
 def fetch_stage_by_stage_data(latest_stage: int, race_url: str = None) -> Dict:
     """
-    Fetch GC data for all completed stages to enable stage-by-stage analysis
+    Fetch GC data for all completed stages to enable stage-by-stage
+    analysis, with the team_config rosters
 
     Args:
         latest_stage: The latest completed stage number
@@ -257,26 +613,407 @@ def fetch_stage_by_stage_data(latest_stage: int, race_url: str = None) -> Dict:
     """
     if race_url is None:
         race_url = RACE_CONFIG["race_url"]
+    return _stage_data(race_url, TEAM_ROSTERS, latest_stage)
+
 
+def _stage_data(race_url: str, rosters: Dict[str, List[str]], latest_stage: int,
+                partial: bool = True) -> Optional[Dict]:
+    """
+    Stage-by-stage data of a race for some rosters (see fetch_stage_by_stage_data)
+
+    Data missing stages that couldn't be fetched is never cached; it is
+    returned as is, or None with `partial` off.
+    """
+    fingerprint = standings_engine.roster_fingerprint(rosters)
+    try:
+        return _fetch_stage_by_stage_data(
+            latest_stage, race_url, fingerprint, cache_policy.ttl_bucket(race_url, latest_stage), rosters
+        )
+    except PartialStageDataError as e:
+        return e.stage_data if partial else None
+
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES)
+def _fetch_stage_by_stage_data(latest_stage: int, race_url: str, roster_fingerprint: str,
+                               ttl_bucket: str, _rosters: Dict[str, List[str]]) -> Dict:
+    """
+    Cached body of _stage_data (keyed like _fetch_fantasy_standings)
+
+    Raises:
+        PartialStageDataError: If some stages couldn't be fetched
+    """
     stage_data = {}
 
     # Initialize data structure for each participant
-    for participant in TEAM_ROSTERS.keys():
+    for participant in _rosters.keys():
         stage_data[participant] = {}
 
-    # Fetch GC data for each stage
+    # Earlier stages are already scored; fetch and score only the rest
+    scored_stages = standings_engine.get_scored_stages(race_url, _rosters)
+    missing_stages = [n for n in range(1, latest_stage + 1) if n not in scored_stages]
+
+    # Fetch GC data for missing stages in parallel and score them together
+    fetched = fetch_stages_gc(missing_stages, race_url)
+    failed_stages = [n for n, gc_data in fetched.items() if gc_data is None]
+    fetched_gc = {n: gc_data for n, gc_data in fetched.items() if gc_data}
+    if fetched_gc:
+        scored_stages.update(standings_engine.add_stages(race_url, fetched_gc, _rosters, latest_stage))
+
+    # Merge results in stage order
     for stage_num in range(1, latest_stage + 1):
-        gc_data = fetch_stage_gc(stage_num, race_url)
+        if stage_num not in scored_stages:
+            continue
+        for participant, data in scored_stages[stage_num]['standings']:
+            if participant in stage_data and data['total_time_seconds'] > 0:
+                stage_data[participant][stage_num] = {
+                    'time': data['total_time'],
+                    'time_seconds': data['total_time_seconds'],
+                    'riders_counted': data['riders_counted']
+                }
+
+    if failed_stages:
+        raise PartialStageDataError(f"stages {failed_stages} couldn't be fetched", stage_data)
+    return stage_data
 
-        if gc_data:
-            for participant, riders in TEAM_ROSTERS.items():
-                total_time, riders_counted = calculate_team_time(riders, gc_data)
 
-                if total_time > 0:
-                    stage_data[participant][stage_num] = {
-                        'time': seconds_to_time_str(total_time),
-                        'time_seconds': total_time,
-                        'riders_counted': riders_counted
-                    }
+def _stage_matrix(race_url: str, rosters: Dict[str, List[str]], latest_stage: int,
+                  partial: bool = True) -> Optional[Dict]:
+    """
+    Stage-by-stage data of a race as participant x stage arrays, with leader
+    times, gaps and stage times computed once for the charts (see
+    scoring.stage_matrix; partial data is handled like in _stage_data)
+    """
+    fingerprint = standings_engine.roster_fingerprint(rosters)
+    try:
+        return _fetch_stage_matrix(
+            latest_stage, race_url, fingerprint, cache_policy.ttl_bucket(race_url, latest_stage), rosters
+        )
+    except PartialStageDataError as e:
+        return stage_matrix(e.stage_data, latest_stage) if partial else None
 
-    return stage_data
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES)
+def _fetch_stage_matrix(latest_stage: int, race_url: str, roster_fingerprint: str,
+                        ttl_bucket: str, _rosters: Dict[str, List[str]]) -> Dict:
+    """Cached body of _stage_matrix (keyed like _fetch_stage_by_stage_data)"""
+    stage_data = _fetch_stage_by_stage_data(latest_stage, race_url, roster_fingerprint, ttl_bucket, _rosters)
+    return stage_matrix(stage_data, latest_stage)
+
+
+# Last good standings and stage matrices per race and roster version, served
+# while a fresh copy is fetched in the background once the caches above are
+# due again. Keys are (race_url, roster fingerprint[, latest_stage]). Stage
+# data missing stages that couldn't be fetched doesn't count as good.
+_standings_swr = SWRCache(fresh_for=lambda key: cache_policy.cache_ttl(key[0]), name="standings")
+_stage_matrix_swr = SWRCache(fresh_for=lambda key: cache_policy.cache_ttl(key[0], key[2]), name="stage-matrix")
+
+
+def serve_race_standings(race_id: str, rosters: Dict[str, List[str]]) -> Tuple[Optional[Dict], Optional[float]]:
+    """
+    Standings of a race for its latest stage, stale-while-revalidate
+
+    Once a race has loaded, this never blocks: stale standings are returned
+    right away and refreshed in the background, and if procyclingstats is
+    down the last good standings keep being served.
+
+    Args:
+        race_id: Race id (e.g. "tdf-2026", see races_config.RACES)
+        rosters: Dictionary mapping participants to their rider URLs
+
+    Returns:
+        (standings as from fetch_fantasy_standings, age in seconds), or
+        (None, None) if the race has never loaded
+    """
+    race_url = get_race_config(race_id)['race_url']
+    key = (race_url, standings_engine.roster_fingerprint(rosters))
+    return _standings_swr.get(key, lambda: _standings(race_url, rosters, None))
+
+
+def standings_refreshing(race_id: str, rosters: Dict[str, List[str]]) -> bool:
+    """
+    Check whether newer standings of a race are being loaded in the
+    background (see serve_race_standings)
+
+    Args:
+        race_id: Race id (e.g. "tdf-2026", see races_config.RACES)
+        rosters: Dictionary mapping participants to their rider URLs
+
+    Returns:
+        True while a background refresh of the served standings is running
+    """
+    key = (get_race_config(race_id)['race_url'], standings_engine.roster_fingerprint(rosters))
+    return _standings_swr.is_refreshing(key)
+
+
+def serve_race_stage_matrix(race_id: str, rosters: Dict[str, List[str]],
+                            latest_stage: int) -> Tuple[Optional[Dict], Optional[float]]:
+    """
+    Stage matrix of a race for the charts (see scoring.stage_matrix),
+    stale-while-revalidate like serve_race_standings
+
+    Args:
+        race_id: Race id (e.g. "tdf-2026", see races_config.RACES)
+        rosters: Dictionary mapping participants to their rider URLs
+        latest_stage: The latest completed stage number
+
+    Returns:
+        (stage matrix, age in seconds), or (None, None) if it has never
+        loaded
+    """
+    race_url = get_race_config(race_id)['race_url']
+    key = (race_url, standings_engine.roster_fingerprint(rosters), latest_stage)
+    return _stage_matrix_swr.get(key, lambda: _stage_matrix(race_url, rosters, latest_stage, partial=False))
+
+
+def coalescing_stats() -> Dict[str, Dict[str, int]]:
+    """
+    Get how many duplicate scrapes and scoring runs were coalesced
+
+    Returns:
+        Dictionary with 'stage_gc' and 'standings' counters (see
+        singleflight.SingleFlight.stats)
+    """
+    return {
+        'stage_gc': _stage_fetches.stats(),
+        'standings': _standings_scoring.stats()
+    }
+
+
+def forget_rosters(race_id: str, old_rosters: Dict[str, List[str]], new_rosters: Dict[str, List[str]]) -> None:
+    """
+    Drop cached standings of a race's previous rosters once they change in
+    the roster sheet (see google_sheets_import.add_roster_listener)
+
+    Args:
+        race_id: Race identifier
+        old_rosters: Rosters the race had
+        new_rosters: Rosters it has now
+    """
+    race = RACES.get(race_id)
+    if race is None or not old_rosters:
+        return
+    race_url = race['race_url']
+    fingerprint = standings_engine.roster_fingerprint(old_rosters)
+    _standings_swr.discard(lambda key: key[:2] == (race_url, fingerprint))
+    _stage_matrix_swr.discard(lambda key: key[:2] == (race_url, fingerprint))
+    standings_engine.forget_rosters(race_url, fingerprint)
+
+
+google_sheets_import.add_roster_listener(forget_rosters)
+
+
+_last_refresh: Dict[str, float] = {}
+_last_refresh_lock = threading.Lock()
+
+
+def refresh_race_data(race_url: str = None, rosters: Dict[str, List[str]] = None) -> bool:
+    """
+    Invalidate the latest stage of a race and everything derived from it
+
+    Historical stages, other races and team rosters stay cached. Refreshes
+    are limited to one per race every REFRESH_COOLDOWN_SECONDS so repeated
+    clicks can't set off a scraping stampede.
+
+    Args:
+        race_url: URL path for the race
+        rosters: Rosters whose standings are refreshed (defaults to the
+            team_config rosters)
+
+    Returns:
+        True if the race was refreshed, False if it was refreshed too recently
+    """
+    if race_url is None:
+        race_url = RACE_CONFIG["race_url"]
+    if rosters is None:
+        rosters = TEAM_ROSTERS
+    fingerprint = standings_engine.roster_fingerprint(rosters)
+
+    now = time.monotonic()
+    with _last_refresh_lock:
+        last_refresh = _last_refresh.get(race_url)
+        if last_refresh is not None and now - last_refresh < REFRESH_COOLDOWN_SECONDS:
+            return False
+        _last_refresh[race_url] = now
+
+    with _latest_stage_hints_lock:
+        latest_stage = _latest_stage_hints.get(race_url)
+    if not latest_stage:
+        # Not looked up since the process started; the store knows the live stage
+        latest_stage = stage_store.latest_stored_stage(race_url)
+
+    # Cache keys include the current TTL bucket of each entry
+    _get_latest_completed_stage.clear(race_url, cache_policy.ttl_bucket(race_url))
+    _fetch_fantasy_standings.clear(None, race_url, fingerprint, cache_policy.ttl_bucket(race_url), rosters)
+    with _not_published_lock:
+        for key in [key for key in _not_published if key[0] == race_url]:
+            del _not_published[key]
+    if latest_stage:
+        # The next stage too, in case it was probed before it was published
+        for stage_number in (latest_stage, latest_stage + 1):
+            _fetch_stage_gc.clear(stage_number, race_url, cache_policy.ttl_bucket(race_url, stage_number))
+        latest_bucket = cache_policy.ttl_bucket(race_url, latest_stage)
+        _fetch_fantasy_standings.clear(latest_stage, race_url, fingerprint, latest_bucket, rosters)
+        _fetch_stage_by_stage_data.clear(latest_stage, race_url, fingerprint, latest_bucket, rosters)
+        _fetch_stage_matrix.clear(latest_stage, race_url, fingerprint, latest_bucket, rosters)
+
+    # The next page load fetches afresh, keeping the old data if that fails
+    _standings_swr.invalidate(lambda key: key[0] == race_url)
+    _stage_matrix_swr.invalidate(lambda key: key[0] == race_url)
+
+    return True
+
+
+def build_race_snapshot(race_url: str = None, rosters: Dict[str, List[str]] = None) -> Optional[Dict]:
+    """
+    Scrape and score a race into a snapshot (used by ingest_worker.py)
+
+    Args:
+        race_url: URL path for the race
+        rosters: Rosters to score (defaults to the team_config rosters)
+
+    Returns:
+        JSON-serializable dictionary with standings, latest_stage,
+        rider_details and stage_data, or None if the race has no data yet
+
+    Raises:
+        StageFetchError: If any of the race's data couldn't be fetched (an
+            incomplete snapshot is never published)
+    """
+    if race_url is None:
+        race_url = RACE_CONFIG["race_url"]
+
+    if rosters is None:
+        rosters = TEAM_ROSTERS
+
+    fingerprint = standings_engine.roster_fingerprint(rosters)
+    try:
+        fantasy_data = _fetch_fantasy_standings(
+            None, race_url, fingerprint, cache_policy.ttl_bucket(race_url), rosters
+        )
+    except StageNotPublishedError:
+        return None
+    stage_data = _stage_data(race_url, rosters, fantasy_data['latest_stage'], partial=False)
+    if stage_data is None:
+        raise StageFetchError(f"{race_url}: some stages couldn't be fetched")
+
+    return {
+        'standings': [[participant, data] for participant, data in fantasy_data['standings']],
+        'latest_stage': fantasy_data['latest_stage'],
+        'rider_details': fantasy_data['rider_details'],
+        'stage_data': stage_data
+    }
+
+
+def publish_race_snapshot(race_url: str = None, rosters: Dict[str, List[str]] = None) -> Optional[int]:
+    """
+    Build a race snapshot and store it as a new version if it changed
+
+    Args:
+        race_url: URL path for the race
+        rosters: Rosters to score (defaults to the team_config rosters)
+
+    Returns:
+        Current snapshot version, or None if the race has no data yet
+
+    Raises:
+        StageFetchError: If any of the race's data couldn't be fetched
+    """
+    if race_url is None:
+        race_url = RACE_CONFIG["race_url"]
+
+    if rosters is None:
+        rosters = TEAM_ROSTERS
+
+    snapshot = build_race_snapshot(race_url, rosters)
+    if snapshot is None:
+        return None
+    fingerprint = standings_engine.roster_fingerprint(rosters)
+    return stage_store.save_race_snapshot(race_url, fingerprint, snapshot['latest_stage'], snapshot)
+
+
+# Seconds a snapshot may be past its race's cache_ttl before page loads stop
+# trusting it and fetch the race themselves (the worker polls every
+# cache_policy.LIVE_TTL seconds and ingesting a race takes a while)
+SNAPSHOT_GRACE_SECONDS = 120
+
+# Latest snapshot loaded per (race_url, roster fingerprint); reloaded only
+# when the worker stores a new version
+_snapshots: Dict[tuple, Dict] = {}
+_snapshots_lock = threading.Lock()
+
+
+def load_race_snapshot(race_url: str = None, rosters: Dict[str, List[str]] = None) -> Optional[Dict]:
+    """
+    Get the latest snapshot of a race written by the ingestion worker
+
+    Args:
+        race_url: URL path for the race
+        rosters: Rosters the snapshot must be scored with (defaults to the
+            team_config rosters)
+
+    Returns:
+        Dictionary shaped like fetch_fantasy_standings' result plus
+        'stage_data' (as from fetch_stage_by_stage_data), 'stage_matrix'
+        (see scoring.stage_matrix), 'version', 'updated_at' (Unix
+        time the standings last changed) and 'checked_at' (Unix time the
+        worker last found them current), or None if there is no snapshot for
+        the current rosters
+    """
+    if race_url is None:
+        race_url = RACE_CONFIG["race_url"]
+
+    if rosters is None:
+        rosters = TEAM_ROSTERS
+
+    key = (race_url, standings_engine.roster_fingerprint(rosters))
+    version, checked_at = stage_store.latest_snapshot_version(*key)
+    if not version:
+        return None
+
+    with _snapshots_lock:
+        cached = _snapshots.get(key)
+    if cached is not None and cached['version'] == version:
+        return dict(cached, checked_at=checked_at)
+
+    stored = stage_store.load_race_snapshot(*key)
+    if stored is None:
+        return None
+
+    # JSON turned standings rows into lists and stage numbers into strings
+    data = stored['data']
+    snapshot = {
+        'standings': [(participant, row) for participant, row in data['standings']],
+        'latest_stage': data['latest_stage'],
+        'rider_details': data['rider_details'],
+        'stage_data': {
+            participant: {int(stage): stage_row for stage, stage_row in stages.items()}
+            for participant, stages in data['stage_data'].items()
+        },
+        'version': stored['version'],
+        'updated_at': stored['created_at'],
+        'checked_at': stored['checked_at']
+    }
+    # Built once per snapshot version, like the cached stage matrix
+    snapshot['stage_matrix'] = stage_matrix(snapshot['stage_data'], snapshot['latest_stage'])
+    with _snapshots_lock:
+        _snapshots[key] = snapshot
+    return snapshot
+
+
+def is_snapshot_current(snapshot: Dict, race_url: str = None) -> bool:
+    """
+    Check whether the ingestion worker is keeping a race snapshot up to date
+
+    Args:
+        snapshot: Snapshot as from load_race_snapshot
+        race_url: URL path for the race
+
+    Returns:
+        True if the worker checked it within the race's cache_ttl plus
+        SNAPSHOT_GRACE_SECONDS (always for completed races), False if the
+        worker is late or no longer running
+    """
+    if race_url is None:
+        race_url = RACE_CONFIG["race_url"]
+    ttl = cache_policy.cache_ttl(race_url)
+    return ttl is None or time.time() - snapshot['checked_at'] < ttl + SNAPSHOT_GRACE_SECONDS
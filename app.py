@@ -1,13 +1,21 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
+import time
 from datetime import datetime
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
 # Import API client for procyclingstats data
 from api_client import (
-    fetch_fantasy_standings,
-    fetch_stage_by_stage_data,
+    coalescing_stats,
+    is_snapshot_current,
+    load_race_snapshot,
+    refresh_race_data,
+    serve_race_stage_matrix,
+    serve_race_standings,
+    standings_refreshing,
+    SNAPSHOT_ONLY,
     seconds_to_time_str,
     time_str_to_seconds
 )
@@ -17,10 +25,15 @@ from races_config import (
     DEFAULT_RACE,
     get_race_config,
     get_team_rosters,
-    get_all_races
+    get_all_races,
+    get_roster_status,
+    refresh_rosters
 )
 # Keep team_config import for backwards compatibility
 from team_config import TEAM_ROSTERS, RACE_CONFIG
+from cache_policy import cache_ttl
+from http_policy import policy_state
+from warmup import start_warmup, warmup_status
 
 # Page configuration
 st.set_page_config(
@@ -252,10 +265,10 @@ def create_completion_status_card(competition_config):
     """, unsafe_allow_html=True)
 
 # Data fetching functions replaced by API client
-# (fetch_fantasy_standings and fetch_stage_by_stage_data from api_client)
+# (load_race_snapshot, serve_race_standings and serve_race_stage_matrix from api_client)
 
-def create_cumulative_time_chart(stage_data, latest_stage):
-    """Create cumulative time progression chart"""
+def create_cumulative_time_chart(stage_matrix, latest_stage):
+    """Create cumulative time progression chart (from serve_race_stage_matrix)"""
     fig = go.Figure()
 
     # Color scheme for participants
@@ -276,26 +289,19 @@ def create_cumulative_time_chart(stage_data, latest_stage):
         'Nate': 'solid'
     }
     
-    for participant, stages in stage_data.items():
-        if stages:  # Only show participants with data
-            stages_list = []
-            times_list = []
-            
-            for stage in range(1, latest_stage + 1):
-                if stage in stages:
-                    stages_list.append(stage)
-                    times_list.append(stages[stage]['time_seconds'] / 3600)  # Convert to hours
-            
+    stages = stage_matrix['stages'][:latest_stage]
+    times = stage_matrix['times'][:, :latest_stage]
+    present = stage_matrix['present'][:, :latest_stage]
+
+    for row, participant in enumerate(stage_matrix['participants']):
+        if present[row].any():  # Only show participants with data
+            stages_list = stages[present[row]].tolist()
+            seconds_list = times[row, present[row]].tolist()
+
             if stages_list:
-                # Create custom hover text with exact times
-                hover_text = []
-                for stage in stages_list:
-                    time_str = stages[stage]['time']
-                    hover_text.append(f'<b>{participant}</b><br>Stage: {stage}<br>Cumulative Time: {time_str}')
-                
                 fig.add_trace(go.Scatter(
                     x=stages_list,
-                    y=times_list,
+                    y=[seconds / 3600 for seconds in seconds_list],  # Convert to hours
                     mode='lines+markers',
                     name=participant,
                     line=dict(
@@ -305,7 +311,7 @@ def create_cumulative_time_chart(stage_data, latest_stage):
                     ),
                     marker=dict(size=8, color=colors.get(participant, '#FFFFFF')),
                     hovertemplate='<b>%{fullData.name}</b><br>Stage: %{x}<br>Time: %{customdata}<extra></extra>',
-                    customdata=[stages[stage]['time'] for stage in stages_list],
+                    customdata=[seconds_to_time_str(seconds) for seconds in seconds_list],
                     visible=True,
                     legendgroup=participant,
                     showlegend=True
@@ -313,16 +319,11 @@ def create_cumulative_time_chart(stage_data, latest_stage):
     
     # Calculate Y-axis range to zoom into the data (show differences better)
     # Find min and max times across all participants
-    all_times = []
-    for participant, stages in stage_data.items():
-        if stages:
-            for stage in range(1, latest_stage + 1):
-                if stage in stages:
-                    all_times.append(stages[stage]['time_seconds'] / 3600)
-
-    if all_times:
-        min_time = min(all_times)
-        max_time = max(all_times)
+    all_times = times[present] / 3600
+
+    if all_times.size:
+        min_time = float(all_times.min())
+        max_time = float(all_times.max())
         # Add 10% padding for visual clarity
         padding = (max_time - min_time) * 0.1
         y_min = max(0, min_time - padding)  # Don't go below 0
@@ -377,28 +378,13 @@ def create_cumulative_time_chart(stage_data, latest_stage):
     
     return fig
 
-def create_stage_performance_chart(stage_data, latest_stage):
-    """Create individual stage performance chart"""
-    # Calculate stage-specific times (time between stages)
-    stage_performance = {}
-    stage_performance_seconds = {}
-    
-    for participant, stages in stage_data.items():
-        stage_performance[participant] = {}
-        stage_performance_seconds[participant] = {}
-        prev_time = 0
-        
-        for stage in range(1, latest_stage + 1):
-            if stage in stages:
-                current_time = stages[stage]['time_seconds']
-                if stage == 1:
-                    stage_time = current_time
-                else:
-                    stage_time = current_time - prev_time
-                stage_performance[participant][stage] = stage_time / 60  # Convert to minutes for y-axis
-                stage_performance_seconds[participant][stage] = stage_time  # Keep seconds for hover text
-                prev_time = current_time
-    
+def create_stage_performance_chart(stage_matrix, latest_stage):
+    """Create individual stage performance chart (from serve_race_stage_matrix)"""
+    # Stage-specific times (time between stages) come precomputed
+    participant_names = np.array(stage_matrix['participants'], dtype=object)
+    stage_times = stage_matrix['stage_times']
+    present = stage_matrix['present']
+
     # Create subplot for each stage
     fig = make_subplots(
         rows=1, cols=min(latest_stage, 5),  # Show max 5 stages at once
@@ -416,27 +402,22 @@ def create_stage_performance_chart(stage_data, latest_stage):
     stages_to_show = list(range(max(1, latest_stage-4), latest_stage + 1))
     
     for col, stage in enumerate(stages_to_show, 1):
-        participants = []
-        times = []
-        bar_colors = []
-        hover_texts = []
-        
-        for participant in stage_performance:
-            if stage in stage_performance[participant]:
-                participants.append(participant)
-                times.append(stage_performance[participant][stage])
-                bar_colors.append(colors.get(participant, '#FFFFFF'))
-                
-                # Convert seconds to H:MM:SS format for hover
-                stage_seconds = stage_performance_seconds[participant][stage]
-                stage_time_str = seconds_to_time_str(int(stage_seconds))
-                hover_texts.append(f'<b>{participant}</b><br>Stage {stage} Time: {stage_time_str}')
-        
+        shown = present[:, stage - 1]
+        participants = participant_names[shown].tolist()
+        stage_seconds = stage_times[shown, stage - 1].tolist()
+        bar_colors = [colors.get(participant, '#FFFFFF') for participant in participants]
+
+        # Convert seconds to H:MM:SS format for hover
+        hover_texts = [
+            f'<b>{participant}</b><br>Stage {stage} Time: {seconds_to_time_str(seconds)}'
+            for participant, seconds in zip(participants, stage_seconds)
+        ]
+
         if participants:
             fig.add_trace(
                 go.Bar(
                     x=participants,
-                    y=times,
+                    y=[seconds / 60 for seconds in stage_seconds],  # Convert to minutes for y-axis
                     name=f'Stage {stage}',
                     marker_color=bar_colors,
                     showlegend=False,
@@ -496,8 +477,8 @@ def create_stage_performance_chart(stage_data, latest_stage):
     
     return fig
 
-def create_gap_evolution_chart(stage_data, latest_stage):
-    """Create chart showing gap evolution relative to leader"""
+def create_gap_evolution_chart(stage_matrix, latest_stage):
+    """Create chart showing gap evolution relative to leader (from serve_race_stage_matrix)"""
     fig = go.Figure()
     
     colors = {
@@ -508,37 +489,26 @@ def create_gap_evolution_chart(stage_data, latest_stage):
         'Nate': '#96CEB4'
     }
     
-    # Find leader at each stage and calculate gaps
-    for participant, stages in stage_data.items():
-        if stages:
-            stages_list = []
-            gaps_list = []
-            
-            for stage in range(1, latest_stage + 1):
-                if stage in stages:
-                    # Find leader time for this stage
-                    leader_time = min([
-                        stage_data[p][stage]['time_seconds'] 
-                        for p in stage_data 
-                        if stage in stage_data[p]
-                    ])
-                    
-                    gap_seconds = stages[stage]['time_seconds'] - leader_time
-                    stages_list.append(stage)
-                    gaps_list.append(gap_seconds / 60)  # Convert to minutes
-            
-            if stages_list and any(gap > 0 for gap in gaps_list):  # Don't show leader line
-                # Create complete hover text strings
-                hover_texts = []
-                for i, stage in enumerate(stages_list):
-                    gap_seconds = gaps_list[i] * 60  # Convert back to seconds
-                    gap_time_str = calculate_time_gap(0, int(gap_seconds))  # Format as "+H:MM:SS"
-                    hover_text = f"{participant} - Stage {stage}: {gap_time_str}"
-                    hover_texts.append(hover_text)
+    # Gaps to each stage's leader come precomputed
+    stages = stage_matrix['stages'][:latest_stage]
+    gaps = stage_matrix['gaps'][:, :latest_stage]
+    present = stage_matrix['present'][:, :latest_stage]
+
+    for row, participant in enumerate(stage_matrix['participants']):
+        if present[row].any():
+            stages_list = stages[present[row]].tolist()
+            gap_seconds_list = gaps[row, present[row]].tolist()
+
+            if stages_list and any(gap_seconds_list):  # Don't show leader line
+                # Create complete hover text strings ("+H:MM:SS")
+                hover_texts = [
+                    f"{participant} - Stage {stage}: {calculate_time_gap(0, gap_seconds)}"
+                    for stage, gap_seconds in zip(stages_list, gap_seconds_list)
+                ]
 
                 fig.add_trace(go.Scatter(
                     x=stages_list,
-                    y=gaps_list,
+                    y=[gap_seconds / 60 for gap_seconds in gap_seconds_list],  # Convert to minutes
                     mode='lines+markers',
                     name=participant,
                     line=dict(color=colors.get(participant, '#FFFFFF'), width=3),
@@ -1254,9 +1224,45 @@ def get_dark_theme_css(leader_color="#FFD700"):
     """
     return css_template.replace("LEADER_COLOR_PLACEHOLDER", leader_color)
 
+def roster_status_caption():
+    """Describe where the rosters come from and when they were last refreshed"""
+    status = get_roster_status()
+    if status['synced_at'] is None:
+        if status['refreshing']:
+            return "Loading rosters from the Google Sheet; showing the built-in rosters until then."
+        if status['error']:
+            # The error itself (with the sheet URL) is only shown on ?health=1
+            return "Couldn't load rosters from the Google Sheet; showing the built-in rosters."
+        return None
+
+    age_minutes = int((time.time() - status['synced_at']) // 60)
+    age = f"{age_minutes} min ago" if age_minutes < 120 else f"{age_minutes // 60} h ago"
+    caption = f"Rosters refreshed from the Google Sheet {age}."
+    if status['error']:
+        caption += " The latest check failed, so these are the last rosters read."
+    return caption
+
+
+def show_health():
+    """Render cache warm-up progress and scraper state (for ?health=1)"""
+    status = warmup_status()
+    st.markdown(f"status: **{status['status']}**")
+    st.json({
+        'warmup': status,
+        'rosters': get_roster_status(),
+        'procyclingstats': policy_state(),
+        'coalescing': coalescing_stats()
+    })
+
 def main():
+    # Warm the caches of the active races once per server process
+    start_warmup()
+
     # Get query parameter for race from URL
     query_params = st.query_params
+    if query_params.get("health"):
+        show_health()
+        return
     race_from_url = query_params.get("race", DEFAULT_RACE)
 
     # Initialize race selection in session state from URL or default
@@ -1341,6 +1347,16 @@ def main():
     # Check if team rosters are empty
     rosters_empty = all(len(riders) == 0 for riders in team_rosters.values())
 
+    # On a fresh deploy the sheet hasn't been read yet and the built-in
+    # rosters of upcoming races are empty placeholders; wait for the first
+    # read rather than call a running race not started
+    roster_status = get_roster_status()
+    if has_race_started and rosters_empty and roster_status.get('loaded') is False and not roster_status['error']:
+        with st.spinner("Loading rosters from the Google Sheet..."):
+            refresh_rosters()
+        team_rosters = get_team_rosters(selected_race_id)
+        rosters_empty = all(len(riders) == 0 for riders in team_rosters.values())
+
     # Subtitle
     if competition_config["is_complete"]:
         st.markdown("### 🏁 Final Standings")
@@ -1362,16 +1378,39 @@ def main():
         """)
         return
 
-    # Add refresh button with mobile-friendly layout
-    col1, col2 = st.columns([4, 1])
-    with col2:
-        if st.button("🔄 Refresh", help="Refresh data from procyclingstats API", use_container_width=True):
-            st.cache_data.clear()
-            st.rerun()
+    # Snapshots from the ingestion worker are read without touching
+    # procyclingstats, unless the worker has stopped keeping them up to date
+    snapshot = load_race_snapshot(race_config['race_url'], team_rosters)
+    if snapshot is not None and not SNAPSHOT_ONLY and not is_snapshot_current(snapshot, race_config['race_url']):
+        snapshot = None
 
-    # Fetch and process data from procyclingstats API
-    with st.spinner("Fetching latest standings from procyclingstats..."):
-        fantasy_data = fetch_fantasy_standings(race_url=race_config['race_url'])
+    # Add refresh button with mobile-friendly layout; the worker refreshes
+    # snapshots by itself
+    if snapshot is None and not SNAPSHOT_ONLY:
+        col1, col2 = st.columns([4, 1])
+        with col2:
+            if st.button("🔄 Refresh", help="Refresh data from procyclingstats API", use_container_width=True):
+                # Only the selected race's latest stage is refetched
+                if refresh_race_data(race_config['race_url'], team_rosters):
+                    st.rerun()
+                else:
+                    st.toast("Data was refreshed moments ago. Please try again in a minute.")
+
+    if snapshot is not None:
+        fantasy_data = snapshot
+        data_age = time.time() - snapshot['checked_at']
+        # The worker checks the race again once it is due (never once it's complete)
+        ttl = cache_ttl(race_config['race_url'])
+        refreshing = ttl is not None and data_age >= ttl
+    elif SNAPSHOT_ONLY:
+        st.info("Standings are being prepared. Please check back in a few minutes.")
+        return
+    else:
+        # Fetch and process data from procyclingstats API; once loaded, stale
+        # standings are shown right away and refreshed in the background
+        with st.spinner("Fetching latest standings from procyclingstats..."):
+            fantasy_data, data_age = serve_race_standings(selected_race_id, team_rosters)
+        refreshing = standings_refreshing(selected_race_id, team_rosters)
 
     if fantasy_data is None:
         st.error("Unable to load standings data. Please check the API connection or ensure race data is available.")
@@ -1383,7 +1422,13 @@ def main():
     rider_details = fantasy_data['rider_details']
 
     # Fetch stage-by-stage data for charts
-    stage_by_stage_data = fetch_stage_by_stage_data(latest_stage, race_url=race_config['race_url'])
+    if snapshot is not None:
+        stage_matrix = snapshot['stage_matrix']
+    else:
+        stage_matrix, _ = serve_race_stage_matrix(selected_race_id, team_rosters, latest_stage)
+
+    if refreshing and data_age is not None and data_age >= 60:
+        st.caption(f"Standings as of {int(data_age // 60)} min ago. Newer data is loaded in the background.")
     
     # Create main navigation tabs
     tab1, tab2, tab3 = st.tabs(["🏆 Current Standings", "📈 Gap Analysis", "👥 Team Riders"])
@@ -1520,9 +1565,9 @@ def main():
         # Stage Analysis - Gap Evolution Chart Only
         st.markdown("### 📈 Gap Evolution from Leader")
 
-        if latest_stage > 1 and stage_by_stage_data:
+        if latest_stage > 1 and stage_matrix is not None and stage_matrix['participants']:
             st.plotly_chart(
-                create_gap_evolution_chart(stage_by_stage_data, latest_stage),
+                create_gap_evolution_chart(stage_matrix, latest_stage),
                 use_container_width=True
             )
             st.markdown('<p class="analysis-text" style="color: #ffffff !important; font-weight: bold;">Analysis:</p><p class="analysis-description" style="color: #e0e0e0 !important;">Tracks how time gaps between participants and the leader evolve over stages. Each line shows a participant\'s gap to the leader at each stage. Click legend items to show/hide participants.</p>', unsafe_allow_html=True)
@@ -1532,6 +1577,11 @@ def main():
             st.markdown('<p style="color: #e0e0e0;">Gap evolution will be shown as more stage data becomes available.</p>', unsafe_allow_html=True)
     
     with tab3:
+        # Rosters are refreshed in the background; show how current they are
+        roster_caption = roster_status_caption()
+        if roster_caption:
+            st.caption(roster_caption)
+
         # Team Riders Display
         if rider_details:
             create_riders_display(rider_details)
@@ -0,0 +1,106 @@
+"""
+Benchmark: cold backfill of a race against the local stand-in, by fetch mode
+
+Fetches every stage of a race with empty caches and an empty stage store
+(api_client.fetch_stages_gc) in three ways:
+
+- new connection per page: the shared session with "Connection: close",
+  i.e. a fresh TCP (and on the real site TLS) handshake for every page
+- procyclingstats fetching: pages fetched by procyclingstats' Scraper
+  (through the shared session)
+- pooled session + raw HTML: pages fetched by pcs_http with keep-alive and
+  gzip and handed to the parsers (the default)
+
+The stand-in adds --connect-latency once per new connection to stand in for
+the handshake. Rate limiting is turned off so only fetching is measured.
+
+Usage:
+    python benchmarks/backfill.py [--latency 0.05] [--connect-latency 0.1] [--repeat 3]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import streamlit as st  # noqa: E402
+import streamlit.logger  # noqa: E402
+
+# Streamlit warns about running without a script context on every call
+streamlit.logger.set_log_level("error")
+
+import api_client  # noqa: E402
+import html_archive  # noqa: E402
+import http_policy  # noqa: E402
+import pcs_http  # noqa: E402
+import stage_store  # noqa: E402
+from pcs_standin import start_standin  # noqa: E402
+from team_config import RACE_CONFIG  # noqa: E402
+
+STAGES = 21
+
+
+def closing_session():
+    """Shared-session settings, but every response closes its connection"""
+    session = pcs_http.create_session()
+    session.headers['Connection'] = 'close'
+    return session
+
+
+MODES = (
+    ("new connection per page", closing_session, True),
+    ("procyclingstats fetching", pcs_http.create_session, False),
+    ("pooled session + raw HTML", pcs_http.create_session, True),
+)
+
+
+def backfill(race_url):
+    """Fetch every stage from scratch"""
+    st.cache_data.clear()
+    # Stand-in pages must stay out of the app's stage store and page archive
+    scratch_dir = tempfile.mkdtemp()
+    stage_store.STAGE_STORE_PATH = os.path.join(scratch_dir, "stage_store.sqlite3")
+    html_archive.HTML_ARCHIVE_PATH = os.path.join(scratch_dir, "html_archive.sqlite3")
+    gc_by_stage = api_client.fetch_stages_gc(range(1, STAGES + 1), race_url)
+    return sum(1 for gc_data in gc_by_stage.values() if gc_data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold backfill wall time by fetch mode")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per request (default 0.05)")
+    parser.add_argument("--connect-latency", type=float, default=0.1,
+                        help="seconds per new connection (default 0.1)")
+    parser.add_argument("--repeat", type=int, default=3, help="backfills per mode (default 3)")
+    args = parser.parse_args()
+
+    http_policy.RATE_LIMIT = 0
+    server = start_standin(latency=args.latency, connect_latency=args.connect_latency,
+                           published_stages=STAGES)
+    api_client.set_pcs_base_url(server.base_url)
+    race_url = RACE_CONFIG["race_url"]
+
+    print(f"Cold backfill of {STAGES} stages, {api_client.STAGE_FETCH_CONCURRENCY} at a time "
+          f"(latency {args.latency}s, connect latency {args.connect_latency}s)")
+    for label, make_session, raw_html in MODES:
+        api_client.FETCH_RAW_HTML = raw_html
+        best = float("inf")
+        for _ in range(args.repeat):
+            pcs_http.set_session(make_session())
+            connections, requests, sent = server.connection_count, server.request_count, server.bytes_sent
+            start = time.perf_counter()
+            fetched = backfill(race_url)
+            best = min(best, time.perf_counter() - start)
+            connections = server.connection_count - connections
+            requests = server.request_count - requests
+            sent = server.bytes_sent - sent
+        print(f"  {label:<27} {best:6.2f} s  {fetched} stages  {requests} requests  "
+              f"{connections:3d} connections  {sent / 1024:7.0f} KiB")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
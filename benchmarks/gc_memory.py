@@ -0,0 +1,74 @@
+"""
+Memory used by a race's worth of GC data: raw procyclingstats dicts vs StageGC
+
+Builds 21 stages x 176 riders of GC entries shaped like Stage.gc() output
+(fresh strings per stage, as after parsing each page) and measures what each
+representation keeps alive with tracemalloc.
+
+Usage:
+    python benchmarks/gc_memory.py
+"""
+
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gc_records import StageGC  # noqa: E402
+
+STAGES = 21
+RIDERS = 176
+
+
+def make_stage_entries(stage_number):
+    """GC rows with every field procyclingstats parses"""
+    entries = []
+    for i in range(RIDERS):
+        seconds = stage_number * 4 * 3600 + i * 37
+        entries.append({
+            'rider_name': f"RIDER{i:03d} Firstname",
+            'rider_url': f"rider/firstname-rider{i:03d}",
+            'rider_number': i + 1,
+            'team_name': f"Team {i // 8:02d} Cycling",
+            'team_url': f"team/team-{i // 8:02d}-cycling-2025",
+            'rank': i + 1,
+            'prev_rank': i + 1,
+            'age': 20 + i % 15,
+            'nationality': "FR",
+            'time': f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}",
+            'bonus': "0:00:00",
+            'pcs_points': 0,
+            'uci_points': 0.0,
+        })
+    return entries
+
+
+def measure(build):
+    tracemalloc.start()
+    kept = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return kept, current
+
+
+def main():
+    _, raw_bytes = measure(lambda: [
+        {entry['rider_url']: entry for entry in make_stage_entries(n)}
+        for n in range(1, STAGES + 1)
+    ])
+
+    stage_entries = [make_stage_entries(n) for n in range(1, STAGES + 1)]
+    # Warm the shared lookup tables so they're measured separately
+    _, tables_bytes = measure(lambda: [StageGC.from_entries(stage_entries[0])])
+    _, compact_bytes = measure(lambda: [StageGC.from_entries(entries) for entries in stage_entries])
+
+    print(f"{STAGES} stages x {RIDERS} riders")
+    print(f"  raw parsed dicts:  {raw_bytes / 1024:8.1f} KiB")
+    print(f"  StageGC records:   {compact_bytes / 1024:8.1f} KiB"
+          f"  (+{tables_bytes / 1024:.1f} KiB shared name tables, once per process)")
+    print(f"  reduction:         {raw_bytes / max(compact_bytes, 1):8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Micro-benchmark: GC-only parsing of stage pages vs the full Stage.parse()
+
+Parses every stage page of a race from HTML already in memory (no network)
+three ways: building the page tree alone, api_client's GC-only extraction
+and procyclingstats' full parse. Uses recorded pages (see pcs_fixtures.py)
+where they exist and synthetic stage pages with every result tab otherwise.
+
+Usage:
+    python benchmarks/stage_parse.py [--repeat N] [--fixtures-dir DIR]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import streamlit.logger  # noqa: E402
+
+# Streamlit warns about running without a script context on every call
+streamlit.logger.set_log_level("error")
+
+from procyclingstats import Stage  # noqa: E402
+
+import api_client  # noqa: E402
+from pcs_fixtures import load_fixture  # noqa: E402
+from pcs_standin import SyntheticRace  # noqa: E402
+from team_config import RACE_CONFIG  # noqa: E402
+
+
+def load_pages(race_url, fixtures_dir):
+    """(url, html) of every stage page, recorded or synthetic"""
+    race = SyntheticRace(race_url)
+    pages = []
+    recorded = 0
+    for stage_number in range(1, race.total_stages + 1):
+        url = f"{race_url}/stage-{stage_number}"
+        html = load_fixture(url, fixtures_dir)
+        if html is None:
+            html = race.stage_page(stage_number, published=True)
+        else:
+            recorded += 1
+        pages.append((url, html))
+    return pages, recorded
+
+
+def best_per_page(pages, parse, repeat):
+    """Best total over `repeat` runs, in milliseconds per page"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for url, html in pages:
+            parse(Stage(url, html=html, update_html=False))
+        best = min(best, time.perf_counter() - start)
+    return best * 1000 / len(pages)
+
+
+def full_parse(stage):
+    return stage.parse()['gc']
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GC-only vs full stage page parsing")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per variant (default 5)")
+    parser.add_argument("--fixtures-dir", default=None, help="recorded pages (default pcs_fixtures.FIXTURES_DIR)")
+    args = parser.parse_args()
+
+    pages, recorded = load_pages(RACE_CONFIG["race_url"], args.fixtures_dir)
+
+    # Both paths must read the same GC
+    for url, html in pages:
+        stage = Stage(url, html=html, update_html=False)
+        full = [{field: entry[field] for field in api_client.GC_FIELDS} for entry in full_parse(stage)]
+        assert api_client._parse_stage_gc(stage) == full, url
+
+    tree_only = best_per_page(pages, lambda stage: None, args.repeat)
+    gc_only = best_per_page(pages, api_client._parse_stage_gc, args.repeat)
+    full = best_per_page(pages, full_parse, args.repeat)
+
+    print(f"{len(pages)} stage pages ({recorded} recorded, {len(pages) - recorded} synthetic), "
+          f"best of {args.repeat}")
+    print(f"  page tree only        {tree_only:7.2f} ms/page")
+    print(f"  GC-only parse         {gc_only:7.2f} ms/page")
+    print(f"  full Stage.parse()    {full:7.2f} ms/page")
+    print(f"  reduction             {full / gc_only:7.1f}x "
+          f"({(full - gc_only) * len(pages):.0f} ms per {len(pages)}-stage backfill)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark: loading a race through api_client against the local stand-in
+
+Starts pcs_standin in-process with the given latency and error rate, points
+api_client at it and times a cold load (empty caches and stage store) and a
+warm load (stage store filled, Streamlit caches cleared) of everything the
+app shows for a race. No network is used, so numbers are reproducible.
+
+Usage:
+    python benchmarks/standin_fetch.py [--latency 0.1] [--error-rate 0.0] [--stages 21]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep the benchmark's stage store and page archive away from the app's
+_scratch_dir = tempfile.mkdtemp()
+os.environ["FANTASY_STAGE_STORE"] = os.path.join(_scratch_dir, "stage_store.sqlite3")
+os.environ["FANTASY_HTML_ARCHIVE"] = os.path.join(_scratch_dir, "html_archive.sqlite3")
+
+import streamlit as st  # noqa: E402
+import streamlit.logger  # noqa: E402
+
+# Streamlit warns about running without a script context on every call
+streamlit.logger.set_log_level("error")
+
+import api_client  # noqa: E402
+from pcs_standin import start_standin  # noqa: E402
+from team_config import RACE_CONFIG  # noqa: E402
+
+
+def load_race(race_url):
+    """Everything app.main() loads for a race"""
+    standings = api_client.fetch_fantasy_standings(race_url=race_url)
+    api_client.fetch_stage_by_stage_data(standings['latest_stage'], race_url=race_url)
+    return standings['latest_stage']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.1, help="seconds per request (default 0.1)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of failed requests")
+    parser.add_argument("--stages", type=int, default=None, help="published stages (default: by date)")
+    args = parser.parse_args()
+
+    server = start_standin(latency=args.latency, error_rate=args.error_rate,
+                           published_stages=args.stages, seed=1)
+    api_client.set_pcs_base_url(server.base_url)
+    race_url = RACE_CONFIG["race_url"]
+
+    print(f"{race_url} via {server.base_url} (latency {args.latency}s, error rate {args.error_rate})")
+    for label in ("cold", "warm"):
+        st.cache_data.clear()
+        requests_before = server.request_count
+        start = time.perf_counter()
+        latest_stage = load_race(race_url)
+        elapsed = time.perf_counter() - start
+        requests = server.request_count - requests_before
+        print(f"  {label}: {elapsed:6.2f} s  {requests:3d} requests  "
+              f"({requests / elapsed:5.1f} req/s, latest stage {latest_stage})")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+Benchmark suite for the scoring and aggregation paths
+
+Drives calculate_team_time, fetch_fantasy_standings,
+fetch_stage_by_stage_data, stage_matrix and the chart builders in app.py
+with synthetic
+races at several scales (5 to 10,000 participants, 3-15 riders each, 21
+stages). Stage fetches are stubbed with prebuilt GC data, so only our own
+code is measured. Each step reports its best wall time over a few runs and
+its peak traced memory (tracemalloc, measured in a separate run).
+
+Results can be saved as a baseline; later runs compare against it and exit
+with status 1 when any step got slower or hungrier by more than the
+threshold. Baselines are machine-specific, so they aren't committed.
+
+Usage:
+    python benchmarks/suite.py                      # run and compare with the baseline
+    python benchmarks/suite.py --save-baseline      # run and save as the new baseline
+    python benchmarks/suite.py --scales 5,100 --threshold 25
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import streamlit as st  # noqa: E402
+import streamlit.logger  # noqa: E402
+
+# Streamlit warns about running without a script context on every call
+streamlit.logger.set_log_level("error")
+
+import api_client  # noqa: E402
+import app  # noqa: E402
+import stage_store  # noqa: E402
+import standings_engine  # noqa: E402
+from gc_records import StageGC  # noqa: E402
+from scoring import calculate_team_time, stage_matrix  # noqa: E402
+
+SCALES = (5, 100, 1000, 10000)
+STAGES = 21
+FIELD_SIZE = 176
+RACE_URL = "race/benchmark-tour/2025"
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+def make_race(participants, seed=0):
+    """
+    Synthetic race: GC per stage and rosters of 3-15 riders per participant
+
+    Returns:
+        (gc_by_stage, rosters)
+    """
+    rng = random.Random(seed)
+    riders = [f"rider/benchmark-rider-{i:03d}" for i in range(FIELD_SIZE)]
+
+    gc_by_stage = {}
+    totals = {rider: 0 for rider in riders}
+    for stage_number in range(1, STAGES + 1):
+        for rider in list(totals):
+            # A few riders abandon each stage
+            if stage_number > 1 and rng.random() < 0.005:
+                del totals[rider]
+                continue
+            totals[rider] += 4 * 3600 + rng.choice((0, 0, 0, 5, 30, 120, 900))
+        order = sorted(totals, key=totals.get)
+        gc_by_stage[stage_number] = StageGC.from_entries([
+            {
+                'rider_url': rider,
+                'rider_name': rider.split('/')[-1],
+                'team_name': f"Team {i % 22}",
+                'rank': i + 1,
+                'time': api_client.seconds_to_time_str(totals[rider])
+            }
+            for i, rider in enumerate(order)
+        ])
+
+    rosters = {
+        f"Participant {i:05d}": rng.sample(riders, rng.randint(3, 15))
+        for i in range(participants)
+    }
+    return gc_by_stage, rosters
+
+
+def _reset_state():
+    """Forget everything cached between runs so each run starts cold"""
+    st.cache_data.clear()
+    with standings_engine._scored_stages_lock:
+        standings_engine._scored_stages.clear()
+    stage_store.STAGE_STORE_PATH = os.path.join(tempfile.mkdtemp(), "stage_store.sqlite3")
+
+
+def _install_stubs(gc_by_stage, rosters):
+    """Serve stage GC from memory and score the synthetic rosters"""
+    api_client.fetch_stage_gc = lambda stage_number, race_url=None, _quiet=False: gc_by_stage.get(stage_number)
+    api_client.TEAM_ROSTERS = rosters
+
+
+def benchmark_steps(gc_by_stage, rosters, with_charts):
+    """
+    The steps to measure, in the order the app runs them
+
+    Each step is (name, setup, run): setup runs untimed and returns the
+    argument run is timed with.
+    """
+    latest_stage = STAGES
+    latest_gc = gc_by_stage[latest_stage]
+
+    def stage_data():
+        _reset_state()
+        return api_client.fetch_stage_by_stage_data(latest_stage, race_url=RACE_URL)
+
+    def matrix():
+        return stage_matrix(stage_data(), latest_stage)
+
+    steps = [
+        ("calculate_team_time", lambda: None,
+         lambda _: [calculate_team_time(riders, latest_gc) for riders in rosters.values()]),
+        ("fetch_fantasy_standings", _reset_state,
+         lambda _: api_client.fetch_fantasy_standings(latest_stage, race_url=RACE_URL)),
+        ("fetch_stage_by_stage_data", _reset_state,
+         lambda _: api_client.fetch_stage_by_stage_data(latest_stage, race_url=RACE_URL)),
+        ("stage_matrix", stage_data, lambda data: stage_matrix(data, latest_stage)),
+    ]
+    if with_charts:
+        steps += [
+            ("cumulative_time_chart", matrix,
+             lambda matrix: app.create_cumulative_time_chart(matrix, latest_stage)),
+            ("stage_performance_chart", matrix,
+             lambda matrix: app.create_stage_performance_chart(matrix, latest_stage)),
+            ("gap_evolution_chart", matrix,
+             lambda matrix: app.create_gap_evolution_chart(matrix, latest_stage)),
+        ]
+    return steps
+
+
+def measure(setup, run, repeat):
+    """
+    Best wall time over `repeat` runs, then peak traced memory of one more
+
+    Returns:
+        (seconds, peak bytes)
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        argument = setup()
+        start = time.perf_counter()
+        run(argument)
+        best = min(best, time.perf_counter() - start)
+
+    argument = setup()
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    run(argument)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def run_suite(scales, repeat, charts_max):
+    """
+    Run every step at every scale
+
+    Returns:
+        {"<participants>/<step>": {"seconds": ..., "peak_bytes": ...}}
+    """
+    results = {}
+    for participants in scales:
+        gc_by_stage, rosters = make_race(participants)
+        _install_stubs(gc_by_stage, rosters)
+        for name, setup, run in benchmark_steps(gc_by_stage, rosters, participants <= charts_max):
+            seconds, peak = measure(setup, run, repeat)
+            results[f"{participants}/{name}"] = {"seconds": seconds, "peak_bytes": peak}
+            print(f"{participants:>6} participants  {name:<26} {seconds * 1000:10.2f} ms  "
+                  f"{peak / 1024:10.0f} KiB peak", flush=True)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Compare results with a baseline
+
+    Returns:
+        List of regression descriptions (empty if none)
+    """
+    regressions = []
+    for key, result in results.items():
+        before = baseline.get(key)
+        if before is None:
+            continue
+        for metric, unit, scale in (("seconds", "ms", 1000), ("peak_bytes", "KiB", 1 / 1024)):
+            if before[metric] <= 0:
+                continue
+            change = (result[metric] - before[metric]) / before[metric] * 100
+            if change > threshold:
+                regressions.append(
+                    f"{key} {metric}: {before[metric] * scale:.1f} -> {result[metric] * scale:.1f} {unit} "
+                    f"(+{change:.0f}%)"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scoring and aggregation paths")
+    parser.add_argument("--scales", default=",".join(str(s) for s in SCALES),
+                        help="comma-separated participant counts (default 5,100,1000,10000)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per step (default 3)")
+    parser.add_argument("--charts-max", type=int, default=1000,
+                        help="skip the chart builders above this many participants (default 1000)")
+    parser.add_argument("--threshold", type=float, default=20.0,
+                        help="percent slowdown or memory growth that fails the run (default 20)")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline file")
+    parser.add_argument("--save-baseline", action="store_true", help="save the results as the baseline")
+    args = parser.parse_args()
+
+    scales = [int(s) for s in args.scales.split(",")]
+    results = run_suite(scales, args.repeat, args.charts_max)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"\nSaved baseline to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\nRegressions over {args.threshold:.0f}%:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print(f"\nNo regressions over {args.threshold:.0f}% against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""
+Micro-benchmark: batch GC time parsing vs per-value time_str_to_seconds
+
+Parses a race's worth of GC time columns (21 stages x 176 riders) with the
+old one-string-at-a-time function and with parse_gc_times, which converts a
+whole column per call and also understands gaps, same-time markers and
+day-overflow times.
+
+Usage:
+    python benchmarks/time_parser.py [--repeat N]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gc_times import parse_gc_times, time_str_to_seconds  # noqa: E402
+
+STAGES = 21
+RIDERS = 176
+
+
+def make_columns(mixed: bool):
+    """GC time columns; `mixed` adds gaps, same-time markers and day formats"""
+    columns = []
+    for stage in range(1, STAGES + 1):
+        leader = stage * 4 * 3600
+        column = []
+        for i in range(RIDERS):
+            seconds = leader + i * 37
+            if mixed and i and i % 7 == 0:
+                column.append(",,")
+            elif mixed and i and i % 5 == 0:
+                gap = seconds - leader
+                if gap < 3600:
+                    column.append(f"+{gap // 60}:{gap % 60:02d}")
+                else:
+                    column.append(f"+{gap // 3600}:{gap % 3600 // 60:02d}:{gap % 60:02d}")
+            elif mixed and i % 11 == 0 and seconds >= 86400:
+                days, rest = divmod(seconds, 86400)
+                column.append(f"{days} day{'s' if days > 1 else ''}, {rest // 3600}:{rest % 3600 // 60:02d}:{rest % 60:02d}")
+            else:
+                column.append(f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}")
+        columns.append(column)
+    return columns
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=50, help="timing repetitions (default 50)")
+    args = parser.parse_args()
+
+    for label, mixed in (("H:MM:SS only", False), ("mixed formats", True)):
+        columns = make_columns(mixed)
+
+        old = min(timeit.repeat(
+            lambda: [[time_str_to_seconds(value) for value in column] for column in columns],
+            number=1, repeat=args.repeat))
+        new = min(timeit.repeat(
+            lambda: [parse_gc_times(column) for column in columns],
+            number=1, repeat=args.repeat))
+
+        old_misses = sum(1 for column in columns for value in column if time_str_to_seconds(value) == 0)
+        new_errors = sum(len(parse_gc_times(column)[1]) for column in columns)
+
+        print(f"{label} ({STAGES} x {RIDERS} values)")
+        print(f"  time_str_to_seconds: {old * 1000:7.2f} ms  ({old_misses} values silently read as 0)")
+        print(f"  parse_gc_times:      {new * 1000:7.2f} ms  ({new_errors} values unreadable)")
+
+
+if __name__ == "__main__":
+    main()
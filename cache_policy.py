@@ -0,0 +1,227 @@
+"""
+Calendar-aware cache lifetimes
+
+How long scraped race data stays good depends on where the race is in its
+calendar (races_config.RACES plus the stage dates from the race overview
+page):
+
+- completed races and finalized stages never change: cached forever (a
+  stage is only taken to be final by its date once the race calendar is
+  known; the fallback of one stage a day ignores rest days)
+- during the live window of a stage (from shortly before its expected
+  finish until results are normally out): LIVE_TTL
+- the rest of a stage day: DAY_TTL
+- overnight, rest days and before the race: RELAXED_TTL
+
+Streamlit's cache_data only takes a fixed ttl, so cached functions take a
+ttl_bucket(...) argument instead: it changes value every cache_ttl(...)
+seconds (and never for data cached forever), which makes the next call a
+cache miss. The ingestion worker uses cache_ttl to decide when a race is
+due again.
+
+Times are in UTC; the defaults suit European races.
+"""
+
+import threading
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, List, Optional
+
+from races_config import RACES
+
+# Expected stage finish, and the results window around it
+STAGE_FINISH_UTC = time(15, 30)
+STAGE_RESULTS_WINDOW = (timedelta(hours=2), timedelta(hours=4))
+
+# Night hours (UTC) with relaxed caching, [start, end)
+NIGHT_UTC = (time(21, 0), time(7, 0))
+
+# Seconds cached data stays good (None is forever)
+LIVE_TTL = 60
+DAY_TTL = 300
+RELAXED_TTL = 3600
+
+# A stage is final once this long has passed since its day, a race once this
+# long has passed since its end date (or when it is marked is_complete)
+STAGE_FINAL_AFTER = timedelta(days=1)
+RACE_FINAL_AFTER = timedelta(days=2)
+
+# Unpublished stages are re-checked every NOT_PUBLISHED_NEAR_TTL seconds
+# during the results window. Before it they are remembered until the window
+# opens (at most NOT_PUBLISHED_MAX_TTL), after it for NOT_PUBLISHED_LATE_TTL.
+NOT_PUBLISHED_NEAR_TTL = 60
+NOT_PUBLISHED_LATE_TTL = 300
+NOT_PUBLISHED_MAX_TTL = 6 * 3600
+
+# Stage dates per race_url, from the race overview page
+_stage_calendars: Dict[str, List[date]] = {}
+_stage_calendars_lock = threading.Lock()
+
+
+def race_for_url(race_url: str) -> Optional[Dict]:
+    """Get the configuration of the race with this URL, if there is one"""
+    for race in RACES.values():
+        if race['race_url'] == race_url:
+            return race
+    return None
+
+
+def set_stage_calendar(race_url: str, calendar: List[date]) -> None:
+    """
+    Remember the stage dates of a race
+
+    Args:
+        race_url: URL path for the race
+        calendar: Date of every stage, in stage order
+    """
+    with _stage_calendars_lock:
+        _stage_calendars[race_url] = list(calendar)
+
+
+def has_stage_calendar(race_url: str) -> bool:
+    """Whether the stage dates of a race are known from its overview page"""
+    with _stage_calendars_lock:
+        return bool(_stage_calendars.get(race_url))
+
+
+def stage_dates(race_url: str) -> List[date]:
+    """
+    Get the date of every stage of a race
+
+    Args:
+        race_url: URL path for the race
+
+    Returns:
+        Stage dates in stage order: the race calendar if it's known, else one
+        stage a day from the configured start date (empty for unknown races).
+        The fallback ignores rest days, so later stages come out too early.
+    """
+    with _stage_calendars_lock:
+        calendar = _stage_calendars.get(race_url)
+    if calendar:
+        return calendar
+
+    race = race_for_url(race_url)
+    if race is None or not race.get('start_date'):
+        return []
+    start_date = date.fromisoformat(race['start_date'])
+    return [start_date + timedelta(days=i) for i in range(race.get('total_stages', 21))]
+
+
+def stage_date(race_url: str, stage_number: int) -> Optional[date]:
+    """Date of a stage (see stage_dates), or None if it isn't known"""
+    calendar = stage_dates(race_url)
+    if 0 < stage_number <= len(calendar):
+        return calendar[stage_number - 1]
+    return None
+
+
+def _now(now: Optional[datetime]) -> datetime:
+    return now if now is not None else datetime.now(timezone.utc)
+
+
+def race_is_complete(race_url: str, now: Optional[datetime] = None) -> bool:
+    """
+    Check whether a race's results are final
+
+    Args:
+        race_url: URL path for the race
+        now: Current time (UTC)
+
+    Returns:
+        True if the race is marked complete or ended RACE_FINAL_AFTER ago
+    """
+    race = race_for_url(race_url)
+    if race is None:
+        return False
+    if race.get('is_complete'):
+        return True
+    end_date = race.get('end_date')
+    return bool(end_date) and _now(now).date() >= date.fromisoformat(end_date) + RACE_FINAL_AFTER
+
+
+def cache_ttl(race_url: str, stage_number: Optional[int] = None,
+              now: Optional[datetime] = None) -> Optional[float]:
+    """
+    Get how long data of a race (or of one of its stages) stays good
+
+    Args:
+        race_url: URL path for the race
+        stage_number: Stage the data is about (None for race-wide data)
+        now: Current time (UTC)
+
+    Returns:
+        Seconds, or None for data that never changes
+    """
+    now = _now(now)
+    if race_is_complete(race_url, now):
+        return None
+
+    today = now.date()
+    # Fallback dates run ahead of the real ones after a rest day
+    if stage_number is not None and has_stage_calendar(race_url):
+        day = stage_date(race_url, stage_number)
+        if day is not None and today >= day + STAGE_FINAL_AFTER:
+            return None
+
+    calendar = stage_dates(race_url)
+    if today not in calendar:
+        # Rest day, before the start or an unknown race
+        return RELAXED_TTL
+
+    expected_finish = datetime.combine(today, STAGE_FINISH_UTC, tzinfo=timezone.utc)
+    if expected_finish - STAGE_RESULTS_WINDOW[0] <= now < expected_finish + STAGE_RESULTS_WINDOW[1]:
+        return LIVE_TTL
+
+    night_start, night_end = NIGHT_UTC
+    if now.time() >= night_start or now.time() < night_end:
+        return RELAXED_TTL
+    return DAY_TTL
+
+
+def ttl_bucket(race_url: str, stage_number: Optional[int] = None, now: Optional[datetime] = None) -> str:
+    """
+    Get a cache key part that changes whenever cached data is due again
+
+    Args:
+        race_url: URL path for the race
+        stage_number: Stage the data is about (None for race-wide data)
+        now: Current time (UTC)
+
+    Returns:
+        "forever" for data that never changes, else the TTL and the number
+        of the current TTL-long period
+    """
+    now = _now(now)
+    ttl = cache_ttl(race_url, stage_number, now)
+    if ttl is None:
+        return "forever"
+    return f"{ttl:g}s/{int(now.timestamp() // ttl)}"
+
+
+def not_published_ttl(race_url: str, stage_number: int, now: Optional[datetime] = None) -> float:
+    """
+    Get how long to remember that a stage isn't published
+
+    Args:
+        race_url: URL path for the race
+        stage_number: Stage number
+        now: Current time (UTC)
+
+    Returns:
+        Seconds: short during the stage's results window, until the window
+        opens (at most NOT_PUBLISHED_MAX_TTL) for stages still to come, and
+        NOT_PUBLISHED_LATE_TTL once it has passed without results (e.g. a
+        late or neutralized stage) or if the stage date isn't known
+    """
+    now = _now(now)
+    day = stage_date(race_url, stage_number)
+    if day is None:
+        return NOT_PUBLISHED_LATE_TTL
+
+    expected_finish = datetime.combine(day, STAGE_FINISH_UTC, tzinfo=timezone.utc)
+    until_window = (expected_finish - STAGE_RESULTS_WINDOW[0] - now).total_seconds()
+    if until_window > 0:
+        return min(max(until_window, NOT_PUBLISHED_NEAR_TTL), NOT_PUBLISHED_MAX_TTL)
+    if now < expected_finish + STAGE_RESULTS_WINDOW[1]:
+        return NOT_PUBLISHED_NEAR_TTL
+    return NOT_PUBLISHED_LATE_TTL
@@ -0,0 +1,61 @@
+"""
+pytest configuration
+
+test_api.py and test_gc_data.py are scripts that explore the live
+procyclingstats site when run; they aren't collected.
+
+The `standin` fixture serves procyclingstats pages from pcs_standin and
+points api_client at it, with an empty stage store, page archive and caches,
+so tests never touch the live site. Parametrize it indirectly to set the
+number of published stages:
+
+    @pytest.mark.parametrize("standin", [1, 21], indirect=True)
+    def test_something(standin): ...
+"""
+
+import os
+
+import pytest
+import streamlit as st
+import streamlit.logger
+from procyclingstats.scraper import Scraper
+
+# Streamlit warns about running without a script context on every call
+streamlit.logger.set_log_level("error")
+
+collect_ignore = ["test_api.py", "test_gc_data.py"]
+
+
+@pytest.fixture
+def standin(request, monkeypatch, tmp_path):
+    """Running pcs_standin server that api_client scrapes instead of the site"""
+    import api_client
+    import cache_policy
+    import html_archive
+    import http_policy
+    import stage_store
+    import standings_engine
+    from pcs_standin import start_standin
+
+    server = start_standin(published_stages=getattr(request, "param", None), seed=1)
+
+    monkeypatch.setattr(Scraper, "BASE_URL", Scraper.BASE_URL)
+    api_client.set_pcs_base_url(server.base_url)
+    monkeypatch.setattr(stage_store, "STAGE_STORE_PATH", os.path.join(tmp_path, "stage_store.sqlite3"))
+    monkeypatch.setattr(html_archive, "HTML_ARCHIVE_PATH", os.path.join(tmp_path, "html_archive.sqlite3"))
+
+    # Nothing learned from earlier tests (or another host) carries over
+    st.cache_data.clear()
+    for module, name in ((api_client, '_not_published'), (api_client, '_latest_stage_hints'),
+                         (api_client, '_last_refresh'), (api_client, '_snapshots'),
+                         (cache_policy, '_stage_calendars'), (http_policy, '_policies'),
+                         (standings_engine, '_scored_stages'), (standings_engine, '_roster_indexes')):
+        monkeypatch.setattr(module, name, {})
+    for swr in (api_client._standings_swr, api_client._stage_matrix_swr):
+        swr.discard(lambda key: True)
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+    st.cache_data.clear()
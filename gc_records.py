@@ -0,0 +1,252 @@
+"""
+Compact GC records
+
+procyclingstats returns a dict of a dozen fields for every rider in the GC,
+and we only ever read five of them. StageGC keeps one stage's GC as four
+parallel integer arrays (rider id, rank, time in seconds, team id). Rider
+URLs, rider names and team names are interned once in lookup tables shared
+by every stage, and times are parsed when the stage is ingested instead of
+on every lookup.
+
+Ids are only meaningful inside the running process, so anything written to
+disk goes through StageGC.to_entries / StageGC.from_entries.
+"""
+
+import threading
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from gc_times import parse_gc_times, seconds_to_time_str
+
+
+class InternTable:
+    """Thread-safe two-way lookup between strings and small integer ids"""
+
+    __slots__ = ('_ids', '_values', '_lock')
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._values: List[str] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def intern(self, value: str) -> int:
+        """Get the id of a string, adding it if it is new"""
+        value_id = self._ids.get(value)
+        if value_id is None:
+            with self._lock:
+                value_id = self._ids.get(value)
+                if value_id is None:
+                    value_id = len(self._values)
+                    self._values.append(value)
+                    self._ids[value] = value_id
+        return value_id
+
+    def lookup(self, value: str) -> Optional[int]:
+        """Get the id of a string without adding it"""
+        return self._ids.get(value)
+
+    def value(self, value_id: int) -> str:
+        """Get the string for an id"""
+        return self._values[value_id]
+
+
+# Shared by every stage of every race
+RIDER_URLS = InternTable()
+TEAM_NAMES = InternTable()
+
+# Display name per rider id (names are interned too, riders share few)
+_RIDER_NAMES = InternTable()
+_rider_name_ids = array('i')
+_rider_name_lock = threading.Lock()
+
+# Stored instead of a team id / rank when the GC doesn't have one
+NO_TEAM = -1
+NO_RANK = 0
+
+
+def _set_rider_name(rider_id: int, name: Optional[str]) -> None:
+    """Remember a rider's display name"""
+    name_id = _RIDER_NAMES.intern(name) if name else -1
+    with _rider_name_lock:
+        while len(_rider_name_ids) <= rider_id:
+            _rider_name_ids.append(-1)
+        if name_id != -1:
+            _rider_name_ids[rider_id] = name_id
+
+
+def rider_name(rider_id: int) -> str:
+    """Get a rider's display name (falls back to one built from the URL)"""
+    if rider_id < len(_rider_name_ids) and _rider_name_ids[rider_id] != -1:
+        return _RIDER_NAMES.value(_rider_name_ids[rider_id])
+    return RIDER_URLS.value(rider_id).split('/')[-1].replace('-', ' ').title()
+
+
+class GCRecord:
+    """One rider's line in a stage GC"""
+
+    __slots__ = ('rider_id', 'rank', 'time_seconds', 'team_id')
+
+    def __init__(self, rider_id: int, rank: int, time_seconds: int, team_id: int):
+        self.rider_id = rider_id
+        self.rank = rank
+        self.time_seconds = time_seconds
+        self.team_id = team_id
+
+    @property
+    def rider_url(self) -> str:
+        return RIDER_URLS.value(self.rider_id)
+
+    @property
+    def rider_name(self) -> str:
+        return rider_name(self.rider_id)
+
+    @property
+    def team_name(self) -> Optional[str]:
+        return TEAM_NAMES.value(self.team_id) if self.team_id != NO_TEAM else None
+
+    @property
+    def time(self) -> str:
+        return seconds_to_time_str(self.time_seconds)
+
+    def __repr__(self) -> str:
+        return f"GCRecord({self.rider_url!r}, rank={self.rank}, time={self.time!r})"
+
+
+class StageGC:
+    """
+    The GC after one stage, stored as parallel arrays in GC order
+
+    Behaves like a read-only collection of rider URLs: `len()`, `in`,
+    iteration and truthiness work as they did on the old dict keyed by
+    rider_url.
+    """
+
+    __slots__ = ('rider_ids', 'ranks', 'times', 'team_ids', 'unparsed', '_rows')
+
+    def __init__(self, rider_ids: array, ranks: array, times: array, team_ids: array,
+                 unparsed: Tuple[Tuple[str, object], ...] = ()):
+        self.rider_ids = rider_ids
+        self.ranks = ranks
+        self.times = times
+        self.team_ids = team_ids
+        # (rider_url, raw time) for every time that couldn't be read
+        self.unparsed = unparsed
+        self._rows = None
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[Dict]) -> 'StageGC':
+        """
+        Ingest GC entries as parsed by procyclingstats (or from to_entries)
+
+        Entries without a rider_url are skipped; a rider listed twice keeps
+        their last entry, as with the old dict. The whole time column is
+        parsed in one go; riders whose time can't be read get 0 seconds
+        (so they aren't counted) and are listed in `unparsed`.
+
+        Args:
+            entries: GC rows with rider_url, rider_name, team_name, rank and time
+
+        Returns:
+            StageGC holding the entries
+        """
+        entries = list(entries)
+        seconds_column, errors = parse_gc_times([entry.get('time') for entry in entries])
+        unparsed = tuple(
+            (entries[index].get('rider_url'), value)
+            for index, value in errors if entries[index].get('rider_url')
+        )
+
+        rows_by_rider: Dict[int, int] = {}
+        rider_ids, ranks, times, team_ids = array('i'), array('i'), array('i'), array('i')
+
+        for entry, seconds in zip(entries, seconds_column):
+            rider_url = entry.get('rider_url')
+            if not rider_url:
+                continue
+            rider_id = RIDER_URLS.intern(rider_url)
+            _set_rider_name(rider_id, entry.get('rider_name'))
+
+            team_name = entry.get('team_name')
+            team_id = TEAM_NAMES.intern(team_name) if team_name else NO_TEAM
+            rank = entry.get('rank')
+            rank = rank if isinstance(rank, int) and rank > 0 else NO_RANK
+            seconds = seconds or 0
+
+            row = rows_by_rider.get(rider_id)
+            if row is None:
+                rows_by_rider[rider_id] = len(rider_ids)
+                rider_ids.append(rider_id)
+                ranks.append(rank)
+                times.append(seconds)
+                team_ids.append(team_id)
+            else:
+                ranks[row], times[row], team_ids[row] = rank, seconds, team_id
+
+        return cls(rider_ids, ranks, times, team_ids, unparsed)
+
+    def to_entries(self) -> List[Dict]:
+        """
+        Convert back to plain GC entries (for storing on disk)
+
+        Returns:
+            List of dicts with rider_url, rider_name, team_name, rank and time
+        """
+        # Unreadable times are written back as they were, so they're reported again
+        raw_times = dict(self.unparsed)
+        return [
+            {
+                'rider_url': record.rider_url,
+                'rider_name': record.rider_name,
+                'team_name': record.team_name,
+                'rank': record.rank if record.rank != NO_RANK else None,
+                'time': raw_times.get(record.rider_url, record.time)
+            }
+            for record in self.records()
+        ]
+
+    def _row_index(self) -> Dict[int, int]:
+        if self._rows is None:
+            self._rows = {rider_id: row for row, rider_id in enumerate(self.rider_ids)}
+        return self._rows
+
+    def __len__(self) -> int:
+        return len(self.rider_ids)
+
+    def __contains__(self, rider_url: str) -> bool:
+        rider_id = RIDER_URLS.lookup(rider_url)
+        return rider_id is not None and rider_id in self._row_index()
+
+    def __iter__(self) -> Iterator[str]:
+        return (RIDER_URLS.value(rider_id) for rider_id in self.rider_ids)
+
+    def __getstate__(self):
+        # The row index is rebuilt on demand; don't pickle it into caches
+        return (self.rider_ids, self.ranks, self.times, self.team_ids, self.unparsed)
+
+    def __setstate__(self, state):
+        self.rider_ids, self.ranks, self.times, self.team_ids, self.unparsed = state
+        self._rows = None
+
+    def record(self, rider_url: str) -> Optional[GCRecord]:
+        """
+        Get a rider's GC record
+
+        Args:
+            rider_url: Rider URL (e.g. "rider/tadej-pogacar")
+
+        Returns:
+            GCRecord, or None if the rider isn't in this GC (DNF, DNS, etc.)
+        """
+        rider_id = RIDER_URLS.lookup(rider_url)
+        row = self._row_index().get(rider_id) if rider_id is not None else None
+        if row is None:
+            return None
+        return GCRecord(rider_id, self.ranks[row], self.times[row], self.team_ids[row])
+
+    def records(self) -> Iterator[GCRecord]:
+        """Iterate over every record in GC order"""
+        for row in range(len(self.rider_ids)):
+            yield GCRecord(self.rider_ids[row], self.ranks[row], self.times[row], self.team_ids[row])
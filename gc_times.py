@@ -0,0 +1,134 @@
+"""
+Parsing and formatting of GC times
+
+procyclingstats reports cumulative GC times as "H:MM:SS" strings. They are
+converted to whole seconds once, when GC data is ingested (see gc_records),
+and formatted back only for display.
+"""
+
+import re
+from typing import List, Optional, Sequence, Tuple
+
+
+def time_str_to_seconds(time_str: str) -> int:
+    """
+    Convert time string (H:MM:SS or HH:MM:SS) to seconds
+
+    Args:
+        time_str: Time in format "H:MM:SS" or "HH:MM:SS"
+
+    Returns:
+        Total seconds as integer
+    """
+    try:
+        if not time_str or time_str == "0:00:00":
+            return 0
+
+        parts = time_str.split(':')
+        if len(parts) != 3:
+            return 0
+
+        hours = int(parts[0])
+        minutes = int(parts[1])
+        seconds = int(parts[2])
+
+        return hours * 3600 + minutes * 60 + seconds
+    except Exception:
+        return 0
+
+
+def seconds_to_time_str(seconds: int) -> str:
+    """
+    Convert seconds to time string format
+
+    Args:
+        seconds: Total seconds
+
+    Returns:
+        Time string in format "H:MM:SS"
+    """
+    if seconds == 0:
+        return "0:00:00"
+
+    hours = seconds // 3600
+    minutes = (seconds % 3600) // 60
+    secs = seconds % 60
+
+    return f"{hours}:{minutes:02d}:{secs:02d}"
+
+
+# "[+][N day(s), ][H:]MM:SS[.fff]" - the leading "+" marks a gap to the leader
+_TIME_PATTERN = re.compile(
+    r"^\s*(?P<gap>\+)?\s*"
+    r"(?:(?P<days>\d+)\s*(?:days?|d)\s*,?\s*)?"
+    r"(?:(?P<hours>\d+):)?(?P<minutes>\d{1,2}):(?P<seconds>\d{1,2})"
+    r"(?:[.,]\d+)?\s*$"
+)
+
+# Same time as the rider above (an empty or missing cell is not one: it is
+# reported instead of silently copying the previous rider's time)
+_SAME_TIME_MARKERS = {",,", "s.t.", "st", "s.t"}
+
+
+def parse_gc_times(values: Sequence[Optional[str]]) -> Tuple[List[Optional[int]], List[Tuple[int, object]]]:
+    """
+    Convert a whole GC time column to seconds in one call
+
+    Understands every format procyclingstats uses for GC times:
+    "H:MM:SS" (hours may exceed 24), "MM:SS", "N day(s), H:MM:SS",
+    "+gap" (added to the first rider's time), and ",," / "s.t." same-time
+    markers (the rider above's time). Fractions of a second are dropped.
+    Missing or empty cells, values that aren't strings (e.g. numbers from a
+    changed table parser) and a zero time anywhere but the leader's row
+    can't be read, like any other unknown format.
+
+    Args:
+        values: Time values in GC order
+
+    Returns:
+        Tuple of (seconds, errors): seconds has one entry per value, None
+        where the value couldn't be read; errors lists (index, value) for
+        every value that couldn't be read
+    """
+    seconds: List[Optional[int]] = []
+    errors: List[Tuple[int, object]] = []
+    leader_seconds = None
+    previous = None
+
+    for index, value in enumerate(values):
+        parsed = None
+        absolute = True
+        text = value.strip() if isinstance(value, str) else value
+
+        if isinstance(text, str) and text in _SAME_TIME_MARKERS:
+            parsed = previous
+        elif isinstance(text, str) and text:
+            # Fast path for the usual absolute "H:MM:SS"
+            parts = text.split(':')
+            if len(parts) == 3 and parts[0].isdigit() and parts[1].isdigit() and parts[2].isdigit():
+                parsed = int(parts[0]) * 3600 + int(parts[1]) * 60 + int(parts[2])
+            else:
+                match = _TIME_PATTERN.match(text)
+                if match:
+                    parsed = (
+                        int(match.group('days') or 0) * 86400
+                        + int(match.group('hours') or 0) * 3600
+                        + int(match.group('minutes')) * 60
+                        + int(match.group('seconds'))
+                    )
+                    if match.group('gap'):
+                        parsed = parsed + leader_seconds if leader_seconds is not None else None
+                        absolute = False
+            # Nobody behind the leader has an absolute time of zero
+            if absolute and parsed == 0 and leader_seconds is not None:
+                parsed = None
+
+        if parsed is None:
+            errors.append((index, value))
+        else:
+            if leader_seconds is None:
+                leader_seconds = parsed
+            previous = parsed
+        seconds.append(parsed)
+
+    return seconds, errors
@@ -8,102 +8,382 @@ Setup:
 1. Create Google Sheet with columns: Race ID, Participant, Rider1, Rider2, Rider3, ...
 2. File → Share → Publish to web → Publish as CSV
 3. Copy the sheet URL to ROSTER_SHEET_URL in races_config.py
+
+Page loads never wait on Google: load_rosters_from_sheet serves the rosters
+read last (after a restart, the last good copy on disk) and checks the sheet
+in a background thread every SHEET_CHECK_INTERVAL seconds, with a
+conditional request (ETag / Last-Modified from the previous download). The
+downloaded CSV is kept on disk with a hash of its content once it parses.
+An unchanged sheet isn't parsed again, and when it did change only the
+races whose rosters changed get new roster dicts; listeners (see
+add_roster_listener) are told about those races so cached standings for
+their old rosters can be dropped. sheet_status() tells when the rosters
+were last refreshed. The disk copy location can be changed with the
+FANTASY_ROSTER_SHEET_CACHE environment variable.
 """
 
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
 import pandas as pd
-import streamlit as st
+import requests
+
+from singleflight import SingleFlight
+
+ROSTER_SHEET_CACHE_DIR = os.environ.get(
+    "FANTASY_ROSTER_SHEET_CACHE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "roster_sheets")
+)
+
+# Seconds between checks of the sheet for changes
+SHEET_CHECK_INTERVAL = float(os.environ.get("FANTASY_ROSTER_SHEET_TTL", "3600"))
+
+# Seconds before checking again after a failed check
+SHEET_RETRY_INTERVAL = 300
+
+# Seconds to wait for Google when downloading the sheet
+SHEET_TIMEOUT = 15
+
+# Parsed sheet per sheet URL: content_hash, etag, last_modified, rosters
+# ({race_id: {participant: [rider_urls]}}), checked_at (last check, even a
+# failed one), synced_at (when the rosters were last known to match the
+# sheet), source ('sheet' or 'disk copy') and error (of the last check)
+_sheets: Dict[str, Dict] = {}
+_sheets_lock = threading.Lock()
+_sheet_loads = SingleFlight()
+_refreshing = set()
+
+# Called with (race_id, old rosters, new rosters) when a race's rosters change
+_roster_listeners: List[Callable[[str, Dict[str, List[str]], Dict[str, List[str]]], None]] = []
+
+
+def add_roster_listener(listener: Callable[[str, Dict[str, List[str]], Dict[str, List[str]]], None]) -> None:
+    """
+    Get told when a race's rosters change in the sheet
+
+    Args:
+        listener: Called with (race_id, old rosters, new rosters) for every
+            race whose rosters changed (old rosters are empty for a new race)
+    """
+    _roster_listeners.append(listener)
+
+
+def sheet_csv_url(sheet_url: str) -> str:
+    """Convert a Google Sheets URL to its CSV export URL"""
+    sheet_id = sheet_url.split('/d/')[1].split('/')[0]
+    return f"https://docs.google.com/spreadsheets/d/{sheet_id}/export?format=csv&gid=0"
+
+
+def parse_rosters(df: pd.DataFrame) -> Dict[str, Dict[str, List[str]]]:
+    """
+    Reshape a roster sheet into rosters per race
+
+    Rows without a race id or participant are skipped, as are empty rider
+    cells. A participant listed twice for a race keeps their last row (in
+    the place of their first). The whole sheet is reshaped in one melt and
+    group-by instead of row by row.
+
+    Args:
+        df: Sheet with Race ID, Participant and Rider1, Rider2, ... columns
+
+    Returns:
+        dict: Rosters organized by race_id
+              Format: {race_id: {participant: [rider_urls]}}
+
+    Raises:
+        ValueError: If the Race ID or Participant column is missing
+    """
+    # Strip whitespace from column names
+    df.columns = df.columns.str.strip()
+
+    # Validate required columns
+    if 'Race ID' not in df.columns or 'Participant' not in df.columns:
+        raise ValueError("Sheet must have 'Race ID' and 'Participant' columns")
+
+    rider_columns = [col for col in df.columns if col.startswith('Rider')]
+    race_order = list(df['Race ID'].dropna().unique())
+
+    teams = df.loc[df['Race ID'].notna() & df['Participant'].notna(), ['Race ID', 'Participant'] + rider_columns]
+    teams['Participant'] = teams['Participant'].astype(str).str.strip()
+    # Team number in order of first appearance; a repeated participant keeps their last row
+    teams['team'] = teams.groupby(['Race ID', 'Participant'], sort=False).ngroup()
+    teams = teams.drop_duplicates(['Race ID', 'Participant'], keep='last').sort_values('team')
+
+    # One row per (team, rider cell), in rider column order
+    riders = teams.melt(id_vars=['team'], value_vars=rider_columns, var_name='column', value_name='rider')
+    riders = riders[riders['rider'].notna()]
+    riders['rider'] = riders['rider'].astype(str).str.strip()
+    riders = riders[riders['rider'] != '']
+    riders['column'] = riders['column'].map({col: n for n, col in enumerate(rider_columns)})
+    riders_by_team = (
+        riders.sort_values(['team', 'column'], kind='stable')
+        .groupby('team', sort=False)['rider'].agg(list)
+        .to_dict()
+    )
+
+    rosters_by_race = {}
+    for race_id, participant, team in zip(teams['Race ID'], teams['Participant'], teams['team']):
+        rosters_by_race.setdefault(race_id, {})[participant] = riders_by_team.get(team, [])
+
+    return {race_id: rosters_by_race[race_id] for race_id in race_order if race_id in rosters_by_race}
+
+
+def _disk_copy_paths(sheet_url: str):
+    """(CSV path, metadata path) of a sheet's disk copy"""
+    name = hashlib.sha1(sheet_url.encode("utf-8")).hexdigest()[:16]
+    base = os.path.join(ROSTER_SHEET_CACHE_DIR, name)
+    return base + ".csv", base + ".json"
+
+
+def _load_disk_copy(sheet_url: str) -> Optional[Dict]:
+    """Read a sheet's disk copy: metadata plus 'content' (bytes), or None"""
+    csv_path, meta_path = _disk_copy_paths(sheet_url)
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(csv_path, "rb") as f:
+            content = f.read()
+    except (OSError, ValueError):
+        return None
+    if hashlib.sha1(content).hexdigest() != meta.get('content_hash'):
+        return None
+    meta['content'] = content
+    return meta
+
+
+def _save_disk_copy(sheet_url: str, content: bytes, meta: Dict) -> None:
+    """Write a sheet's disk copy (errors are ignored)"""
+    csv_path, meta_path = _disk_copy_paths(sheet_url)
+    try:
+        os.makedirs(ROSTER_SHEET_CACHE_DIR, exist_ok=True)
+        for path, data in ((csv_path, content), (meta_path, json.dumps(meta).encode("utf-8"))):
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+
+def _merge_rosters(old: Dict[str, Dict[str, List[str]]],
+                   new: Dict[str, Dict[str, List[str]]]) -> Dict[str, Dict[str, List[str]]]:
+    """
+    Keep the old roster dicts of races that didn't change and tell the
+    listeners about the ones that did
+    """
+    merged = {}
+    changed = []
+    for race_id, rosters in new.items():
+        # Participant order counts: it decides how tied teams are ordered
+        if race_id in old and list(old[race_id].items()) == list(rosters.items()):
+            merged[race_id] = old[race_id]
+        else:
+            merged[race_id] = rosters
+            changed.append(race_id)
+    changed.extend(race_id for race_id in old if race_id not in new)
+
+    for race_id in changed:
+        for listener in _roster_listeners:
+            try:
+                listener(race_id, old.get(race_id, {}), new.get(race_id, {}))
+            except Exception:
+                pass
+    return merged
+
+
+def _new_sheet_state() -> Dict:
+    return {
+        'content_hash': None, 'etag': None, 'last_modified': None, 'rosters': {},
+        'checked_at': 0.0, 'synced_at': None, 'source': None, 'error': None
+    }
+
+
+def _sheet_state(sheet_url: str) -> Dict:
+    """Get a sheet's state, starting from its disk copy after a restart"""
+    with _sheets_lock:
+        state = _sheets.get(sheet_url)
+    if state is not None:
+        return state
+
+    state = _new_sheet_state()
+    disk_copy = _load_disk_copy(sheet_url)
+    if disk_copy is not None:
+        try:
+            rosters = parse_rosters(pd.read_csv(io.BytesIO(disk_copy['content'])))
+        except Exception:
+            rosters = None
+        if rosters is not None:
+            state.update(
+                content_hash=disk_copy['content_hash'],
+                etag=disk_copy.get('etag'),
+                last_modified=disk_copy.get('last_modified'),
+                rosters=rosters,
+                # checked_at stays 0 so the sheet is checked right after a restart
+                synced_at=disk_copy.get('fetched_at'),
+                source='disk copy'
+            )
+    with _sheets_lock:
+        return _sheets.setdefault(sheet_url, state)
+
+
+def _check_sheet(sheet_url: str) -> Dict:
+    """
+    Download the sheet if it changed and parse it if its content changed
+
+    Returns:
+        The sheet's new state (see _sheets)
+
+    Raises:
+        requests.RequestException, ValueError: If the sheet can't be
+            downloaded or read
+    """
+    state = _sheet_state(sheet_url)
+
+    headers = {}
+    if state['etag']:
+        headers['If-None-Match'] = state['etag']
+    if state['last_modified']:
+        headers['If-Modified-Since'] = state['last_modified']
+    response = requests.get(sheet_csv_url(sheet_url), headers=headers, timeout=SHEET_TIMEOUT)
+
+    now = time.time()
+    if response.status_code != 304:
+        response.raise_for_status()
+        content = response.content
+        content_hash = hashlib.sha1(content).hexdigest()
+        state = dict(state, etag=response.headers.get('ETag'), last_modified=response.headers.get('Last-Modified'))
+        if content_hash != state['content_hash']:
+            rosters = parse_rosters(pd.read_csv(io.BytesIO(content)))
+            state = dict(state, content_hash=content_hash, rosters=_merge_rosters(state['rosters'], rosters))
+        # Only sheets that parse are kept as the last good copy
+        _save_disk_copy(sheet_url, content, {
+            'content_hash': content_hash,
+            'etag': state['etag'],
+            'last_modified': state['last_modified'],
+            'fetched_at': now
+        })
+
+    state = dict(state, checked_at=now, synced_at=now, source='sheet', error=None)
+    with _sheets_lock:
+        _sheets[sheet_url] = state
+    return state
+
+
+def refresh_sheet(sheet_url: str) -> bool:
+    """
+    Check the sheet now, waiting for Google (for background jobs)
+
+    Args:
+        sheet_url: Google Sheets URL (must be published to web)
+
+    Returns:
+        True if the sheet was read, False if the check failed (the rosters
+        read before are kept and the error is in sheet_status)
+    """
+    try:
+        _sheet_loads.do(sheet_url, _check_sheet, sheet_url)
+        return True
+    except Exception as e:
+        state = _sheet_state(sheet_url)
+        with _sheets_lock:
+            _sheets[sheet_url] = dict(state, checked_at=time.time(), error=str(e))
+        return False
+
+
+def _refresh_in_background(sheet_url: str) -> None:
+    with _sheets_lock:
+        if sheet_url in _refreshing:
+            return
+        _refreshing.add(sheet_url)
+
+    def refresh():
+        try:
+            refresh_sheet(sheet_url)
+        finally:
+            with _sheets_lock:
+                _refreshing.discard(sheet_url)
+
+    threading.Thread(target=refresh, name="roster-sheet-refresh", daemon=True).start()
+
 
-@st.cache_data(ttl=3600)  # Cache for 1 hour
 def load_rosters_from_sheet(sheet_url):
     """
-    Load rosters from Google Sheet
-    
+    Load rosters from Google Sheet, without waiting for it
+
+    Serves the rosters read last (from the disk copy after a restart) and
+    checks the sheet in the background when a check is due. Until the
+    sheet has been read once there are no rosters.
+
     Args:
         sheet_url: Google Sheets URL (must be published to web)
-        
+
     Returns:
         dict: Rosters organized by race_id
               Format: {race_id: {participant: [rider_urls]}}
-    
+
     Example Sheet Format:
-        Race ID    | Participant | Rider1             | Rider2             | Rider3             
+        Race ID    | Participant | Rider1             | Rider2             | Rider3
         -----------|-------------|--------------------|--------------------|--------------------
         giro-2026  | Jeremy      | rider/name-surname | rider/name-surname | rider/name-surname
         giro-2026  | Leo         | rider/name-surname | rider/name-surname | rider/name-surname
     """
-    try:
-        # Convert Google Sheets URL to CSV export URL
-        sheet_id = sheet_url.split('/d/')[1].split('/')[0]
-        
-        csv_url = f"https://docs.google.com/spreadsheets/d/{sheet_id}/export?format=csv&gid=0"
-        
-        # Load CSV data
-        df = pd.read_csv(csv_url)
-        
-        # Strip whitespace from column names
-        df.columns = df.columns.str.strip()
-        
-        # Validate required columns
-        if 'Race ID' not in df.columns or 'Participant' not in df.columns:
-            raise ValueError("Sheet must have 'Race ID' and 'Participant' columns")
-        
-        # Convert to races_config format
-        rosters_by_race = {}
-        
-        for race_id in df['Race ID'].unique():
-            # Skip empty race IDs
-            if pd.isna(race_id):
-                continue
-            
-            race_df = df[df['Race ID'] == race_id]
-            rosters = {}
-            
-            for _, row in race_df.iterrows():
-                participant = row['Participant']
-
-                # Skip empty participants
-                if pd.isna(participant):
-                    continue
-
-                participant = str(participant).strip()
-
-                # Collect all rider columns (Rider1, Rider2, Rider3, etc.)
-                riders = []
-                for col in df.columns:
-                    if col.startswith('Rider') and pd.notna(row[col]) and str(row[col]).strip():
-                        riders.append(str(row[col]).strip())
-                
-                rosters[participant] = riders
-            
-            if rosters:  # Only add if we have rosters
-                rosters_by_race[race_id] = rosters
-        
-        return rosters_by_race
-    
-    except Exception as e:
-        # Log error but don't crash the app
-        st.warning(f"⚠️ Could not load rosters from Google Sheet: {e}")
-        return {}
+    state = _sheet_state(sheet_url)
+    interval = SHEET_RETRY_INTERVAL if state['error'] else SHEET_CHECK_INTERVAL
+    if time.time() - state['checked_at'] >= interval:
+        _refresh_in_background(sheet_url)
+    return state['rosters']
+
+
+def sheet_status(sheet_url: str) -> Dict:
+    """
+    Get when the sheet's rosters were last refreshed
+
+    Args:
+        sheet_url: Google Sheets URL
+
+    Returns:
+        Dictionary with 'loaded' (whether there are rosters from the sheet),
+        'source' ('sheet', 'disk copy' or None), 'synced_at' (Unix time the
+        rosters last matched the sheet, or None), 'error' (of the last
+        check, or None) and 'refreshing'
+    """
+    state = _sheet_state(sheet_url)
+    with _sheets_lock:
+        refreshing = sheet_url in _refreshing
+    return {
+        'loaded': state['content_hash'] is not None,
+        'source': state['source'],
+        'synced_at': state['synced_at'],
+        'error': state['error'],
+        'refreshing': refreshing
+    }
 
 
 def get_sheet_status(sheet_url):
     """
     Check if Google Sheet is accessible
-    
+
     Returns:
         tuple: (success: bool, message: str)
     """
     try:
+        if not refresh_sheet(sheet_url):
+            return False, f"❌ Error: {sheet_status(sheet_url)['error']}"
         rosters = load_rosters_from_sheet(sheet_url)
-        
+
         if not rosters:
             return False, "Sheet is accessible but contains no rosters"
-        
+
         race_count = len(rosters)
         participant_counts = {race_id: len(r) for race_id, r in rosters.items()}
-        
+
         return True, f"✅ Loaded {race_count} races: {participant_counts}"
-    
+
     except Exception as e:
         return False, f"❌ Error: {e}"
 
@@ -112,14 +392,14 @@ def get_sheet_status(sheet_url):
 if __name__ == "__main__":
     # Test with example sheet
     test_url = "https://docs.google.com/spreadsheets/d/1iRpOvAYQaJh2oCcIjZcLDLbJT0eGXqT0nZEXjttOOqI/edit"
-    
+
     print("Testing Google Sheets import...")
     print(f"Sheet URL: {test_url}")
     print()
-    
+
     success, message = get_sheet_status(test_url)
     print(message)
-    
+
     if success:
         rosters = load_rosters_from_sheet(test_url)
         print("\nRosters loaded:")
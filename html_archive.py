@@ -0,0 +1,264 @@
+"""
+Compressed archive of fetched procyclingstats pages
+
+Every race and stage page the app fetches is kept zlib-compressed in a
+local SQLite file with its fetch time and a hash of its content (a page
+fetched again unchanged only gets a new fetch time). When the parser or
+scoring changes, a past race can then be rebuilt from the archive instead of
+re-scraping it: `reparse` parses the archived stage pages in parallel across
+CPU cores, rewrites the race's GC in the stage store and drops its stored
+scored stages so they are scored again.
+
+The archive location can be changed with the FANTASY_HTML_ARCHIVE
+environment variable; set FANTASY_ARCHIVE_PAGES=0 to stop archiving. Archive
+errors are never fatal.
+
+Usage:
+    python html_archive.py list
+    python html_archive.py reparse --race tdf-2025
+    python html_archive.py reparse --race tdf-2025 --workers 4
+"""
+
+import argparse
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import stage_store
+
+HTML_ARCHIVE_PATH = os.environ.get(
+    "FANTASY_HTML_ARCHIVE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "html_archive.sqlite3")
+)
+
+ARCHIVE_PAGES = os.environ.get("FANTASY_ARCHIVE_PAGES", "1").lower() not in ("0", "false", "no")
+
+# Distinct versions kept per page (a live stage page changes every poll)
+PAGE_VERSIONS_KEPT = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    html_size INTEGER NOT NULL,
+    html_zlib BLOB NOT NULL,
+    PRIMARY KEY (url, content_hash)
+);
+CREATE INDEX IF NOT EXISTS pages_by_fetch ON pages (url, fetched_at);
+"""
+
+_STAGE_URL = re.compile(r"/stage-(\d+)$")
+
+_init_lock = threading.Lock()
+_initialized_paths = set()
+
+
+def _connect() -> sqlite3.Connection:
+    """Open a connection to the archive, creating the schema on first use"""
+    path = HTML_ARCHIVE_PATH
+    with _init_lock:
+        if path not in _initialized_paths:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            conn = sqlite3.connect(path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            conn.commit()
+            conn.close()
+            _initialized_paths.add(path)
+    return sqlite3.connect(path, timeout=30)
+
+
+def archive_page(url: str, html: str) -> None:
+    """
+    Archive a fetched page
+
+    Args:
+        url: Relative procyclingstats URL the page was fetched from
+        html: Page HTML
+    """
+    if not ARCHIVE_PAGES or not html:
+        return
+
+    raw = html.encode("utf-8")
+    content_hash = hashlib.sha1(raw).hexdigest()
+    now = time.time()
+    try:
+        conn = _connect()
+        try:
+            with conn:
+                updated = conn.execute(
+                    "UPDATE pages SET fetched_at = ? WHERE url = ? AND content_hash = ?",
+                    (now, url, content_hash)
+                ).rowcount
+                if not updated:
+                    conn.execute(
+                        "INSERT INTO pages (url, content_hash, fetched_at, html_size, html_zlib) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (url, content_hash, now, len(raw), zlib.compress(raw, 6))
+                    )
+                    conn.execute(
+                        "DELETE FROM pages WHERE url = ? AND content_hash NOT IN ("
+                        "SELECT content_hash FROM pages WHERE url = ? ORDER BY fetched_at DESC LIMIT ?)",
+                        (url, url, PAGE_VERSIONS_KEPT)
+                    )
+        finally:
+            conn.close()
+    except (sqlite3.Error, OSError):
+        pass
+
+
+def load_page(url: str) -> Optional[Dict]:
+    """
+    Load the latest archived version of a page
+
+    Args:
+        url: Relative procyclingstats URL
+
+    Returns:
+        Dictionary with html, fetched_at and content_hash, or None if the
+        page isn't archived
+    """
+    try:
+        conn = _connect()
+        try:
+            row = conn.execute(
+                "SELECT html_zlib, fetched_at, content_hash FROM pages "
+                "WHERE url = ? ORDER BY fetched_at DESC LIMIT 1",
+                (url,)
+            ).fetchone()
+        finally:
+            conn.close()
+    except (sqlite3.Error, OSError):
+        return None
+
+    if row is None:
+        return None
+
+    return {
+        'html': zlib.decompress(row[0]).decode("utf-8"),
+        'fetched_at': row[1],
+        'content_hash': row[2]
+    }
+
+
+def archived_pages(url_prefix: str = "") -> List[Tuple[str, float, int, int]]:
+    """
+    List archived pages (latest version of each)
+
+    Args:
+        url_prefix: Only list pages whose URL starts with this
+
+    Returns:
+        (url, fetched_at, html size, compressed size) per page, by URL
+    """
+    try:
+        conn = _connect()
+        try:
+            rows = conn.execute(
+                "SELECT url, MAX(fetched_at), html_size, LENGTH(html_zlib) FROM pages "
+                "WHERE url LIKE ? ESCAPE '\\' GROUP BY url ORDER BY url",
+                (url_prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%',)
+            ).fetchall()
+        finally:
+            conn.close()
+    except (sqlite3.Error, OSError):
+        return []
+
+    return rows
+
+
+def _parse_archived_stage(url: str) -> Optional[List[Dict]]:
+    """Parse an archived stage page's GC (runs in a worker process)"""
+    # Imported here because api_client imports this module
+    from procyclingstats import Stage
+    from api_client import _parse_stage_gc
+    from gc_records import StageGC
+
+    page = load_page(url)
+    if page is None:
+        return None
+    stage = Stage(url, html=page['html'], update_html=False)
+    gc_entries = _parse_stage_gc(stage)
+    if gc_entries is None:
+        return None
+    return StageGC.from_entries(gc_entries).to_entries()
+
+
+def reparse_race(race_url: str, workers: Optional[int] = None) -> Dict[int, int]:
+    """
+    Rebuild a race's GC in the stage store from archived stage pages
+
+    Stages are parsed in parallel worker processes. Every stage before the
+    latest one with a GC is stored as finalized, and the race's stored
+    scored stages are dropped so they get scored again.
+
+    Args:
+        race_url: URL path for the race
+        workers: Worker processes (defaults to the number of CPUs)
+
+    Returns:
+        Dictionary mapping each rebuilt stage number to its number of GC riders
+    """
+    stage_urls = {}
+    for url, _, _, _ in archived_pages(f"{race_url}/stage-"):
+        match = _STAGE_URL.search(url)
+        if match and url == f"{race_url}/stage-{match.group(1)}":
+            stage_urls[int(match.group(1))] = url
+    if not stage_urls:
+        return {}
+
+    stage_numbers = sorted(stage_urls)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(_parse_archived_stage, [stage_urls[n] for n in stage_numbers]))
+
+    gc_by_stage = {n: entries for n, entries in zip(stage_numbers, results) if entries}
+    latest_stage = max(gc_by_stage, default=0)
+    for stage_number, entries in gc_by_stage.items():
+        stage_store.save_stage_gc(race_url, stage_number, entries, finalized=stage_number < latest_stage)
+    stage_store.clear_stage_standings(race_url)
+
+    return {stage_number: len(entries) for stage_number, entries in gc_by_stage.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archived procyclingstats pages")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    list_parser = subparsers.add_parser("list", help="list archived pages")
+    list_parser.add_argument("prefix", nargs="?", default="", help="only pages whose URL starts with this")
+    reparse_parser = subparsers.add_parser("reparse", help="rebuild a race's stage store from the archive")
+    reparse_parser.add_argument("--race", dest="race_id", required=True, help="race id, e.g. tdf-2025")
+    reparse_parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPUs)")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        pages = archived_pages(args.prefix)
+        for url, fetched_at, html_size, compressed_size in pages:
+            fetched = time.strftime("%Y-%m-%d %H:%M", time.localtime(fetched_at))
+            print(f"{url:<50} {fetched}  {html_size / 1024:7.0f} KiB -> {compressed_size / 1024:5.0f} KiB")
+        print(f"{len(pages)} pages")
+        return
+
+    # Streamlit warns about running without a script context on every call
+    import streamlit.logger
+    streamlit.logger.set_log_level("error")
+    from races_config import get_race_config
+
+    race_url = get_race_config(args.race_id)['race_url']
+    start = time.monotonic()
+    rebuilt = reparse_race(race_url, args.workers)
+    if not rebuilt:
+        print(f"{race_url}: no archived stage pages with a GC")
+        return
+    print(f"{race_url}: rebuilt stages {min(rebuilt)}-{max(rebuilt)} "
+          f"({len(rebuilt)} stages, {sum(rebuilt.values())} GC rows) in {time.monotonic() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""
+Outbound policy for procyclingstats requests
+
+Every page request goes through the policy of its host, which
+- paces requests with a token bucket (PCS_RATE_LIMIT requests per second,
+  bursts of up to PCS_RATE_BURST; a rate of 0 disables pacing),
+- retries transient failures with jittered exponential backoff, and
+- stops calling the host after repeated failures: the circuit breaker opens
+  and calls fail fast with CircuitOpenError until the cool-down is over,
+  then a single trial call decides whether to close it again.
+
+policy_state() reports counters and breaker state per host for diagnostics.
+"""
+
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple, Type
+
+# Requests per second and burst size per host
+RATE_LIMIT = float(os.environ.get("PCS_RATE_LIMIT", "4"))
+RATE_BURST = int(os.environ.get("PCS_RATE_BURST", "8"))
+
+# Attempts per call, and the backoff before retry n is up to
+# min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2**n) seconds
+MAX_ATTEMPTS = 3
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 8.0
+
+# Consecutive failures that open the breaker, and seconds it stays open
+FAILURE_THRESHOLD = 5
+BREAKER_COOLDOWN = 60.0
+
+# procyclingstats raises ConnectionError when requests fail, pcs_http raises
+# TransientHTTPError (a ConnectionError) for 429 and 5xx and for the site's
+# "technical difficulties" page, and requests' errors are OSErrors.
+# procyclingstats' ValueError (a page it can't parse, or "Page not found")
+# isn't worth retrying.
+TRANSIENT_ERRORS: Tuple[Type[BaseException], ...] = (ConnectionError, TimeoutError, OSError)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a host whose circuit breaker is open"""
+
+    def __init__(self, host: str, retry_after: float):
+        super().__init__(f"{host} is failing; not calling it again for {retry_after:.0f}s")
+        self.host = host
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Blocking token bucket: `rate` tokens per second, at most `burst` saved up"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Take a token, waiting until one is available
+
+        Returns:
+            Seconds spent waiting
+        """
+        if self.rate <= 0:
+            return 0.0
+
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker counting consecutive failures"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, host: str, failure_threshold: int, cooldown: float):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.times_opened = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        """
+        Check that a call may go ahead
+
+        Raises:
+            CircuitOpenError: If the breaker is open (or half-open with its
+                trial call already in flight)
+        """
+        with self._lock:
+            if self.state == self.OPEN:
+                retry_after = self._opened_at + self.cooldown - time.monotonic()
+                if retry_after > 0:
+                    raise CircuitOpenError(self.host, retry_after)
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN:
+                if self._trial_in_flight:
+                    raise CircuitOpenError(self.host, 0)
+                self._trial_in_flight = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.times_opened += 1
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def end_trial(self) -> None:
+        """Let the next trial call through, whether or not this one got a verdict"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def retry_after(self) -> float:
+        """Seconds until an open breaker lets a trial call through (0 if not open)"""
+        with self._lock:
+            if self.state != self.OPEN:
+                return 0.0
+            return max(0.0, self._opened_at + self.cooldown - time.monotonic())
+
+
+class HostPolicy:
+    """Rate limit, retry and circuit breaker for one host"""
+
+    def __init__(self, host: str):
+        self.host = host
+        self.bucket = TokenBucket(RATE_LIMIT, RATE_BURST)
+        self.breaker = CircuitBreaker(host, FAILURE_THRESHOLD, BREAKER_COOLDOWN)
+        self._random = random.Random()
+        self._counters = {
+            'calls': 0,
+            'attempts': 0,
+            'retries': 0,
+            'failures': 0,
+            'rejected': 0,
+            'rate_limit_wait_seconds': 0.0
+        }
+        self._lock = threading.Lock()
+
+    def _count(self, name: str, amount: float = 1) -> None:
+        with self._lock:
+            self._counters[name] += amount
+
+    def call(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        Call `func` under this host's policy
+
+        Args:
+            func: Function making the request (e.g. Stage)
+            *args, **kwargs: Passed to `func`
+
+        Returns:
+            What `func` returned
+
+        Raises:
+            CircuitOpenError: If the host's breaker is open
+            Exception: The last error, if every attempt failed or the error
+                wasn't transient
+        """
+        self._count('calls')
+        for attempt in range(MAX_ATTEMPTS):
+            try:
+                self.breaker.before_call()
+            except CircuitOpenError:
+                self._count('rejected')
+                raise
+            try:
+                self._count('rate_limit_wait_seconds', self.bucket.acquire())
+                self._count('attempts')
+                result = func(*args, **kwargs)
+            except TRANSIENT_ERRORS:
+                self._count('failures')
+                self.breaker.record_failure()
+                if attempt == MAX_ATTEMPTS - 1 or self.breaker.state == CircuitBreaker.OPEN:
+                    raise
+            except Exception:
+                # The host answered; the problem is on our side
+                self.breaker.record_success()
+                raise
+            else:
+                self.breaker.record_success()
+                return result
+            finally:
+                # A half-open trial interrupted before it got a verdict (e.g.
+                # KeyboardInterrupt) mustn't keep every later call out
+                self.breaker.end_trial()
+
+            # Full jitter keeps retrying sessions from moving in lockstep
+            self._count('retries')
+            time.sleep(self._random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt)))
+
+    def state(self) -> Dict[str, Any]:
+        """Counters and breaker state"""
+        with self._lock:
+            state = dict(self._counters)
+        state['breaker'] = self.breaker.state
+        state['consecutive_failures'] = self.breaker.consecutive_failures
+        state['times_opened'] = self.breaker.times_opened
+        state['retry_after'] = round(self.breaker.retry_after(), 1)
+        return state
+
+
+_policies: Dict[str, HostPolicy] = {}
+_policies_lock = threading.Lock()
+
+
+def policy_for(host: str) -> HostPolicy:
+    """
+    Get the shared policy of a host
+
+    Args:
+        host: Host name, e.g. "www.procyclingstats.com"
+
+    Returns:
+        The host's policy (created on first use)
+    """
+    with _policies_lock:
+        policy = _policies.get(host)
+        if policy is None:
+            policy = _policies[host] = HostPolicy(host)
+        return policy
+
+
+def call(host: str, func: Callable, *args, **kwargs) -> Any:
+    """
+    Call `func` under the policy of `host` (see HostPolicy.call)
+    """
+    return policy_for(host).call(func, *args, **kwargs)
+
+
+def policy_state(host: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Get counters and breaker state for diagnostics
+
+    Args:
+        host: Only report this host (defaults to every host called so far)
+
+    Returns:
+        Dictionary mapping host to its state
+    """
+    with _policies_lock:
+        policies = dict(_policies)
+    return {
+        name: policy.state()
+        for name, policy in policies.items()
+        if host is None or name == host
+    }
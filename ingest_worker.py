@@ -0,0 +1,112 @@
+"""
+Background ingestion worker
+
+Runs outside Streamlit and keeps race snapshots up to date: every poll it
+scrapes new stages of the active races (see races_config.get_active_races)
+that are due again, scores them and stores a new snapshot version when the
+standings changed. When a race is due follows the cache policy
+(cache_policy.cache_ttl): every minute while a stage finishes, hourly
+overnight and on rest days, and only once for completed races.
+The app reads these snapshots (api_client.load_race_snapshot), so page loads
+don't wait on procyclingstats. A snapshot the worker hasn't checked for
+longer than its race's cache_ttl allows (api_client.is_snapshot_current) is
+ignored and the app fetches the race itself. Set FANTASY_SNAPSHOT_ONLY=1 for
+the app to never scrape by itself.
+
+The worker and the app must share the stage store (FANTASY_STAGE_STORE).
+
+Usage:
+    python ingest_worker.py                     # check active races every minute
+    python ingest_worker.py --interval 30
+    python ingest_worker.py --once --race tdf-2025
+"""
+
+import argparse
+import time
+from typing import Dict, List
+
+import streamlit.logger
+
+# Streamlit warns about running without a script context on every call
+streamlit.logger.set_log_level("error")
+
+import api_client  # noqa: E402
+import cache_policy  # noqa: E402
+import http_policy  # noqa: E402
+from races_config import get_active_races, get_race_config, get_team_rosters, refresh_rosters  # noqa: E402
+
+DEFAULT_POLL_INTERVAL = cache_policy.LIVE_TTL
+
+# When each race was last ingested (time.monotonic())
+_last_ingested: Dict[str, float] = {}
+
+
+def _is_due(race_url: str, now: float) -> bool:
+    """Whether a race's data may have changed since it was last ingested"""
+    last = _last_ingested.get(race_url)
+    if last is None:
+        return True
+    ttl = cache_policy.cache_ttl(race_url)
+    return ttl is not None and now - last >= ttl
+
+
+def ingest_races(race_ids: List[str] = None, force: bool = False) -> None:
+    """
+    Scrape, score and snapshot races once
+
+    The api_client caches expire by the same policy, so a race that is due
+    is fetched afresh (finalized stages still come from the stage store).
+
+    Args:
+        race_ids: Races to ingest (defaults to the active races)
+        force: Ingest races that aren't due yet too
+    """
+    races = [get_race_config(race_id) for race_id in race_ids] if race_ids else get_active_races()
+    if not races:
+        print("No active races", flush=True)
+        return
+
+    for race in races:
+        start = time.monotonic()
+        if not force and not _is_due(race['race_url'], start):
+            continue
+        try:
+            version = api_client.publish_race_snapshot(race['race_url'], get_team_rosters(race['id']))
+        except Exception as e:
+            # Retried on the next poll
+            print(f"{race['id']}: ingestion failed: {e}", flush=True)
+            continue
+        _last_ingested[race['race_url']] = start
+        elapsed = time.monotonic() - start
+        if version is None:
+            print(f"{race['id']}: no data yet ({elapsed:.1f}s)", flush=True)
+        else:
+            print(f"{race['id']}: snapshot version {version} ({elapsed:.1f}s)", flush=True)
+
+    for host, state in http_policy.policy_state().items():
+        if state['failures'] or state['breaker'] != http_policy.CircuitBreaker.CLOSED:
+            print(f"{host}: {state}", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keep race snapshots up to date")
+    parser.add_argument("--interval", type=float, default=DEFAULT_POLL_INTERVAL,
+                        help=f"seconds between polls (default {DEFAULT_POLL_INTERVAL})")
+    parser.add_argument("--race", action="append", dest="race_ids", default=None,
+                        help="race id to ingest, can be repeated (default: active races)")
+    parser.add_argument("--once", action="store_true", help="ingest once and exit")
+    args = parser.parse_args()
+
+    # Later polls pick up roster changes in the background
+    if not refresh_rosters():
+        print("Roster sheet unavailable, using the last good copy", flush=True)
+
+    while True:
+        ingest_races(args.race_ids, force=args.once)
+        if args.once:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
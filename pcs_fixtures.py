@@ -0,0 +1,171 @@
+"""
+Recorded procyclingstats pages for offline runs
+
+Captures the raw HTML of race overview and stage pages into a fixtures
+directory, laid out like the site itself:
+
+    fixtures/pcs/race/tour-de-france/2025.html
+    fixtures/pcs/race/tour-de-france/2025/stage-1.html
+
+The local stand-in server (pcs_standin.py) serves these files back, so the
+whole data path can be run, benchmarked and regression-tested without
+touching the live site.
+
+Usage:
+    python pcs_fixtures.py race/tour-de-france/2025
+    python pcs_fixtures.py race/tour-de-france/2025 --stages 1-5 --dir fixtures/pcs
+"""
+
+import argparse
+import os
+from typing import Iterable, List, Optional
+
+from procyclingstats import Race
+from procyclingstats.scraper import Scraper
+
+FIXTURES_DIR = os.environ.get(
+    "PCS_FIXTURES_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "pcs")
+)
+
+
+def relative_url(url: str) -> str:
+    """
+    Strip the host, query string and surrounding slashes from a page URL
+
+    Args:
+        url: Absolute or relative procyclingstats URL
+
+    Returns:
+        Relative URL (e.g. "race/tour-de-france/2025/stage-1")
+    """
+    url = url.split('?', 1)[0].split('#', 1)[0]
+    if "://" in url:
+        url = url.split("://", 1)[1].partition('/')[2]
+    return url.strip('/')
+
+
+def fixture_path(url: str, fixtures_dir: Optional[str] = None) -> str:
+    """
+    Get the file a page is recorded to
+
+    Args:
+        url: Absolute or relative procyclingstats URL
+        fixtures_dir: Fixtures directory (defaults to FIXTURES_DIR)
+
+    Returns:
+        Path of the page's .html file
+    """
+    parts = [part for part in relative_url(url).split('/') if part not in ("", ".", "..")]
+    if not parts:
+        parts = ["index"]
+    return os.path.join(fixtures_dir or FIXTURES_DIR, *parts) + ".html"
+
+
+def load_fixture(url: str, fixtures_dir: Optional[str] = None) -> Optional[str]:
+    """
+    Read a recorded page
+
+    Args:
+        url: Absolute or relative procyclingstats URL
+        fixtures_dir: Fixtures directory (defaults to FIXTURES_DIR)
+
+    Returns:
+        The page's HTML, or None if it wasn't recorded
+    """
+    try:
+        with open(fixture_path(url, fixtures_dir), encoding="utf-8") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def save_fixture(url: str, html: str, fixtures_dir: Optional[str] = None) -> str:
+    """
+    Write a page to the fixtures directory
+
+    Args:
+        url: Absolute or relative procyclingstats URL
+        html: Page HTML
+        fixtures_dir: Fixtures directory (defaults to FIXTURES_DIR)
+
+    Returns:
+        Path the page was written to
+    """
+    path = fixture_path(url, fixtures_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(html)
+    return path
+
+
+def record_page(url: str, fixtures_dir: Optional[str] = None) -> str:
+    """
+    Fetch a page from procyclingstats and record it
+
+    Uses the same fetching code as the app (procyclingstats' Scraper), so the
+    recorded HTML is what the parsers will see.
+
+    Args:
+        url: Relative procyclingstats URL
+        fixtures_dir: Fixtures directory (defaults to FIXTURES_DIR)
+
+    Returns:
+        Path the page was written to
+
+    Raises:
+        ValueError: If the site returned an error page
+    """
+    scraper = Scraper(url)
+    return save_fixture(url, scraper.html.html, fixtures_dir)
+
+
+def record_race(race_url: str, stage_numbers: Optional[Iterable[int]] = None,
+                fixtures_dir: Optional[str] = None) -> List[str]:
+    """
+    Record a race overview page and its stage pages
+
+    Args:
+        race_url: URL path for the race (e.g., "race/tour-de-france/2025")
+        stage_numbers: Stages to record (defaults to every stage listed on
+            the overview page)
+        fixtures_dir: Fixtures directory (defaults to FIXTURES_DIR)
+
+    Returns:
+        Paths of the recorded pages
+    """
+    race_url = relative_url(race_url)
+    race = Race(race_url)
+    paths = [save_fixture(race_url, race.html.html, fixtures_dir)]
+
+    if stage_numbers is None:
+        stage_numbers = range(1, len(race.stages("stage_url")) + 1)
+
+    for stage_number in stage_numbers:
+        stage_url = f"{race_url}/stage-{stage_number}"
+        try:
+            paths.append(record_page(stage_url, fixtures_dir))
+        except Exception as e:
+            print(f"Skipping {stage_url}: {e}")
+    return paths
+
+
+def _parse_stage_range(value: str) -> List[int]:
+    """Parse "3", "1-5" or "1,4,7-9" into stage numbers"""
+    stage_numbers = []
+    for part in value.split(','):
+        first, _, last = part.partition('-')
+        stage_numbers.extend(range(int(first), int(last or first) + 1))
+    return stage_numbers
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record procyclingstats pages as fixtures")
+    parser.add_argument("race_url", help='e.g. "race/tour-de-france/2025"')
+    parser.add_argument("--stages", type=_parse_stage_range, default=None,
+                        help='stages to record, e.g. "1-5" (default: all)')
+    parser.add_argument("--dir", default=None, help=f"fixtures directory (default: {FIXTURES_DIR})")
+    args = parser.parse_args()
+
+    for path in record_race(args.race_url, args.stages, args.dir):
+        print(path)
@@ -0,0 +1,136 @@
+"""
+Pooled HTTP session for procyclingstats page fetches
+
+One requests session is shared by every page fetch in the process, so
+connections to the site are kept alive and reused (and responses come
+gzip-compressed) instead of paying a new TCP/TLS handshake per stage. The
+session can be swapped with set_session (e.g. for tests or a proxy), and
+is also handed to procyclingstats' own Scraper so pages it fetches itself
+use the same pool.
+
+fetch_html gets a page's raw HTML with that session; api_client passes it
+to the procyclingstats parsers (see PCS_FETCH_RAW_HTML there). Unlike the
+scraper's own fetching, it tells HTTP errors apart: 404 is
+PageNotFoundError, 429 and 5xx are TransientHTTPError (retried by
+http_policy).
+"""
+
+import threading
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from procyclingstats.scraper import Scraper
+
+try:
+    import cloudscraper
+    HAS_CLOUDSCRAPER = True
+except ImportError:
+    HAS_CLOUDSCRAPER = False
+
+try:
+    import brotli  # noqa: F401
+    _ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    # Don't ask for brotli when requests can't decode it
+    _ACCEPT_ENCODING = "gzip, deflate"
+
+# Connections kept open per host; at least api_client.STAGE_FETCH_CONCURRENCY
+POOL_SIZE = 8
+
+# Seconds to wait for the site to connect / answer
+REQUEST_TIMEOUT = 30
+
+
+class PageNotFoundError(Exception):
+    """The site answered 404 for a page"""
+
+
+class TransientHTTPError(ConnectionError):
+    """The site answered with a status worth retrying (429 or 5xx)"""
+
+
+def create_session(pool_size: int = POOL_SIZE) -> requests.Session:
+    """
+    Create a keep-alive session with a connection pool
+
+    Uses cloudscraper (like procyclingstats does) when it's installed, so
+    Cloudflare challenges are still handled.
+
+    Args:
+        pool_size: Connections kept open per host
+
+    Returns:
+        Configured session
+    """
+    if HAS_CLOUDSCRAPER:
+        session = cloudscraper.create_scraper(browser={'browser': 'chrome', 'platform': 'windows', 'desktop': True})
+    else:
+        session = requests.Session()
+        session.headers.update(Scraper.DEFAULT_HEADERS)
+    session.headers['Accept-Encoding'] = _ACCEPT_ENCODING
+    session.headers['Connection'] = 'keep-alive'
+
+    # Retries are http_policy's job
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def _install(session: requests.Session) -> None:
+    global _session
+    _session = session
+    # procyclingstats keeps its sessions on the Scraper class
+    Scraper._session = session
+    Scraper._scraper = session
+
+
+def set_session(session: requests.Session) -> None:
+    """
+    Use a session for every procyclingstats page fetch
+
+    Args:
+        session: Session to share (see create_session)
+    """
+    with _session_lock:
+        _install(session)
+
+
+def get_session() -> requests.Session:
+    """Get the shared session, creating it on first use"""
+    with _session_lock:
+        if _session is None:
+            _install(create_session())
+        return _session
+
+
+def fetch_html(url: str) -> str:
+    """
+    Fetch a page's raw HTML with the shared session
+
+    Args:
+        url: Absolute or relative procyclingstats URL
+
+    Returns:
+        Page HTML
+
+    Raises:
+        PageNotFoundError: On 404
+        TransientHTTPError: On 429 and 5xx responses
+        requests.RequestException: On connection errors and other statuses
+    """
+    if "://" not in url:
+        url = Scraper.BASE_URL + url.lstrip('/')
+
+    response = get_session().get(url, timeout=REQUEST_TIMEOUT)
+    if response.status_code == 404:
+        raise PageNotFoundError(f"Page not found: '{url}'")
+    if response.status_code == 429 or response.status_code >= 500:
+        raise TransientHTTPError(f"{response.status_code} from '{url}'")
+    response.raise_for_status()
+    return response.text
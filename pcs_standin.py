@@ -0,0 +1,423 @@
+"""
+Local stand-in for procyclingstats.com
+
+A small HTTP server that answers the race and stage pages the app requests,
+so the data path can be run, benchmarked and regression-tested offline.
+Pages come from recorded fixtures (see pcs_fixtures.py) when they exist and
+are otherwise generated: a synthetic race overview with the stage calendar
+and synthetic stage pages with a deterministic GC in the same markup
+procyclingstats uses.
+
+Latency and error rates are configurable, as is a one-off delay per new
+connection (standing in for the TCP/TLS handshake). Failed requests get the
+site's "technical difficulties" page with a 503, which the scraper rejects
+just like the real thing. Responses are gzipped when the client accepts it.
+
+Point the app at it with the PCS_BASE_URL environment variable, with its own
+stage store and page archive (both are keyed by race, not by host, so
+stand-in pages would otherwise end up in the real race's data):
+
+    python pcs_standin.py --port 8765 --latency 0.2 --error-rate 0.05
+    PCS_BASE_URL=http://127.0.0.1:8765/ \
+        FANTASY_STAGE_STORE=/tmp/pcs-standin/stage_store.sqlite3 \
+        FANTASY_HTML_ARCHIVE=/tmp/pcs-standin/html_archive.sqlite3 \
+        streamlit run app.py
+
+or start it in-process with start_standin() (see benchmarks/).
+"""
+
+import argparse
+import gzip
+import random
+import threading
+import time
+from datetime import date, timedelta
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+from gc_times import seconds_to_time_str
+from pcs_fixtures import load_fixture, relative_url
+from races_config import RACES, TEAM_ROSTERS
+
+DEFAULT_RIDERS = 176
+DEFAULT_STAGES = 21
+
+_NOT_FOUND_PAGE = (
+    '<html><body><div class="page-title"><div class="main"><h1>Page not found</h1></div></div>'
+    '</body></html>'
+)
+_UNAVAILABLE_PAGE = (
+    '<html><body><div class="page-content"><div>'
+    'Due to technical difficulties this page is temporarily unavailable.'
+    '</div></div></body></html>'
+)
+
+
+def _race_info(race_url: str) -> Tuple[Optional[str], date, int]:
+    """Get the race id, start date and stage count for a race URL"""
+    for race_id, race in RACES.items():
+        if race['race_url'] == race_url:
+            return race_id, date.fromisoformat(race['start_date']), race['total_stages']
+    year = race_url.split('/')[-1]
+    start = date(int(year), 7, 1) if year.isdigit() else date.today()
+    return None, start, DEFAULT_STAGES
+
+
+def _format_gap(seconds: int) -> str:
+    """Format a GC gap the way procyclingstats does ("0:12", "4:05", "1:02:03")"""
+    if seconds >= 3600:
+        return seconds_to_time_str(seconds)
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+
+class SyntheticRace:
+    """
+    Deterministic made-up GC for one race
+
+    The field is every rider on a fantasy roster for the race plus filler
+    riders. Each stage adds a random time loss per rider (bunch finishes give
+    many equal times) and a few riders abandon along the way, so stage pages
+    look and behave like real ones.
+    """
+
+    def __init__(self, race_url: str, riders: int = DEFAULT_RIDERS):
+        self.race_url = race_url
+        race_id, self.start_date, self.total_stages = _race_info(race_url)
+
+        rider_urls = []
+        for roster in TEAM_ROSTERS.get(race_id, {}).values():
+            rider_urls.extend(url for url in roster if url not in rider_urls)
+        filler = 0
+        while len(rider_urls) < riders:
+            filler += 1
+            rider_urls.append(f"rider/synthetic-rider-{filler:03d}")
+        self.rider_urls = rider_urls
+
+        # Cumulative GC time per stage, None once a rider has abandoned
+        rng = random.Random(race_url)
+        totals: List[Optional[int]] = [0] * len(rider_urls)
+        self._gc_times: List[List[Optional[int]]] = []
+        for stage_number in range(1, self.total_stages + 1):
+            winning_time = 3 * 3600 + rng.randint(0, 2 * 3600)
+            for i, total in enumerate(totals):
+                if total is None:
+                    continue
+                if stage_number > 1 and rng.random() < 0.005:
+                    totals[i] = None
+                    continue
+                # Half the field finishes in the bunch
+                loss = 0 if rng.random() < 0.5 else rng.choice((0, 2, 10, 45, 120, 600, 1500))
+                totals[i] = total + winning_time + loss
+            self._gc_times.append(list(totals))
+
+    def stage_date(self, stage_number: int) -> date:
+        """Date of a stage (one stage a day, no rest days)"""
+        return self.start_date + timedelta(days=stage_number - 1)
+
+    def gc(self, stage_number: int) -> List[Tuple[str, int]]:
+        """(rider_url, GC time in seconds) in GC order after a stage"""
+        times = self._gc_times[stage_number - 1]
+        standings = [(url, seconds) for url, seconds in zip(self.rider_urls, times) if seconds is not None]
+        standings.sort(key=lambda row: row[1])
+        return standings
+
+    def stage_results(self, stage_number: int) -> List[Tuple[str, int]]:
+        """(rider_url, stage time in seconds) in finishing order"""
+        previous = dict(self.gc(stage_number - 1)) if stage_number > 1 else {}
+        results = [(url, seconds - previous.get(url, 0)) for url, seconds in self.gc(stage_number)]
+        results.sort(key=lambda row: row[1])
+        return results
+
+    def _classification(self, stage_number: int, salt: int) -> List[Tuple[str, int]]:
+        """(rider_url, points) for a made-up points classification"""
+        rng = random.Random(f"{self.race_url}/{stage_number}/{salt}")
+        points = [(url, rng.randint(0, 40 * stage_number)) for url, _ in self.gc(stage_number)]
+        points.sort(key=lambda row: -row[1])
+        return points
+
+    @staticmethod
+    def _rider_rows(standings: List[Tuple[str, int]], year: int, points: bool = False) -> str:
+        """
+        Result table rows for (rider_url, value) pairs. Values are times in
+        seconds, shown as the leader's time and then gaps (",," for the same
+        gap), or points.
+        """
+        rows = []
+        leader_value = None
+        previous_gap = None
+        for rank, (rider_url, value) in enumerate(standings, start=1):
+            if points:
+                value_cell = f'<td>{value}</td>'
+            elif leader_value is None:
+                leader_value = value
+                value_cell = f'<td class="time ar">{seconds_to_time_str(value)}</td>'
+            else:
+                gap = value - leader_value
+                value_cell = f'<td class="time ar">{",," if gap == previous_gap else _format_gap(gap)}</td>'
+                previous_gap = gap
+            rider_name = rider_url.split('/')[-1].replace('-', ' ').title()
+            team = (rank * 7) % 23
+            rows.append(
+                f'<tr><td>{rank}</td><td>{rank}</td><td class="bibs">{rank}</td>'
+                f'<td><span class="flag fr"></span> <a href="{rider_url}">{escape(rider_name)}</a></td>'
+                f'<td class="age">{20 + rank % 15}</td>'
+                f'<td><a href="team/synthetic-team-{team:02d}-{year}">Team {team:02d}</a></td>'
+                f'<td>{max(0, 100 - rank)}</td>{value_cell}</tr>'
+            )
+        return "".join(rows)
+
+    def race_page(self) -> str:
+        """Race overview page with the stage calendar"""
+        rows = []
+        for stage_number in range(1, self.total_stages + 1):
+            stage_date = self.stage_date(stage_number)
+            rows.append(
+                f'<tr><td>{stage_date.day:02d}/{stage_date.month:02d}</td>'
+                f'<td><span class="icon profile p1"></span></td>'
+                f'<td><a href="{self.race_url}/stage-{stage_number}">Stage {stage_number}</a></td>'
+                f'<td>180</td></tr>'
+            )
+        return (
+            '<html><body>'
+            f'<div class="page-title"><div class="main"><h1>{escape(self.race_url)}</h1></div></div>'
+            '<div class="page-content"><div><div>'
+            '<h4>Stages</h4>'
+            '<table class="basic"><thead><tr><th>Date</th><th></th><th>Stage</th><th>KMs</th></tr></thead>'
+            f'<tbody>{"".join(rows)}</tbody></table>'
+            '</div></div></div>'
+            '</body></html>'
+        )
+
+    def stage_page(self, stage_number: int, published: bool) -> str:
+        """
+        Stage page; unpublished stages have no result tabs (as before the
+        stage is raced)
+        """
+        stage_date = self.stage_date(stage_number)
+        info = (
+            '<h4>Race information</h4><ul class="list">'
+            f'<li><div>Date:</div><div>{stage_date.day} {stage_date.strftime("%B %Y")}</div></li>'
+            '<li><div>Distance:</div><div>180 km</div></li>'
+            '<li><div>Departure:</div><div>Start</div></li>'
+            '<li><div>Arrival:</div><div>Finish</div></li>'
+            '<li><div>Startlist quality score:</div><div>1000</div></li>'
+            '</ul>'
+        )
+        results = ""
+        if published:
+            # Every classification, like the real page; only the GC is read
+            year = stage_date.year
+            gc = self.gc(stage_number)
+            tabs = [
+                ("Stage", self._rider_rows(self.stage_results(stage_number), year), "Time"),
+                ("GC", self._rider_rows(gc, year), "Time"),
+                ("Points", self._rider_rows(self._classification(stage_number, 1), year, points=True), "Pnt"),
+                ("KOM", self._rider_rows(self._classification(stage_number, 2), year, points=True), "Pnt"),
+                ("Youth", self._rider_rows(gc[::4], year), "Time"),
+            ]
+            nav = "".join(f'<li><a data-id="{i}">{label}</a></li>' for i, (label, _, _) in enumerate(tabs, start=1))
+            tables = "".join(
+                f'<div class="resTab" data-id="{i}"><div class="general"><table class="results">'
+                '<thead><tr><th>Rnk</th><th>Prev</th><th>BIB</th><th>Rider</th><th>Age</th>'
+                f'<th>Team</th><th>UCI</th><th>{last}</th></tr></thead>'
+                f'<tbody>{rows}</tbody></table></div></div>'
+                for i, (_, rows, last) in enumerate(tabs, start=1)
+            )
+            results = f'<ul class="tabs tabnav resultTabs">{nav}</ul>{tables}'
+        return (
+            '<html><body>'
+            f'<div class="page-title"><div class="main"><h1>Stage {stage_number}</h1>'
+            '<span class="icon profile p1"></span></div></div>'
+            f'<div class="page-content"><div>{info}{results}</div></div>'
+            '</body></html>'
+        )
+
+
+class StandInServer(ThreadingHTTPServer):
+    """
+    HTTP server standing in for procyclingstats.com
+
+    Args:
+        address: (host, port) to listen on; port 0 picks a free port
+        fixtures_dir: Recorded pages to serve (see pcs_fixtures.py)
+        synthetic: Generate pages that weren't recorded (404 otherwise)
+        latency: Seconds to wait before answering each request
+        jitter: Extra random delay of up to this many seconds
+        connect_latency: Seconds to wait once per new connection
+        error_rate: Fraction of requests answered with a 503 error page
+        published_stages: Stages with results in synthetic races (defaults
+            to the stages dated on or before today)
+        riders: Riders in the field of synthetic races
+        seed: Seed for latency jitter and errors
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int] = ("127.0.0.1", 0), fixtures_dir: Optional[str] = None,
+                 synthetic: bool = True, latency: float = 0.0, jitter: float = 0.0,
+                 connect_latency: float = 0.0, error_rate: float = 0.0,
+                 published_stages: Optional[int] = None, riders: int = DEFAULT_RIDERS,
+                 seed: Optional[int] = None):
+        super().__init__(address, _StandInHandler)
+        self.fixtures_dir = fixtures_dir
+        self.synthetic = synthetic
+        self.latency = latency
+        self.jitter = jitter
+        self.connect_latency = connect_latency
+        self.error_rate = error_rate
+        self.published_stages = published_stages
+        self.riders = riders
+        self.request_count = 0
+        self.error_count = 0
+        self.connection_count = 0
+        self.bytes_sent = 0
+        self._random = random.Random(seed)
+        self._races: Dict[str, SyntheticRace] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        """Value for PCS_BASE_URL"""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def _synthetic_race(self, race_url: str) -> SyntheticRace:
+        with self._lock:
+            race = self._races.get(race_url)
+            if race is None:
+                race = self._races[race_url] = SyntheticRace(race_url, self.riders)
+            return race
+
+    def _is_published(self, race: SyntheticRace, stage_number: int) -> bool:
+        if self.published_stages is not None:
+            return stage_number <= self.published_stages
+        return race.stage_date(stage_number) <= date.today()
+
+    def page(self, path: str) -> Tuple[int, str]:
+        """
+        Get the response for a request path
+
+        Args:
+            path: Request path (e.g. "/race/tour-de-france/2025/stage-1")
+
+        Returns:
+            (HTTP status, HTML)
+        """
+        url = relative_url(path)
+        html = load_fixture(url, self.fixtures_dir) if self.fixtures_dir else None
+        if html is not None:
+            return 200, html
+        if not self.synthetic:
+            return 404, _NOT_FOUND_PAGE
+
+        parts = url.split('/')
+        # race/<name>/<year>[/stage-<n>]
+        if len(parts) in (3, 4) and parts[0] == "race":
+            race = self._synthetic_race('/'.join(parts[:3]))
+            if len(parts) == 3:
+                return 200, race.race_page()
+            stage = parts[3]
+            if stage.startswith("stage-") and stage[6:].isdigit():
+                stage_number = int(stage[6:])
+                if 1 <= stage_number <= race.total_stages:
+                    return 200, race.stage_page(stage_number, self._is_published(race, stage_number))
+        return 404, _NOT_FOUND_PAGE
+
+    def count_connection(self) -> None:
+        with self._lock:
+            self.connection_count += 1
+
+    def count_bytes(self, size: int) -> None:
+        with self._lock:
+            self.bytes_sent += size
+
+    def next_delay_and_error(self) -> Tuple[float, bool]:
+        """Draw the delay and whether to fail for the next request"""
+        with self._lock:
+            self.request_count += 1
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+            failed = self._random.random() < self.error_rate
+            if failed:
+                self.error_count += 1
+        return delay, failed
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: StandInServer
+
+    def setup(self):
+        super().setup()
+        self.server.count_connection()
+        if self.server.connect_latency:
+            time.sleep(self.server.connect_latency)
+
+    def do_GET(self):
+        delay, failed = self.server.next_delay_and_error()
+        if delay:
+            time.sleep(delay)
+        status, html = (503, _UNAVAILABLE_PAGE) if failed else self.server.page(self.path)
+
+        body = html.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body, compresslevel=5)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.count_bytes(len(body))
+
+    def log_message(self, format, *args):
+        # Benchmarks make thousands of requests; keep stderr quiet
+        pass
+
+
+def start_standin(**kwargs) -> StandInServer:
+    """
+    Start a stand-in server on a background thread
+
+    Args:
+        **kwargs: StandInServer options
+
+    Returns:
+        The running server (stop it with server.shutdown())
+    """
+    server = StandInServer(**kwargs)
+    thread = threading.Thread(target=server.serve_forever, name="pcs-standin", daemon=True)
+    thread.start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve procyclingstats pages locally")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fixtures", default=None, help="directory of recorded pages (see pcs_fixtures.py)")
+    parser.add_argument("--no-synthetic", action="store_true", help="only serve recorded pages")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before each response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random delay, up to this many seconds")
+    parser.add_argument("--connect-latency", type=float, default=0.0,
+                        help="seconds of delay per new connection (handshake stand-in)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail with a 503")
+    parser.add_argument("--published-stages", type=int, default=None,
+                        help="stages with results in synthetic races (default: by calendar date)")
+    parser.add_argument("--riders", type=int, default=DEFAULT_RIDERS, help="field size of synthetic races")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    server = StandInServer(
+        (args.host, args.port), fixtures_dir=args.fixtures, synthetic=not args.no_synthetic,
+        latency=args.latency, jitter=args.jitter, connect_latency=args.connect_latency,
+        error_rate=args.error_rate,
+        published_stages=args.published_stages, riders=args.riders, seed=args.seed
+    )
+    print(f"Serving procyclingstats stand-in at {server.base_url}")
+    print(f"Run the app with PCS_BASE_URL={server.base_url} and a separate FANTASY_STAGE_STORE "
+          f"and FANTASY_HTML_ARCHIVE")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -143,7 +143,8 @@ def get_team_rosters(race_id):
     Get team rosters for a specific race
     
     Priority:
-    1. Google Sheets (if ROSTER_SHEET_URL is set)
+    1. Google Sheets (if ROSTER_SHEET_URL is set), as last read; never
+       waits for the sheet (see google_sheets_import.load_rosters_from_sheet)
     2. Hardcoded TEAM_ROSTERS dict (fallback)
     """
     # Try Google Sheets import first
@@ -164,6 +165,42 @@ def get_team_rosters(race_id):
     # Fallback to hardcoded rosters
     return TEAM_ROSTERS.get(race_id, TEAM_ROSTERS[DEFAULT_RACE])
 
+def refresh_rosters():
+    """
+    Reload rosters from the Google Sheet now, waiting for it
+
+    get_team_rosters never waits on the sheet, so background jobs call this
+    first to start from the sheet's current rosters.
+
+    Returns:
+        bool: True if the sheet was read (or isn't used)
+    """
+    if not ROSTER_SHEET_URL:
+        return True
+    try:
+        from google_sheets_import import refresh_sheet
+    except ImportError:
+        return True
+    return refresh_sheet(ROSTER_SHEET_URL)
+
+def get_roster_status():
+    """
+    Get where the rosters come from and when they were last refreshed
+
+    Returns:
+        dict: 'source' ('sheet', 'disk copy' or None when only the
+              hardcoded TEAM_ROSTERS are used), 'synced_at' (Unix time),
+              'error' and 'refreshing' (see google_sheets_import.sheet_status)
+    """
+    status = {'source': None, 'synced_at': None, 'error': None, 'refreshing': False}
+    if ROSTER_SHEET_URL:
+        try:
+            from google_sheets_import import sheet_status
+            status.update(sheet_status(ROSTER_SHEET_URL))
+        except ImportError:
+            pass
+    return status
+
 def get_all_races():
     """Get list of all available races sorted by start date"""
     return sorted(RACES.values(), key=lambda x: x['start_date'], reverse=True)
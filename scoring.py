@@ -0,0 +1,344 @@
+"""
+Fantasy scoring for Grand Tour GC results
+
+A team's score is the sum of its riders' cumulative GC times; the lowest
+total leads. These functions are pure: they work on GC data that has
+already been fetched (see api_client).
+
+Whole races are scored with NumPy: a RosterIndex (built once per roster
+version) gives every rostered rider one slot however many teams picked
+them, GC times are loaded into a slots x stages seconds matrix with a mask
+for missing riders, team membership is a CSR-style participant x slot
+index, and totals, riders counted, positions and gaps for every stage come
+out of a handful of array operations.
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from gc_records import NO_TEAM, RIDER_URLS, TEAM_NAMES, StageGC, rider_name
+from gc_times import seconds_to_time_str
+
+
+def calculate_team_time(team_riders: List[str], gc_data: StageGC) -> Tuple[int, int]:
+    """
+    Calculate total team time by summing rider cumulative times
+
+    Args:
+        team_riders: List of rider URLs for the team
+        gc_data: GC after the stage
+
+    Returns:
+        Tuple of (total_time_seconds, riders_counted)
+    """
+    total_seconds = 0
+    riders_counted = 0
+
+    for rider_url in team_riders:
+        record = gc_data.record(rider_url)
+        if record is not None and record.time_seconds > 0:
+            total_seconds += record.time_seconds
+            riders_counted += 1
+
+    return total_seconds, riders_counted
+
+
+class RosterIndex:
+    """
+    Rosters indexed by rider, built once per roster version
+
+    Every rider picked by any team gets one slot, however many teams picked
+    them, so a shared rider's GC row is read (and their details built) once
+    per stage for all the teams holding them. Team p's riders are the slots
+    team_slots[team_indptr[p]:team_indptr[p + 1]], in roster order.
+    """
+
+    __slots__ = ('participants', 'rider_urls', 'team_indptr', 'team_slots', '_slot_by_id')
+
+    def __init__(self, rosters: Dict[str, List[str]]):
+        """
+        Args:
+            rosters: Dictionary mapping participants to their rider URLs
+        """
+        self.participants = list(rosters)
+
+        slot_by_url: Dict[str, int] = {}
+        team_slots = []
+        for riders in rosters.values():
+            for rider_url in riders:
+                slot = slot_by_url.get(rider_url)
+                if slot is None:
+                    slot = slot_by_url[rider_url] = len(slot_by_url)
+                team_slots.append(slot)
+        self.rider_urls = list(slot_by_url)
+
+        self.team_indptr = np.zeros(len(self.participants) + 1, dtype=np.intp)
+        self.team_indptr[1:] = np.cumsum([len(riders) for riders in rosters.values()])
+        self.team_slots = np.array(team_slots, dtype=np.intp)
+
+        # Slot of every shared rider id (-1 for riders nobody picked)
+        rider_ids = np.fromiter((RIDER_URLS.intern(rider_url) for rider_url in self.rider_urls),
+                                dtype=np.intp, count=len(self.rider_urls))
+        self._slot_by_id = np.full(int(rider_ids.max()) + 1 if len(rider_ids) else 0, -1, dtype=np.intp)
+        self._slot_by_id[rider_ids] = np.arange(len(rider_ids))
+
+    def __len__(self) -> int:
+        return len(self.rider_urls)
+
+    def gc_slots(self, gc_data: StageGC) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the rostered riders in a GC
+
+        Args:
+            gc_data: GC after a stage
+
+        Returns:
+            Tuple of (rows, slots): GC rows of rostered riders and their slots
+        """
+        rider_ids = np.frombuffer(gc_data.rider_ids, dtype=np.int32)
+        slots = np.full(len(rider_ids), -1, dtype=np.intp)
+        # Riders interned after the index was built can't be on a roster
+        known = rider_ids < len(self._slot_by_id)
+        slots[known] = self._slot_by_id[rider_ids[known]]
+        rows = np.flatnonzero(slots >= 0)
+        return rows, slots[rows]
+
+
+def build_time_matrix(gc_by_stage: Dict[int, StageGC], stage_numbers: Sequence[int],
+                      index: RosterIndex) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Load GC times of rostered riders for several stages into a slots x stages matrix
+
+    Args:
+        gc_by_stage: Dictionary mapping stage number to its GC
+        stage_numbers: Stages to load, in column order
+        index: Roster index the rows follow
+
+    Returns:
+        Tuple of (times, present): times is an int32 matrix of GC seconds
+        and present is a boolean mask of riders in each stage's GC
+    """
+    times = np.zeros((len(index), len(stage_numbers)), dtype=np.int32)
+    present = np.zeros((len(index), len(stage_numbers)), dtype=bool)
+
+    for col, stage_num in enumerate(stage_numbers):
+        gc_data = gc_by_stage.get(stage_num)
+        if not gc_data:
+            continue
+        rows, slots = index.gc_slots(gc_data)
+        times[slots, col] = np.frombuffer(gc_data.times, dtype=np.int32)[rows]
+        present[slots, col] = True
+
+    return times, present
+
+
+def _segment_sum(values: np.ndarray, indptr: np.ndarray) -> np.ndarray:
+    """Sum consecutive row segments of `values` (empty segments sum to 0)"""
+    cumulative = np.zeros((values.shape[0] + 1, values.shape[1]), dtype=np.int64)
+    np.cumsum(values, axis=0, out=cumulative[1:])
+    return cumulative[indptr[1:]] - cumulative[indptr[:-1]]
+
+
+def score_matrix(times: np.ndarray, present: np.ndarray, indptr: np.ndarray,
+                 indices: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Score every team at every stage
+
+    Like calculate_team_time, a rider only counts when they are in the GC
+    with a time greater than zero.
+
+    Args:
+        times: Riders x stages matrix of GC seconds
+        present: Riders x stages mask of riders in the GC
+        indptr: CSR row pointer of the membership matrix
+        indices: CSR rider rows of the membership matrix (e.g.
+            RosterIndex.team_slots)
+
+    Returns:
+        Dictionary of participants x stages arrays: 'totals', 'counted',
+        'positions' and 'gaps', plus 'order' (participant rows sorted by
+        total time, per stage)
+    """
+    counts = present & (times > 0)
+    team_times = np.where(counts, times, 0)[indices]
+    team_counts = counts[indices].astype(np.int64)
+
+    totals = _segment_sum(team_times, indptr)
+    counted = _segment_sum(team_counts, indptr)
+
+    # Stable sort keeps roster order for tied teams, like sorted() did
+    order = np.argsort(totals, axis=0, kind='stable')
+    positions = np.empty_like(order)
+    ranks = np.broadcast_to(np.arange(1, totals.shape[0] + 1)[:, None], order.shape)
+    np.put_along_axis(positions, order, ranks, axis=0)
+
+    leader_times = totals.min(axis=0) if totals.shape[0] else np.zeros(totals.shape[1], dtype=np.int64)
+    gaps = totals - leader_times
+
+    return {
+        'totals': totals,
+        'counted': counted,
+        'positions': positions,
+        'gaps': gaps,
+        'order': order
+    }
+
+
+def _rider_details(index: RosterIndex, gc_data: StageGC) -> List[Dict]:
+    """Build one rider detail row per slot, shared by every team holding the rider"""
+    rows, slots = index.gc_slots(gc_data)
+    row_by_slot = dict(zip(slots.tolist(), rows.tolist()))
+    # Times that couldn't be read are shown as procyclingstats gave them
+    raw_times = dict(gc_data.unparsed)
+
+    details = []
+    for slot, rider_url in enumerate(index.rider_urls):
+        row = row_by_slot.get(slot)
+        if row is not None:
+            rank = gc_data.ranks[row]
+            team_id = gc_data.team_ids[row]
+            if rider_url in raw_times and not gc_data.times[row]:
+                raw_time = raw_times[rider_url]
+                time = raw_time.strip() if isinstance(raw_time, str) and raw_time.strip() else '-'
+            else:
+                time = seconds_to_time_str(gc_data.times[row])
+            details.append({
+                'name': rider_name(gc_data.rider_ids[row]),
+                'time': time,
+                'rank': rank or '-',
+                'team': TEAM_NAMES.value(team_id) if team_id != NO_TEAM else 'Unknown'
+            })
+        else:
+            # Rider not in GC (DNF, DNS, etc.)
+            details.append({
+                'name': rider_url.split('/')[-1].replace('-', ' ').title(),
+                'time': 'DNF',
+                'rank': '-',
+                'team': 'Unknown'
+            })
+    return details
+
+
+def score_stages(gc_by_stage: Dict[int, StageGC], rosters: Dict[str, List[str]],
+                 index: Optional[RosterIndex] = None) -> Dict[int, Dict]:
+    """
+    Score every team against the GC after each of several stages
+
+    Args:
+        gc_by_stage: Dictionary mapping stage number to its GC
+        rosters: Dictionary mapping participants to their rider URLs
+        index: RosterIndex of the rosters (built here if not given)
+
+    Returns:
+        Dictionary mapping stage number to its scored standings (see score_stage)
+    """
+    if index is None:
+        index = RosterIndex(rosters)
+    participants, indptr = index.participants, index.team_indptr
+    team_slots = index.team_slots.tolist()
+    bounds = indptr.tolist()
+
+    stage_numbers = sorted(gc_by_stage)
+    times, present = build_time_matrix(gc_by_stage, stage_numbers, index)
+    scores = score_matrix(times, present, indptr, index.team_slots)
+
+    # Convert to Python ints once rather than per element
+    totals = scores['totals'].T.tolist()
+    counted = scores['counted'].T.tolist()
+    gaps = scores['gaps'].T.tolist()
+    order = scores['order'].T.tolist()
+    total_riders = np.diff(indptr).tolist()
+
+    scored_stages = {}
+    for col, stage_num in enumerate(stage_numbers):
+        standings = []
+        for position, p in enumerate(order[col], start=1):
+            total_time = totals[col][p]
+            gap_seconds = gaps[col][p]
+            standings.append((participants[p], {
+                'total_time_seconds': total_time,
+                'total_time': seconds_to_time_str(total_time),
+                'riders_counted': counted[col][p],
+                'total_riders': total_riders[p],
+                'position': position,
+                'gap': "Leader" if gap_seconds == 0 else f"+{seconds_to_time_str(gap_seconds)}"
+            }))
+
+        details = _rider_details(index, gc_by_stage[stage_num])
+        rider_details = {
+            participant: [details[slot] for slot in team_slots[bounds[p]:bounds[p + 1]]]
+            for p, participant in enumerate(participants)
+        }
+
+        scored_stages[stage_num] = {
+            'standings': standings,
+            'rider_details': rider_details
+        }
+
+    return scored_stages
+
+
+def score_stage(gc_data: StageGC, rosters: Dict[str, List[str]], index: Optional[RosterIndex] = None) -> Dict:
+    """
+    Score every team against the GC after one stage
+
+    Args:
+        gc_data: GC after the stage
+        rosters: Dictionary mapping participants to their rider URLs
+        index: RosterIndex of the rosters (built here if not given)
+
+    Returns:
+        Dictionary with 'standings' (list of (participant, data) sorted by
+        total time, with position and gap) and 'rider_details'
+    """
+    return score_stages({0: gc_data}, rosters, index)[0]
+
+
+def stage_matrix(stage_data: Dict[str, Dict[int, Dict]], latest_stage: int) -> Dict:
+    """
+    Lay out stage-by-stage data as participant x stage arrays for the charts
+
+    Args:
+        stage_data: Dictionary mapping participants to {stage_number: data
+            with 'time_seconds'} (see api_client.fetch_stage_by_stage_data)
+        latest_stage: Last stage to include
+
+    Returns:
+        Dictionary with 'participants' (in stage_data order), 'stages'
+        (1 to latest_stage), 'leader_times' (lowest time per stage) and
+        participants x stages int64 arrays: 'times' (cumulative seconds),
+        'gaps' (seconds behind that stage's leader) and 'stage_times'
+        (seconds since the participant's previous stage with a time), plus
+        the boolean 'present' mask. Missing entries are 0.
+    """
+    participants = list(stage_data)
+    times = np.zeros((len(participants), latest_stage), dtype=np.int64)
+    present = np.zeros((len(participants), latest_stage), dtype=bool)
+    for row, stages in enumerate(stage_data.values()):
+        for stage_num, data in stages.items():
+            if 1 <= stage_num <= latest_stage:
+                times[row, stage_num - 1] = data['time_seconds']
+                present[row, stage_num - 1] = True
+
+    leader_times = np.where(present, times, np.iinfo(np.int64).max).min(axis=0, initial=np.iinfo(np.int64).max)
+    leader_times[~present.any(axis=0)] = 0
+    gaps = np.where(present, times - leader_times, 0)
+
+    # Column of each participant's previous stage with a time (-1 for none)
+    columns = np.broadcast_to(np.arange(latest_stage), times.shape)
+    last_seen = np.maximum.accumulate(np.where(present, columns, -1), axis=1)
+    previous = np.full(times.shape, -1, dtype=np.int64)
+    previous[:, 1:] = last_seen[:, :-1]
+    previous_times = np.where(previous >= 0, np.take_along_axis(times, np.maximum(previous, 0), axis=1), 0)
+    stage_times = np.where(present, times - previous_times, 0)
+
+    return {
+        'participants': participants,
+        'stages': np.arange(1, latest_stage + 1),
+        'times': times,
+        'present': present,
+        'leader_times': leader_times,
+        'gaps': gaps,
+        'stage_times': stage_times
+    }
@@ -0,0 +1,98 @@
+"""
+Single-flight request coalescing
+
+When several threads (Streamlit sessions, fetch workers) ask for the same
+thing at the same moment, only the first one does the work; the others wait
+for it and get the same result or exception. Streamlit's own caches only
+coalesce calls with identical cache keys, and a cache clear (e.g. a
+refresh) drops their locks, so this sits under the caches around the
+expensive part itself.
+"""
+
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+
+class _Call:
+    """One in-flight call and its outcome"""
+
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one
+
+    Usage:
+        fetches = SingleFlight()
+        gc_data = fetches.do((race_url, stage_number), scrape, race_url, stage_number)
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self._executed = 0
+        self._absorbed = 0
+
+    def do(self, key: Hashable, func: Callable, *args, **kwargs) -> Any:
+        """
+        Call `func`, or wait for the call already in flight for `key`
+
+        Args:
+            key: What is being computed, e.g. (race_url, stage_number)
+            func: Function doing the work
+            *args, **kwargs: Passed to `func`
+
+        Returns:
+            What `func` returned (for waiters, what the first caller's call
+            returned)
+
+        Raises:
+            Whatever `func` raised, in the first caller and every waiter
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self._executed += 1
+                leader = True
+            else:
+                self._absorbed += 1
+                leader = False
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get call counters
+
+        Returns:
+            Dictionary with 'executed' (calls that did the work), 'absorbed'
+            (duplicate calls that waited instead) and 'in_flight'
+        """
+        with self._lock:
+            return {
+                'executed': self._executed,
+                'absorbed': self._absorbed,
+                'in_flight': len(self._calls)
+            }
@@ -0,0 +1,391 @@
+"""
+Persistent on-disk store for stage GC data
+
+Once a stage's GC is published it almost never changes, so every scraped
+stage is written to a local SQLite file keyed by race_url and stage number.
+Stages older than the latest published stage are marked "finalized" and are
+never fetched from procyclingstats again, even after a restart. Scored
+standings of finalized stages are kept here too (see standings_engine),
+keyed by race_url, roster fingerprint and stage number, and so are the
+versioned race snapshots written by the ingestion worker (ingest_worker.py).
+
+The store location can be changed with the FANTASY_STAGE_STORE environment
+variable. Store errors are never fatal: the app just falls back to scraping.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+STAGE_STORE_PATH = os.environ.get(
+    "FANTASY_STAGE_STORE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "stage_store.sqlite3")
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS stage_gc (
+    race_url TEXT NOT NULL,
+    stage_number INTEGER NOT NULL,
+    gc_json TEXT NOT NULL,
+    finalized INTEGER NOT NULL DEFAULT 0,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (race_url, stage_number)
+);
+CREATE TABLE IF NOT EXISTS stage_standings (
+    race_url TEXT NOT NULL,
+    roster_fingerprint TEXT NOT NULL,
+    stage_number INTEGER NOT NULL,
+    standings_json TEXT NOT NULL,
+    PRIMARY KEY (race_url, roster_fingerprint, stage_number)
+);
+CREATE TABLE IF NOT EXISTS race_snapshots (
+    race_url TEXT NOT NULL,
+    roster_fingerprint TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    latest_stage INTEGER NOT NULL,
+    content_hash TEXT NOT NULL,
+    snapshot_json TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    checked_at REAL,
+    PRIMARY KEY (race_url, roster_fingerprint, version)
+);
+"""
+
+# Older snapshot versions are pruned beyond this many per race and roster
+SNAPSHOT_VERSIONS_KEPT = 5
+
+_init_lock = threading.Lock()
+_initialized_paths = set()
+
+
+def _connect() -> sqlite3.Connection:
+    """Open a connection to the store, creating the schema on first use"""
+    path = STAGE_STORE_PATH
+    with _init_lock:
+        if path not in _initialized_paths:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            conn = sqlite3.connect(path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            # Stores created before snapshots recorded when they were last checked
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(race_snapshots)")}
+            if 'checked_at' not in columns:
+                conn.execute("ALTER TABLE race_snapshots ADD COLUMN checked_at REAL")
+            conn.commit()
+            conn.close()
+            _initialized_paths.add(path)
+    return sqlite3.connect(path, timeout=30)
+
+
+def load_stage_gc(race_url: str, stage_number: int, finalized_only: bool = True) -> Optional[List[Dict]]:
+    """
+    Load stored GC data for a stage
+
+    Args:
+        race_url: URL path for the race
+        stage_number: Stage number
+        finalized_only: Only return the stage if it is marked finalized
+
+    Returns:
+        List of GC entries (see gc_records.StageGC.to_entries), or None if
+        not stored
+    """
+    try:
+        conn = _connect()
+        try:
+            row = conn.execute(
+                "SELECT gc_json, finalized FROM stage_gc WHERE race_url = ? AND stage_number = ?",
+                (race_url, stage_number)
+            ).fetchone()
+        finally:
+            conn.close()
+    except (sqlite3.Error, OSError):
+        return None
+
+    if row is None or (finalized_only and not row[1]):
+        return None
+
+    gc_entries = json.loads(row[0])
+    # Older stores kept the full entries in a dict keyed by rider_url
+    if isinstance(gc_entries, dict):
+        gc_entries = list(gc_entries.values())
+    return gc_entries
+
+
+def save_stage_gc(race_url: str, stage_number: int, gc_entries: List[Dict], finalized: bool = False) -> None:
+    """
+    Store GC data for a stage, replacing any previous copy
+
+    A stage that is already finalized stays finalized.
+
+    Args:
+        race_url: URL path for the race
+        stage_number: Stage number
+        gc_entries: List of GC entries (see gc_records.StageGC.to_entries)
+        finalized: Whether the stage is known to be final
+    """
+    try:
+        conn = _connect()
+        try:
+            with conn:
+                conn.execute(
+                    """
+                    INSERT INTO stage_gc (race_url, stage_number, gc_json, finalized, fetched_at)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (race_url, stage_number) DO UPDATE SET
+                        gc_json = excluded.gc_json,
+                        finalized = MAX(stage_gc.finalized, excluded.finalized),
+                        fetched_at = excluded.fetched_at
+                    """,
+                    (race_url, stage_number, json.dumps(gc_entries), int(finalized), time.time())
+                )
+        finally:
+            conn.close()
+    except (sqlite3.Error, OSError):
+        pass
+
+
+def finalize_stages_before(race_url: str, stage_number: int) -> None:
+    """
+    Mark every stored stage before `stage_number` as finalized
+
+    Args:
+        race_url: URL path for the race
+        stage_number: Latest published stage; earlier stages are final
+    """
+    try:
+        conn = _connect()
+        try:
+            with conn:
+                conn.execute(
+                    "UPDATE stage_gc SET finalized = 1 WHERE race_url = ? AND stage_number < ?",
+                    (race_url, stage_number)
+                )
+        finally:
+            conn.close()
+    except (sqlite3.Error, OSError):
+        pass
+
+
+def latest_stored_stage(race_url: str) -> int:
+    """
+    Get the highest stage number stored for a race
+
+    Args:
+        race_url: URL path for the race
+
+    Returns:
+        Highest stored stage number, or 0 if nothing is stored
+    """
+    try:
+        conn = _connect()
+        try:
+            row = conn.execute(
+                "SELECT MAX(stage_number) FROM stage_gc WHERE race_url = ?",
+                (race_url,)
+            ).fetchone()
+        finally:
+            conn.close()
+    except (sqlite3.Error, OSError):
+        return 0
+
+    return row[0] or 0
+
+
+def load_stage_standings(race_url: str, roster_fingerprint: str) -> Dict[int, Dict]:
+    """
+    Load every stored scored stage for a race and roster version
+
+    Args:
+        race_url: URL path for the race
+        roster_fingerprint: Fingerprint of the rosters the stages were scored with
+
+    Returns:
+        Dictionary mapping stage number to its scored standings
+    """
+    try:
+        conn = _connect()
+        try:
+            rows = conn.execute(
+                "SELECT stage_number, standings_json FROM stage_standings "
+                "WHERE race_url = ? AND roster_fingerprint = ?",
+                (race_url, roster_fingerprint)
+            ).fetchall()
+        finally:
+            conn.close()
+    except (sqlite3.Error, OSError):
+        return {}
+
+    return {stage_number: json.loads(standings_json) for stage_number, standings_json in rows}
+
+
+def save_stage_standings(race_url: str, roster_fingerprint: str, stage_number: int, standings: Dict) -> None:
+    """
+    Store the scored standings of a finalized stage
+
+    Args:
+        race_url: URL path for the race
+        roster_fingerprint: Fingerprint of the rosters the stage was scored with
+        stage_number: Stage number
+        standings: Scored standings (see scoring.score_stage)
+    """
+    try:
+        conn = _connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO stage_standings "
+                    "(race_url, roster_fingerprint, stage_number, standings_json) VALUES (?, ?, ?, ?)",
+                    (race_url, roster_fingerprint, stage_number, json.dumps(standings))
+                )
+        finally:
+            conn.close()
+    except (sqlite3.Error, OSError):
+        pass
+
+
+def clear_stage_standings(race_url: str) -> None:
+    """
+    Drop every stored scored stage of a race (e.g. after its GC was rebuilt)
+
+    Args:
+        race_url: URL path for the race
+    """
+    try:
+        conn = _connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM stage_standings WHERE race_url = ?", (race_url,))
+        finally:
+            conn.close()
+    except (sqlite3.Error, OSError):
+        pass
+
+
+def save_race_snapshot(race_url: str, roster_fingerprint: str, latest_stage: int, snapshot: Dict) -> Optional[int]:
+    """
+    Store a new version of a race snapshot
+
+    A snapshot identical to the latest stored version only updates that
+    version's checked_at, so versions only change when the standings do.
+
+    Args:
+        race_url: URL path for the race
+        roster_fingerprint: Fingerprint of the rosters the snapshot was scored with
+        latest_stage: Latest stage the snapshot covers
+        snapshot: JSON-serializable snapshot data
+
+    Returns:
+        Version of the stored snapshot (the existing one if unchanged), or
+        None on store errors
+    """
+    snapshot_json = json.dumps(snapshot, sort_keys=True)
+    content_hash = hashlib.sha1(snapshot_json.encode("utf-8")).hexdigest()
+    try:
+        conn = _connect()
+        try:
+            with conn:
+                row = conn.execute(
+                    "SELECT version, content_hash FROM race_snapshots "
+                    "WHERE race_url = ? AND roster_fingerprint = ? ORDER BY version DESC LIMIT 1",
+                    (race_url, roster_fingerprint)
+                ).fetchone()
+                now = time.time()
+                if row is not None and row[1] == content_hash:
+                    conn.execute(
+                        "UPDATE race_snapshots SET checked_at = ? "
+                        "WHERE race_url = ? AND roster_fingerprint = ? AND version = ?",
+                        (now, race_url, roster_fingerprint, row[0])
+                    )
+                    return row[0]
+
+                version = (row[0] if row is not None else 0) + 1
+                conn.execute(
+                    "INSERT INTO race_snapshots (race_url, roster_fingerprint, version, latest_stage, "
+                    "content_hash, snapshot_json, created_at, checked_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (race_url, roster_fingerprint, version, latest_stage, content_hash, snapshot_json, now, now)
+                )
+                conn.execute(
+                    "DELETE FROM race_snapshots WHERE race_url = ? AND roster_fingerprint = ? AND version <= ?",
+                    (race_url, roster_fingerprint, version - SNAPSHOT_VERSIONS_KEPT)
+                )
+        finally:
+            conn.close()
+    except (sqlite3.Error, OSError):
+        return None
+
+    return version
+
+
+def latest_snapshot_version(race_url: str, roster_fingerprint: str) -> Tuple[int, Optional[float]]:
+    """
+    Get the latest snapshot version of a race, without loading it
+
+    Args:
+        race_url: URL path for the race
+        roster_fingerprint: Fingerprint of the rosters
+
+    Returns:
+        (latest version, Unix time the worker last found it current), or
+        (0, None) if there is no snapshot
+    """
+    try:
+        conn = _connect()
+        try:
+            row = conn.execute(
+                "SELECT version, COALESCE(checked_at, created_at) FROM race_snapshots "
+                "WHERE race_url = ? AND roster_fingerprint = ? ORDER BY version DESC LIMIT 1",
+                (race_url, roster_fingerprint)
+            ).fetchone()
+        finally:
+            conn.close()
+    except (sqlite3.Error, OSError):
+        return 0, None
+
+    if row is None:
+        return 0, None
+    return row[0], row[1]
+
+
+def load_race_snapshot(race_url: str, roster_fingerprint: str) -> Optional[Dict]:
+    """
+    Load the latest snapshot of a race
+
+    Args:
+        race_url: URL path for the race
+        roster_fingerprint: Fingerprint of the rosters
+
+    Returns:
+        Dictionary with version, latest_stage, created_at, checked_at (when
+        the worker last found it current) and the stored snapshot under
+        'data', or None if there is no snapshot
+    """
+    try:
+        conn = _connect()
+        try:
+            row = conn.execute(
+                "SELECT version, latest_stage, snapshot_json, created_at, COALESCE(checked_at, created_at) "
+                "FROM race_snapshots "
+                "WHERE race_url = ? AND roster_fingerprint = ? ORDER BY version DESC LIMIT 1",
+                (race_url, roster_fingerprint)
+            ).fetchone()
+        finally:
+            conn.close()
+    except (sqlite3.Error, OSError):
+        return None
+
+    if row is None:
+        return None
+
+    version, latest_stage, snapshot_json, created_at, checked_at = row
+    return {
+        'version': version,
+        'latest_stage': latest_stage,
+        'created_at': created_at,
+        'checked_at': checked_at,
+        'data': json.loads(snapshot_json)
+    }
@@ -0,0 +1,186 @@
+"""
+Incremental standings engine
+
+Each finalized stage is scored once per roster version and the result is
+kept, so standings for an earlier stage are a lookup and a newly published
+stage is the only one that needs scoring. Scored stages are also written to
+the stage store, so they survive restarts.
+
+GC times are cumulative, so a stage's standings only depend on that stage's
+GC; the latest (not yet final) stage is always scored fresh by the caller.
+The rosters' rider index (scoring.RosterIndex) is likewise built once per
+roster version and reused for every stage scored.
+"""
+
+import hashlib
+import json
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import stage_store
+from scoring import RosterIndex, score_stage, score_stages
+
+# Scored finalized stages per (race_url, roster fingerprint): {stage_number: scored}
+_scored_stages: Dict[Tuple[str, str], Dict[int, Dict]] = {}
+_scored_stages_lock = threading.Lock()
+
+# Roster indexes per roster fingerprint, oldest first
+ROSTER_INDEXES_KEPT = 32
+_roster_indexes: Dict[str, RosterIndex] = {}
+_roster_indexes_lock = threading.Lock()
+
+
+def roster_fingerprint(rosters: Dict[str, List[str]]) -> str:
+    """
+    Fingerprint a set of rosters so scored stages can be tied to them
+
+    Participant order is part of the fingerprint because it decides how
+    tied teams are ordered.
+
+    Args:
+        rosters: Dictionary mapping participants to their rider URLs
+
+    Returns:
+        Short hex digest
+    """
+    return hashlib.sha1(json.dumps(rosters).encode("utf-8")).hexdigest()[:16]
+
+
+def roster_index(rosters: Dict[str, List[str]], fingerprint: Optional[str] = None) -> RosterIndex:
+    """
+    Get the rider index of a set of rosters, building it once per roster version
+
+    Args:
+        rosters: Dictionary mapping participants to their rider URLs
+        fingerprint: roster_fingerprint(rosters), if already known
+
+    Returns:
+        RosterIndex of the rosters
+    """
+    if fingerprint is None:
+        fingerprint = roster_fingerprint(rosters)
+    with _roster_indexes_lock:
+        index = _roster_indexes.get(fingerprint)
+    if index is None:
+        index = RosterIndex(rosters)
+        with _roster_indexes_lock:
+            while len(_roster_indexes) >= ROSTER_INDEXES_KEPT:
+                del _roster_indexes[next(iter(_roster_indexes))]
+            _roster_indexes[fingerprint] = index
+    return index
+
+
+def _race_stages(race_url: str, fingerprint: str) -> Dict[int, Dict]:
+    """Get the scored stages of a race, loading them from the store once"""
+    key = (race_url, fingerprint)
+    with _scored_stages_lock:
+        scored = _scored_stages.get(key)
+        if scored is None:
+            scored = stage_store.load_stage_standings(race_url, fingerprint)
+            _scored_stages[key] = scored
+        return scored
+
+
+def _from_stored(scored: Dict) -> Dict:
+    """Copy a scored stage for a caller (standings rows are (participant, data) tuples)"""
+    return {
+        'standings': [(participant, dict(data)) for participant, data in scored['standings']],
+        'rider_details': scored['rider_details']
+    }
+
+
+def forget_rosters(race_url: str, fingerprint: str) -> None:
+    """
+    Drop a race's scored stages for rosters that are no longer used from
+    memory (they stay in the stage store)
+
+    Args:
+        race_url: URL path for the race
+        fingerprint: roster_fingerprint of the old rosters
+    """
+    with _scored_stages_lock:
+        _scored_stages.pop((race_url, fingerprint), None)
+
+
+def get_scored_stage(race_url: str, stage_number: int, rosters: Dict[str, List[str]]) -> Optional[Dict]:
+    """
+    Look up the standings of a finalized stage
+
+    Args:
+        race_url: URL path for the race
+        stage_number: Stage number
+        rosters: Dictionary mapping participants to their rider URLs
+
+    Returns:
+        Scored standings (see scoring.score_stage), or None if not scored yet
+    """
+    scored = _race_stages(race_url, roster_fingerprint(rosters)).get(stage_number)
+    return _from_stored(scored) if scored is not None else None
+
+
+def get_scored_stages(race_url: str, rosters: Dict[str, List[str]]) -> Dict[int, Dict]:
+    """
+    Get the standings of every finalized stage scored so far
+
+    Args:
+        race_url: URL path for the race
+        rosters: Dictionary mapping participants to their rider URLs
+
+    Returns:
+        Dictionary mapping stage number to scored standings
+    """
+    race_stages = _race_stages(race_url, roster_fingerprint(rosters))
+    with _scored_stages_lock:
+        return {stage_number: _from_stored(scored) for stage_number, scored in race_stages.items()}
+
+
+def add_stage(race_url: str, stage_number: int, rosters: Dict[str, List[str]],
+              gc_data: Dict, finalized: bool) -> Dict:
+    """
+    Score a stage and, if it is finalized, keep the result
+
+    Args:
+        race_url: URL path for the race
+        stage_number: Stage number
+        rosters: Dictionary mapping participants to their rider URLs
+        gc_data: GC after the stage (gc_records.StageGC)
+        finalized: Whether the stage's GC is final
+
+    Returns:
+        Scored standings (see scoring.score_stage)
+    """
+    fingerprint = roster_fingerprint(rosters)
+    scored = score_stage(gc_data, rosters, roster_index(rosters, fingerprint))
+    if finalized:
+        race_stages = _race_stages(race_url, fingerprint)
+        with _scored_stages_lock:
+            race_stages[stage_number] = _from_stored(scored)
+        stage_store.save_stage_standings(race_url, fingerprint, stage_number, scored)
+    return scored
+
+
+def add_stages(race_url: str, gc_by_stage: Dict[int, Dict], rosters: Dict[str, List[str]],
+               latest_stage: int) -> Dict[int, Dict]:
+    """
+    Score several stages in one pass and keep the finalized ones
+
+    Args:
+        race_url: URL path for the race
+        gc_by_stage: Dictionary mapping stage number to its GC
+        rosters: Dictionary mapping participants to their rider URLs
+        latest_stage: Latest published stage; stages before it are final
+
+    Returns:
+        Dictionary mapping stage number to scored standings
+    """
+    fingerprint = roster_fingerprint(rosters)
+    scored_stages = score_stages(gc_by_stage, rosters, roster_index(rosters, fingerprint))
+    finalized = {n: scored for n, scored in scored_stages.items() if n < latest_stage}
+    if finalized:
+        race_stages = _race_stages(race_url, fingerprint)
+        with _scored_stages_lock:
+            for stage_number, scored in finalized.items():
+                race_stages[stage_number] = _from_stored(scored)
+        for stage_number, scored in finalized.items():
+            stage_store.save_stage_standings(race_url, fingerprint, stage_number, scored)
+    return scored_stages
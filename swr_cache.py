@@ -0,0 +1,126 @@
+"""
+Stale-while-revalidate cache
+
+Keeps the last good result per key. A fresh result is served as is; a stale
+one is served immediately while a background thread computes its
+replacement, so viewers never wait on a scrape once a key has a value. Only
+the very first request for a key (or one after an explicit invalidate)
+blocks, and even then a failed computation falls back to the previous good
+value. None and exceptions count as failures and never replace a good value.
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple, Union
+
+
+class _Entry:
+    __slots__ = ('value', 'fetched_at', 'must_revalidate')
+
+    def __init__(self, value: Any, fetched_at: float):
+        self.value = value
+        self.fetched_at = fetched_at
+        self.must_revalidate = False
+
+
+class SWRCache:
+    """
+    Last-good-value cache with background revalidation
+
+    Args:
+        fresh_for: Seconds a value is served without revalidating, or a
+            function of the key returning them (None: never revalidate)
+        name: Name for background threads
+    """
+
+    def __init__(self, fresh_for: Union[float, Callable[[Hashable], Optional[float]]], name: str = "swr"):
+        self.fresh_for = fresh_for
+        self.name = name
+        self._entries: Dict[Hashable, _Entry] = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def _compute(self, key: Hashable, compute: Callable, args: tuple) -> Optional[Any]:
+        """Run `compute` and keep its result if it's good"""
+        try:
+            value = compute(*args)
+        except Exception:
+            value = None
+        if value is not None:
+            with self._lock:
+                self._entries[key] = _Entry(value, time.time())
+        return value
+
+    def _refresh_in_background(self, key: Hashable, compute: Callable, args: tuple) -> None:
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self._compute(key, compute, args)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, name=f"{self.name}-refresh", daemon=True).start()
+
+    def get(self, key: Hashable, compute: Callable, *args) -> Tuple[Optional[Any], Optional[float]]:
+        """
+        Get the value for a key
+
+        Args:
+            key: Cache key
+            compute: Function computing a fresh value (None means failure)
+            *args: Passed to `compute`
+
+        Returns:
+            (value, age in seconds); (None, None) if there is no good value
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+
+        if entry is None or entry.must_revalidate:
+            value = self._compute(key, compute, args)
+            if value is not None:
+                return value, 0.0
+            if entry is None:
+                return None, None
+            # Keep serving the last good value
+            return entry.value, time.time() - entry.fetched_at
+
+        age = time.time() - entry.fetched_at
+        fresh_for = self.fresh_for(key) if callable(self.fresh_for) else self.fresh_for
+        if fresh_for is not None and age >= fresh_for:
+            self._refresh_in_background(key, compute, args)
+        return entry.value, age
+
+    def is_refreshing(self, key: Hashable) -> bool:
+        """Whether a background refresh for a key is running"""
+        with self._lock:
+            return key in self._refreshing
+
+    def discard(self, predicate: Callable[[Hashable], bool]) -> None:
+        """
+        Drop matching keys and their values
+
+        Args:
+            predicate: Called with each key; True drops it
+        """
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> None:
+        """
+        Make the next get of matching keys compute a fresh value (falling
+        back to the current one if that fails)
+
+        Args:
+            predicate: Called with each key; True invalidates it
+        """
+        with self._lock:
+            for key, entry in self._entries.items():
+                if predicate(key):
+                    entry.must_revalidate = True
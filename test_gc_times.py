@@ -0,0 +1,71 @@
+"""
+Tests for GC time parsing (gc_times.parse_gc_times)
+"""
+
+import pytest
+
+from gc_times import parse_gc_times
+
+LEADER = "80:12:34"
+LEADER_SECONDS = 80 * 3600 + 12 * 60 + 34
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("80:15:00", 80 * 3600 + 15 * 60),
+    (" 80:15:00 ", 80 * 3600 + 15 * 60),
+    ("4 days, 8:15:00", 4 * 86400 + 8 * 3600 + 15 * 60),
+    ("+1:23", LEADER_SECONDS + 83),
+    ("+1:02:03", LEADER_SECONDS + 3723),
+    ("+0:00", LEADER_SECONDS),
+    ("+1:23.45", LEADER_SECONDS + 83),
+])
+def test_accepted_formats_after_leader(value, expected):
+    seconds, errors = parse_gc_times([LEADER, value])
+
+    assert seconds == [LEADER_SECONDS, expected]
+    assert errors == []
+
+
+def test_minutes_and_seconds():
+    seconds, errors = parse_gc_times(["12:34", "+0:10"])
+
+    assert seconds == [754, 764]
+    assert errors == []
+
+
+@pytest.mark.parametrize("marker", [",,", "s.t.", "st", " s.t "])
+def test_same_time_markers_copy_rider_above(marker):
+    seconds, errors = parse_gc_times([LEADER, "+0:30", marker])
+
+    assert seconds == [LEADER_SECONDS, LEADER_SECONDS + 30, LEADER_SECONDS + 30]
+    assert errors == []
+
+
+def test_leader_may_have_zero_time():
+    seconds, errors = parse_gc_times(["0:00:00", "+0:05"])
+
+    assert seconds == [0, 5]
+    assert errors == []
+
+
+@pytest.mark.parametrize("value", [None, "", "   ", "-0:12", "x", 12, 12.5, "0:00:00", "0:00"])
+def test_rejected_values_after_leader(value):
+    seconds, errors = parse_gc_times([LEADER, value, "+0:10"])
+
+    assert seconds == [LEADER_SECONDS, None, LEADER_SECONDS + 10]
+    assert errors == [(1, value)]
+
+
+def test_rejected_value_is_not_copied_by_same_time_marker():
+    seconds, errors = parse_gc_times([LEADER, "+0:30", None, ",,"])
+
+    assert seconds == [LEADER_SECONDS, LEADER_SECONDS + 30, None, LEADER_SECONDS + 30]
+    assert errors == [(2, None)]
+
+
+@pytest.mark.parametrize("value", [",,", "+0:10", None])
+def test_leader_row_needs_an_absolute_time(value):
+    seconds, errors = parse_gc_times([value, "80:00:00"])
+
+    assert seconds == [None, 80 * 3600]
+    assert errors == [(0, value)]
@@ -0,0 +1,75 @@
+"""
+Tests for roster sheet parsing (google_sheets_import.parse_rosters)
+
+parse_rosters is checked against the row-by-row loop it replaced on random
+sheets with blank cells, padded values and repeated participants.
+"""
+
+import random
+
+import pandas as pd
+import pytest
+
+from google_sheets_import import parse_rosters
+
+RACE_IDS = ["giro-2026", "tdf-2026", "vuelta-2026"]
+PARTICIPANTS = ["Jeremy", " Leo", "Aaron ", "Sam", "Sam "]
+RIDERS = ["rider/tadej-pogacar", " rider/jonas-vingegaard", "rider/remco-evenepoel ", "rider/joao-almeida"]
+
+
+def loop_parse_rosters(df: pd.DataFrame) -> dict:
+    """The row loop parse_rosters replaced"""
+    df.columns = df.columns.str.strip()
+    rosters_by_race = {}
+    for race_id in df['Race ID'].unique():
+        if pd.isna(race_id):
+            continue
+        race_df = df[df['Race ID'] == race_id]
+        rosters = {}
+        for _, row in race_df.iterrows():
+            participant = row['Participant']
+            if pd.isna(participant):
+                continue
+            participant = str(participant).strip()
+            riders = []
+            for col in df.columns:
+                if col.startswith('Rider') and pd.notna(row[col]) and str(row[col]).strip():
+                    riders.append(str(row[col]).strip())
+            rosters[participant] = riders
+        if rosters:
+            rosters_by_race[race_id] = rosters
+    return rosters_by_race
+
+
+def random_sheet(rng: random.Random) -> pd.DataFrame:
+    """Random roster sheet with blank cells, padding and repeated participants"""
+    rider_columns = [f"Rider{n}" for n in range(1, rng.randint(1, 9))]
+    rows = []
+    for _ in range(rng.randint(0, 30)):
+        row = {
+            'Race ID': rng.choice(RACE_IDS + [None]),
+            ' Participant ': rng.choice(PARTICIPANTS + [None]),
+        }
+        for col in rider_columns:
+            row[col] = rng.choice(RIDERS + [None, "", "  "])
+        rows.append(row)
+    return pd.DataFrame(rows, columns=['Race ID', ' Participant '] + rider_columns)
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_parse_rosters_matches_row_loop(seed):
+    df = random_sheet(random.Random(seed))
+
+    rosters = parse_rosters(df.copy())
+    expected = loop_parse_rosters(df.copy())
+
+    assert rosters == expected
+    # Race and participant order matter too (the app lists them in sheet order)
+    assert list(rosters) == list(expected)
+    for race_id in expected:
+        assert list(rosters[race_id]) == list(expected[race_id])
+
+
+def test_missing_columns_raise_value_error():
+    with pytest.raises(ValueError):
+        parse_rosters(pd.DataFrame({'Race ID': ["giro-2026"], 'Rider1': ["rider/a"]}))
@@ -0,0 +1,144 @@
+"""
+Tests for the outbound request policy (http_policy)
+"""
+
+import time
+
+import pytest
+
+import http_policy
+from http_policy import CircuitBreaker, CircuitOpenError, HostPolicy, TokenBucket
+
+COOLDOWN = 0.05
+
+
+def open_breaker(failure_threshold: int = 3) -> CircuitBreaker:
+    breaker = CircuitBreaker("example.test", failure_threshold, COOLDOWN)
+    for _ in range(failure_threshold):
+        breaker.before_call()
+        breaker.record_failure()
+    return breaker
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("example.test", 3, COOLDOWN)
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure()
+    breaker.before_call()
+    breaker.record_success()
+    assert (breaker.state, breaker.consecutive_failures) == (CircuitBreaker.CLOSED, 0)
+
+    breaker = open_breaker()
+    assert (breaker.state, breaker.times_opened) == (CircuitBreaker.OPEN, 1)
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    assert 0 < breaker.retry_after() <= COOLDOWN
+
+
+def test_breaker_open_half_open_closed():
+    breaker = open_breaker()
+    time.sleep(COOLDOWN)
+
+    # One trial call after the cool-down; others fail fast meanwhile
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record_success()
+    assert (breaker.state, breaker.consecutive_failures) == (CircuitBreaker.CLOSED, 0)
+    breaker.before_call()
+    breaker.before_call()
+
+
+def test_failed_trial_reopens_breaker():
+    breaker = open_breaker()
+    time.sleep(COOLDOWN)
+
+    breaker.before_call()
+    breaker.record_failure()
+
+    assert (breaker.state, breaker.times_opened) == (CircuitBreaker.OPEN, 2)
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_token_bucket_paces_after_burst():
+    bucket = TokenBucket(rate=20, burst=2)
+
+    assert [bucket.acquire() for _ in range(2)] == [0.0, 0.0]
+    started = time.monotonic()
+    waited = bucket.acquire()
+
+    assert waited > 0
+    assert time.monotonic() - started >= 0.04
+
+
+def test_token_bucket_rate_zero_never_waits():
+    bucket = TokenBucket(rate=0, burst=1)
+
+    assert [bucket.acquire() for _ in range(10)] == [0.0] * 10
+
+
+def test_host_policy_retries_transient_errors(monkeypatch):
+    monkeypatch.setattr(http_policy, "RETRY_BASE_DELAY", 0)
+    policy = HostPolicy("example.test")
+    attempts = []
+
+    def flaky():
+        attempts.append(None)
+        if len(attempts) < http_policy.MAX_ATTEMPTS:
+            raise ConnectionError("reset")
+        return "page"
+
+    assert policy.call(flaky) == "page"
+    state = policy.state()
+    assert state['attempts'] == http_policy.MAX_ATTEMPTS
+    assert state['retries'] == state['failures'] == http_policy.MAX_ATTEMPTS - 1
+    assert state['breaker'] == CircuitBreaker.CLOSED
+
+
+def test_host_policy_doesnt_retry_other_errors():
+    policy = HostPolicy("example.test")
+    attempts = []
+
+    def broken():
+        attempts.append(None)
+        raise KeyError("parser")
+
+    with pytest.raises(KeyError):
+        policy.call(broken)
+    assert len(attempts) == 1
+    assert policy.state()['consecutive_failures'] == 0
+
+
+def test_interrupted_trial_doesnt_keep_breaker_half_open(monkeypatch):
+    monkeypatch.setattr(http_policy, "BREAKER_COOLDOWN", COOLDOWN)
+    policy = HostPolicy("example.test")
+    for _ in range(http_policy.FAILURE_THRESHOLD):
+        policy.breaker.before_call()
+        policy.breaker.record_failure()
+    time.sleep(COOLDOWN)
+
+    def interrupted():
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        policy.call(interrupted)
+    assert policy.call(lambda: "page") == "page"
+    assert policy.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_parse_errors_are_not_retried():
+    policy = HostPolicy("example.test")
+    attempts = []
+
+    def unparseable():
+        attempts.append(None)
+        raise ValueError("Given HTML is invalid.")
+
+    with pytest.raises(ValueError):
+        policy.call(unparseable)
+    assert len(attempts) == 1
+    assert policy.state()['failures'] == 0
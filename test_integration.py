@@ -1,60 +1,140 @@
 """
 Test the API integration without running the full Streamlit app
+
+Runs api_client end to end (scraping, parsing, scoring and caching) against
+the local procyclingstats stand-in (see the `standin` fixture in conftest.py).
 """
 
-import sys
-print("Testing API integration...")
-print("=" * 60)
-
-# Test imports
-print("\n1. Testing imports...")
-try:
-    from api_client import fetch_fantasy_standings, fetch_stage_by_stage_data
-    from team_config import TEAM_ROSTERS, RACE_CONFIG
-    print("✓ Imports successful")
-except Exception as e:
-    print(f"✗ Import error: {e}")
-    sys.exit(1)
-
-# Test team rosters
-print("\n2. Checking team rosters...")
-print(f"   Teams configured: {list(TEAM_ROSTERS.keys())}")
-print(f"   Race: {RACE_CONFIG['race_name']}")
-print(f"   Race URL: {RACE_CONFIG['race_url']}")
-
-for team, riders in TEAM_ROSTERS.items():
-    print(f"   {team}: {len(riders)} riders")
-
-# Test API fetching
-print("\n3. Testing fantasy standings fetch...")
-try:
-    fantasy_data = fetch_fantasy_standings()
-
-    if fantasy_data is None:
-        print("✗ No data returned (race may not have started yet)")
-        print("   This is expected if Tour de France 2025 hasn't started")
-    else:
-        print("✓ Data fetched successfully!")
-        print(f"   Latest stage: {fantasy_data['latest_stage']}")
-        print(f"   Teams: {len(fantasy_data['standings'])}")
-
-        print("\n   Current Standings:")
-        for participant, data in fantasy_data['standings']:
-            position = data['position']
-            total_time = data['total_time']
-            gap = data['gap']
-            riders_counted = data['riders_counted']
-            print(f"      {position}. {participant}: {total_time} ({gap}) - {riders_counted}/{data['total_riders']} riders")
-
-        # Test stage-by-stage data
-        print("\n4. Testing stage-by-stage data fetch...")
-        stage_data = fetch_stage_by_stage_data(fantasy_data['latest_stage'])
-        print(f"✓ Stage data fetched for {len(stage_data)} teams")
-
-except Exception as e:
-    print(f"✗ Error during fetch: {e}")
-    import traceback
-    traceback.print_exc()
-
-print("\n" + "=" * 60)
-print("Integration test complete!")
+import pytest
+
+import api_client
+from api_client import fetch_fantasy_standings, fetch_stage_by_stage_data, fetch_stage_gc
+from scoring import calculate_team_time
+from team_config import RACE_CONFIG, TEAM_ROSTERS
+
+RACE_URL = RACE_CONFIG["race_url"]
+
+
+@pytest.mark.parametrize("standin", [1, 5, 21], indirect=True)
+def test_fantasy_standings(standin):
+    fantasy_data = fetch_fantasy_standings(race_url=RACE_URL)
+
+    assert fantasy_data is not None
+    assert fantasy_data['latest_stage'] == standin.published_stages
+
+    standings = fantasy_data['standings']
+    assert sorted(participant for participant, _ in standings) == sorted(TEAM_ROSTERS)
+    assert [data['position'] for _, data in standings] == list(range(1, len(TEAM_ROSTERS) + 1))
+    assert standings[0][1]['gap'] == "Leader"
+
+    # Totals are the riders' GC times after the latest stage
+    gc_data = fetch_stage_gc(fantasy_data['latest_stage'], RACE_URL)
+    for participant, data in standings:
+        total_seconds, riders_counted = calculate_team_time(TEAM_ROSTERS[participant], gc_data)
+        assert (data['total_time_seconds'], data['riders_counted']) == (total_seconds, riders_counted)
+        assert data['total_riders'] == len(TEAM_ROSTERS[participant])
+
+
+@pytest.mark.parametrize("standin", [1, 5, 21], indirect=True)
+def test_stage_by_stage_data(standin):
+    latest_stage = fetch_fantasy_standings(race_url=RACE_URL)['latest_stage']
+
+    stage_data = fetch_stage_by_stage_data(latest_stage, race_url=RACE_URL)
+
+    assert sorted(stage_data) == sorted(TEAM_ROSTERS)
+    for participant, stages in stage_data.items():
+        assert sorted(stages) == list(range(1, latest_stage + 1))
+        for stage_number, data in stages.items():
+            gc_data = fetch_stage_gc(stage_number, RACE_URL)
+            assert data['time_seconds'] == calculate_team_time(TEAM_ROSTERS[participant], gc_data)[0]
+
+
+@pytest.mark.parametrize("standin", [5], indirect=True)
+def test_second_load_comes_from_cache(standin):
+    latest_stage = fetch_fantasy_standings(race_url=RACE_URL)['latest_stage']
+    fetch_stage_by_stage_data(latest_stage, race_url=RACE_URL)
+    requests_made = standin.request_count
+
+    fetch_fantasy_standings(race_url=RACE_URL)
+    fetch_stage_by_stage_data(latest_stage, race_url=RACE_URL)
+
+    assert standin.request_count == requests_made
+
+
+@pytest.mark.parametrize("standin", [0], indirect=True)
+def test_race_not_started(standin):
+    assert fetch_fantasy_standings(race_url=RACE_URL) is None
+
+
+@pytest.mark.parametrize("standin", [5], indirect=True)
+def test_site_errors_are_not_cached(standin, monkeypatch):
+    import http_policy
+    monkeypatch.setattr(http_policy, "RETRY_BASE_DELAY", 0)
+
+    standin.error_rate = 1.0
+    assert fetch_fantasy_standings(race_url=RACE_URL) is None
+
+    standin.error_rate = 0.0
+    monkeypatch.setattr(http_policy, "_policies", {})
+    fantasy_data = fetch_fantasy_standings(race_url=RACE_URL)
+    assert fantasy_data is not None
+    assert fantasy_data['latest_stage'] == 5
+    # Failed fetches never mark a published stage as not published
+    assert all(stage_number > 5 for _, stage_number in api_client._not_published)
+
+
+@pytest.mark.parametrize("standin", [5], indirect=True)
+def test_disk_errors_dont_stop_scraping(standin, monkeypatch, tmp_path):
+    import html_archive
+    import http_policy
+    import stage_store
+
+    # A file where the directories should be: creating them fails with OSError
+    blocker = tmp_path / "not-a-directory"
+    blocker.write_text("")
+    monkeypatch.setattr(stage_store, "STAGE_STORE_PATH", str(blocker / "stage_store.sqlite3"))
+    monkeypatch.setattr(html_archive, "HTML_ARCHIVE_PATH", str(blocker / "html_archive.sqlite3"))
+
+    fantasy_data = fetch_fantasy_standings(race_url=RACE_URL)
+
+    assert fantasy_data is not None
+    assert fantasy_data['latest_stage'] == 5
+    state = http_policy.policy_state()[standin.base_url.split('/')[2]]
+    assert (state['failures'], state['retries']) == (0, 0)
+
+
+@pytest.mark.parametrize("html, error", [
+    ('<html><body><div class="page-content"><div>Due to technical difficulties this page is '
+     'temporarily unavailable.</div></div></body></html>', "TransientHTTPError"),
+    ('<html><body><div class="page-title"><div class="main"><h1>Page not found</h1></div></div>'
+     '</body></html>', "PageNotFoundError"),
+])
+def test_error_pages(monkeypatch, html, error):
+    import pcs_http
+    from procyclingstats import Stage
+
+    monkeypatch.setattr(api_client, "FETCH_RAW_HTML", True)
+    monkeypatch.setattr(pcs_http, "fetch_html", lambda url: html)
+
+    with pytest.raises(getattr(pcs_http, error)):
+        api_client._load_page(Stage, f"{RACE_URL}/stage-1")
+
+
+@pytest.mark.parametrize("standin", [5], indirect=True)
+def test_unreadable_times_warned_whatever_called_first(standin, monkeypatch):
+    import stage_store
+
+    stage_store.save_stage_gc(RACE_URL, 1, [
+        {'rider_url': "rider/a", 'rider_name': "A", 'team_name': "T", 'rank': 1, 'time': "10:00:00"},
+        {'rider_url': "rider/b", 'rider_name': "B", 'team_name': "T", 'rank': 2, 'time': None},
+    ], finalized=True)
+    warnings = []
+    monkeypatch.setattr(api_client.st, "warning", warnings.append)
+
+    # A quiet probe fills the cache first; later callers still get the warning
+    assert fetch_stage_gc(1, RACE_URL, _quiet=True).unparsed == (("rider/b", None),)
+    assert warnings == []
+    for _ in range(2):
+        fetch_stage_gc(1, RACE_URL)
+    assert len(warnings) == 2
+    assert "rider/b" in warnings[0]
@@ -0,0 +1,129 @@
+"""
+Tests for the vectorized scoring in scoring.py
+
+score_stages is checked against calculate_team_time, the per-team loop it
+replaced, on random rosters and GCs with abandoned riders, unreadable
+times, riders picked by several teams and tied teams.
+"""
+
+import random
+
+import pytest
+
+from gc_records import StageGC
+from gc_times import seconds_to_time_str
+from scoring import calculate_team_time, score_stage, score_stages
+
+FIELD = [f"rider/test-rider-{i}" for i in range(60)]
+
+
+def random_gc(rng: random.Random, stage_number: int) -> StageGC:
+    """GC of a random part of the field, with bunch times and unreadable cells"""
+    riders = [rider_url for rider_url in FIELD if rng.random() > 0.15]
+    rng.shuffle(riders)
+    leader = stage_number * 4 * 3600
+    entries = []
+    for rank, rider_url in enumerate(riders, start=1):
+        # Few distinct gaps, so equal team totals come up
+        time = seconds_to_time_str(leader + rng.choice((0, 10, 20, 60)) * (rank > 1))
+        if rank > 1 and rng.random() < 0.05:
+            time = rng.choice((None, "", "x"))
+        entries.append({
+            'rider_url': rider_url,
+            'rider_name': rider_url.split('/')[-1],
+            'team_name': f"Team {rank % 7}",
+            'rank': rank,
+            'time': time
+        })
+    return StageGC.from_entries(entries)
+
+
+def random_rosters(rng: random.Random, teams: int) -> dict:
+    """Rosters drawing on one field, so riders are shared between teams"""
+    rosters = {}
+    for team in range(teams):
+        size = rng.choice((0, 3, 8, 8, 8))
+        rosters[f"Team {team}"] = rng.sample(FIELD, size)
+    # A team identical to another, so they always tie
+    if teams > 1:
+        rosters["Copy of Team 1"] = list(rosters["Team 1"])
+    return rosters
+
+
+def expected_standings(gc_data: StageGC, rosters: dict) -> list:
+    """Standings as the loop over calculate_team_time built them"""
+    results = []
+    for participant, riders in rosters.items():
+        total_seconds, riders_counted = calculate_team_time(riders, gc_data)
+        results.append((participant, total_seconds, riders_counted, len(riders)))
+    results.sort(key=lambda result: result[1])
+    leader_time = results[0][1] if results else 0
+    return [
+        (participant, {
+            'total_time_seconds': total_seconds,
+            'total_time': seconds_to_time_str(total_seconds),
+            'riders_counted': riders_counted,
+            'total_riders': total_riders,
+            'position': position,
+            'gap': "Leader" if total_seconds == leader_time
+            else f"+{seconds_to_time_str(total_seconds - leader_time)}"
+        })
+        for position, (participant, total_seconds, riders_counted, total_riders) in enumerate(results, start=1)
+    ]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_score_stages_matches_calculate_team_time(seed):
+    rng = random.Random(seed)
+    rosters = random_rosters(rng, rng.randint(1, 12))
+    gc_by_stage = {stage_number: random_gc(rng, stage_number) for stage_number in range(1, 6)}
+
+    scored = score_stages(gc_by_stage, rosters)
+
+    assert sorted(scored) == sorted(gc_by_stage)
+    for stage_number, gc_data in gc_by_stage.items():
+        assert scored[stage_number]['standings'] == expected_standings(gc_data, rosters)
+
+
+def test_tied_teams_keep_roster_order():
+    gc_data = StageGC.from_entries([
+        {'rider_url': FIELD[0], 'rank': 1, 'time': "10:00:00"},
+        {'rider_url': FIELD[1], 'rank': 2, 'time': ",,"},
+    ])
+    rosters = {"B": [FIELD[1]], "A": [FIELD[0]], "C": [FIELD[2]]}
+
+    standings = score_stage(gc_data, rosters)['standings']
+
+    # C's only rider abandoned, so C has no time and leads on zero
+    assert [(participant, data['position']) for participant, data in standings] == [("C", 1), ("B", 2), ("A", 3)]
+    assert standings[1][1]['total_time_seconds'] == standings[2][1]['total_time_seconds'] == 36000
+
+
+def test_abandoned_riders_are_not_counted():
+    gc_data = StageGC.from_entries([
+        {'rider_url': FIELD[0], 'rank': 1, 'time': "10:00:00"},
+        {'rider_url': FIELD[1], 'rank': 2, 'time': "+0:30"},
+    ])
+
+    scored = score_stage(gc_data, {"Team": [FIELD[0], FIELD[1], FIELD[2]]})
+    data = scored['standings'][0][1]
+
+    assert (data['total_time_seconds'], data['riders_counted'], data['total_riders']) == (72030, 2, 3)
+    assert [detail['time'] for detail in scored['rider_details']["Team"]] == ["10:00:00", "10:00:30", "DNF"]
+
+
+def test_rider_details_show_raw_unreadable_times_and_defaults():
+    gc_data = StageGC.from_entries([
+        {'rider_url': FIELD[0], 'rider_name': "Leader", 'team_name': "Team A", 'rank': 1, 'time': "10:00:00"},
+        {'rider_url': FIELD[1], 'rider_name': "Odd", 'team_name': "Team B", 'rank': 2, 'time': "-0:12"},
+        {'rider_url': FIELD[2], 'rider_name': "Blank", 'rank': None, 'time': None},
+    ])
+
+    details = score_stage(gc_data, {"Team": FIELD[:4]})['rider_details']["Team"]
+
+    assert [(detail['time'], detail['rank'], detail['team']) for detail in details] == [
+        ("10:00:00", 1, "Team A"),
+        ("-0:12", 2, "Team B"),
+        ("-", "-", "Unknown"),
+        ("DNF", "-", "Unknown"),
+    ]
@@ -0,0 +1,84 @@
+"""
+Tests for single-flight request coalescing (singleflight.SingleFlight)
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from singleflight import SingleFlight
+
+THREADS = 16
+
+
+def run_concurrently(flight: SingleFlight, keys, func, release: threading.Event):
+    """
+    Call flight.do for every key from its own thread, setting `release` (which
+    `func` waits for) once every call is either running or waiting
+    """
+    started = threading.Barrier(len(keys))
+
+    def call(key):
+        started.wait()
+        return flight.do(key, func, key)
+
+    with ThreadPoolExecutor(len(keys)) as pool:
+        futures = [pool.submit(call, key) for key in keys]
+        while True:
+            stats = flight.stats()
+            if stats['executed'] + stats['absorbed'] == len(keys):
+                break
+            time.sleep(0.001)
+        release.set()
+        return [future.exception() or future.result() for future in futures]
+
+
+def test_one_call_per_key_under_contention():
+    release = threading.Event()
+    calls = []
+    calls_lock = threading.Lock()
+
+    def work(key):
+        with calls_lock:
+            calls.append(key)
+        release.wait(5)
+        return f"result {key}"
+
+    flight = SingleFlight()
+    keys = ["a", "b"] * (THREADS // 2)
+    results = run_concurrently(flight, keys, work, release)
+
+    assert sorted(calls) == ["a", "b"]
+    assert results == [f"result {key}" for key in keys]
+    assert flight.stats() == {'executed': 2, 'absorbed': THREADS - 2, 'in_flight': 0}
+
+
+def test_waiters_get_the_same_exception():
+    release = threading.Event()
+    calls = []
+
+    def work(key):
+        calls.append(key)
+        release.wait(5)
+        raise RuntimeError("scrape failed")
+
+    flight = SingleFlight()
+    results = run_concurrently(flight, ["a"] * THREADS, work, release)
+
+    assert calls == ["a"]
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert len({id(result) for result in results}) == 1
+
+
+def test_later_calls_run_again():
+    flight = SingleFlight()
+    counter = iter(range(10))
+
+    assert flight.do("a", lambda: next(counter)) == 0
+    assert flight.do("a", lambda: next(counter)) == 1
+    with pytest.raises(ZeroDivisionError):
+        flight.do("a", lambda: 1 / 0)
+    assert flight.do("a", lambda: next(counter)) == 2
+    assert flight.stats() == {'executed': 4, 'absorbed': 0, 'in_flight': 0}
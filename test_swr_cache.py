@@ -0,0 +1,97 @@
+"""
+Tests for the stale-while-revalidate cache (swr_cache.SWRCache)
+"""
+
+import threading
+import time
+
+from swr_cache import SWRCache
+
+
+def wait_for_refresh(cache: SWRCache, key) -> None:
+    deadline = time.monotonic() + 5
+    while cache.is_refreshing(key):
+        assert time.monotonic() < deadline, "background refresh didn't finish"
+        time.sleep(0.001)
+
+
+def test_first_get_computes_and_fresh_value_is_reused():
+    cache = SWRCache(fresh_for=60)
+    calls = []
+
+    def compute(n):
+        calls.append(n)
+        return n * 2
+
+    assert cache.get("key", compute, 21) == (42, 0.0)
+    value, age = cache.get("key", compute, 21)
+
+    assert (value, calls) == (42, [21])
+    assert 0 <= age < 60
+
+
+def test_stale_value_served_while_refreshing():
+    cache = SWRCache(fresh_for=0)
+    cache.get("key", lambda: "old")
+    release = threading.Event()
+
+    def slow_compute():
+        release.wait(5)
+        return "new"
+
+    started = time.monotonic()
+    value, age = cache.get("key", slow_compute)
+
+    # Served at once, without waiting for the refresh
+    assert value == "old"
+    assert age is not None
+    assert time.monotonic() - started < 1
+    assert cache.is_refreshing("key")
+    # Only one background refresh per key
+    assert cache.get("key", slow_compute)[0] == "old"
+
+    release.set()
+    wait_for_refresh(cache, "key")
+    assert cache.get("key", lambda: "newer")[0] == "new"
+
+
+def test_failed_refresh_keeps_old_value():
+    cache = SWRCache(fresh_for=0)
+    cache.get("key", lambda: "old")
+
+    def failing():
+        raise ConnectionError("site down")
+
+    for compute in (failing, lambda: None):
+        assert cache.get("key", compute)[0] == "old"
+        wait_for_refresh(cache, "key")
+        assert cache.get("key", compute)[0] == "old"
+        wait_for_refresh(cache, "key")
+
+
+def test_invalidate_recomputes_and_falls_back_on_failure():
+    cache = SWRCache(fresh_for=None)
+    cache.get("key", lambda: "old")
+    assert cache.get("key", lambda: "never called")[0] == "old"
+
+    cache.invalidate(lambda key: key == "key")
+    assert cache.get("key", lambda: None)[0] == "old"
+    assert cache.get("key", lambda: "new") == ("new", 0.0)
+
+
+def test_first_get_failure_returns_nothing():
+    cache = SWRCache(fresh_for=60)
+
+    assert cache.get("key", lambda: None) == (None, None)
+    assert cache.get("key", lambda: 1 / 0) == (None, None)
+
+
+def test_discard_drops_value():
+    cache = SWRCache(fresh_for=None)
+    cache.get(("race", 1), lambda: "a")
+    cache.get(("race", 2), lambda: "b")
+
+    cache.discard(lambda key: key[1] == 1)
+
+    assert cache.get(("race", 1), lambda: "a2")[0] == "a2"
+    assert cache.get(("race", 2), lambda: "b2")[0] == "b"
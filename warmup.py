@@ -0,0 +1,161 @@
+"""
+Cache warm-up on server start
+
+After a deploy or restart every cache is empty, so the first visitor to each
+race would wait on the whole cold path (race page, stage discovery, every
+stage page and the roster sheet). start_warmup() runs that path once in a
+background thread instead, for the active races and the default race:
+rosters, then the race snapshot if the ingestion worker wrote one, else the
+latest stage, the standings and the stage matrix the charts read (through
+the same stale-while-revalidate caches page loads read).
+
+warmup_status() reports progress per race for health checks; the app shows
+it on `?health=1`. Set FANTASY_WARMUP=0 to skip warming up.
+"""
+
+import os
+import threading
+import time
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+import api_client
+from races_config import DEFAULT_RACE, get_active_races, get_race_config, get_team_rosters, refresh_rosters
+
+WARMUP_ENABLED = os.environ.get("FANTASY_WARMUP", "1").lower() not in ("0", "false", "no")
+
+# Overall states: idle (not started), warming, warm, failed (some race failed)
+IDLE = "idle"
+WARMING = "warming"
+WARM = "warm"
+FAILED = "failed"
+# Per race also pending and skipped (not started yet, or no rosters)
+PENDING = "pending"
+SKIPPED = "skipped"
+
+_status: Dict[str, Any] = {'status': IDLE, 'started_at': None, 'finished_at': None, 'rosters_loaded': None,
+                          'races': {}}
+_status_lock = threading.Lock()
+_thread: Optional[threading.Thread] = None
+
+
+def _set_race_status(race_id: str, **fields) -> None:
+    with _status_lock:
+        _status['races'][race_id].update(fields)
+
+
+def races_to_warm() -> List[Dict]:
+    """The active races and the default race, without duplicates"""
+    races = list(get_active_races())
+    if all(race['id'] != DEFAULT_RACE for race in races):
+        races.append(get_race_config(DEFAULT_RACE))
+    return races
+
+
+def warm_race(race: Dict) -> Optional[int]:
+    """
+    Load a race into the caches the app reads
+
+    Args:
+        race: Race configuration (see races_config.RACES)
+
+    Returns:
+        Latest stage loaded, or None if the race wasn't warmed (not started
+        or no rosters)
+
+    Raises:
+        RuntimeError: If the race's standings couldn't be loaded
+    """
+    rosters = get_team_rosters(race['id'])
+    if date.fromisoformat(race['start_date']) > date.today() or all(not riders for riders in rosters.values()):
+        return None
+
+    snapshot = api_client.load_race_snapshot(race['race_url'], rosters)
+    if snapshot is not None:
+        return snapshot['latest_stage']
+    if api_client.SNAPSHOT_ONLY:
+        return None
+
+    standings, _ = api_client.serve_race_standings(race['id'], rosters)
+    if standings is None:
+        raise RuntimeError("no standings")
+    api_client.serve_race_stage_matrix(race['id'], rosters, standings['latest_stage'])
+    return standings['latest_stage']
+
+
+def warm_caches(races: Optional[List[Dict]] = None) -> None:
+    """
+    Warm up races one after another, recording progress (see warmup_status)
+
+    Args:
+        races: Races to warm up (defaults to races_to_warm())
+    """
+    with _status_lock:
+        _status.update(status=WARMING, started_at=time.time(), finished_at=None)
+
+    # Page loads don't wait for the roster sheet, but the warm-up can
+    rosters_loaded = refresh_rosters()
+    if races is None:
+        races = races_to_warm()
+
+    with _status_lock:
+        _status['rosters_loaded'] = rosters_loaded
+        _status['races'] = {race['id']: {'status': PENDING} for race in races}
+
+    failed = False
+    for race in races:
+        _set_race_status(race['id'], status=WARMING)
+        start = time.monotonic()
+        try:
+            latest_stage = warm_race(race)
+        except Exception as e:
+            failed = True
+            _set_race_status(race['id'], status=FAILED, error=str(e), seconds=round(time.monotonic() - start, 1))
+            continue
+        _set_race_status(
+            race['id'],
+            status=SKIPPED if latest_stage is None else WARM,
+            latest_stage=latest_stage,
+            seconds=round(time.monotonic() - start, 1)
+        )
+
+    with _status_lock:
+        _status.update(status=FAILED if failed else WARM, finished_at=time.time())
+
+
+def start_warmup() -> Optional[threading.Thread]:
+    """
+    Start warming up in a background thread, once per process
+
+    Returns:
+        The warm-up thread, or None if warm-up is disabled
+    """
+    global _thread
+    if not WARMUP_ENABLED:
+        return None
+    with _status_lock:
+        if _thread is None:
+            _thread = threading.Thread(target=warm_caches, name="cache-warmup", daemon=True)
+            _thread.start()
+        return _thread
+
+
+def warmup_status() -> Dict[str, Any]:
+    """
+    Get warm-up progress
+
+    Returns:
+        Dictionary with the overall 'status' (idle, warming, warm or failed),
+        'started_at' / 'finished_at' (Unix time), 'rosters_loaded' (whether
+        the roster sheet could be read) and per race id its
+        'status' (pending, warming, warm, skipped or failed), 'latest_stage',
+        'seconds' and 'error'
+    """
+    with _status_lock:
+        return {
+            'status': _status['status'],
+            'started_at': _status['started_at'],
+            'finished_at': _status['finished_at'],
+            'rosters_loaded': _status['rosters_loaded'],
+            'races': {race_id: dict(state) for race_id, state in _status['races'].items()}
+        }